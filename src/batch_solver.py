@@ -0,0 +1,229 @@
+import numpy as np
+from sirvd_solver import N_COMPARTMENTS
+from dormand_prince import DOPRI_A, DOPRI_B, DOPRI_E, DOPRI_P
+
+def batch_parameters_dtype(n_groups):
+    """Structured dtype describing one ensemble member (one set of model parameters)
+
+    Args:
+        n_groups (int): number of age groups
+
+    Returns:
+        np.dtype: dtype with the fields beta_matrix, gamma, mu_group, phi, rho, eta_group and start_vaccination
+    """
+    return np.dtype([
+        ("beta_matrix", float, (n_groups, n_groups)),
+        ("gamma", float),
+        ("mu_group", float, (n_groups,)),
+        ("phi", float),
+        ("rho", float),
+        ("eta_group", float, (n_groups,)),
+        ("start_vaccination", float, (n_groups,)),
+    ])
+
+def batch_parameters(batch_size, n_groups, beta_matrix = None, gamma = 0.0, mu_group = 0.0, phi = 0.0, rho = 0.0, eta_group = 0.0, start_vaccination = -1):
+    """Allocate the structured array of parameters for an ensemble, broadcasting the given values to all members
+
+    Args:
+        batch_size (int): number of ensemble members
+        n_groups (int): number of age groups
+        beta_matrix (np.ndarray, optional): infection coefficient for each group. Defaults to None (zeros).
+        gamma (float, optional): recovery coefficient. Defaults to 0.0.
+        mu_group (list, optional): mortality coefficient for each group. Defaults to 0.0.
+        phi (float, optional): transfer coefficient for loss of immunity from recovered. Defaults to 0.0.
+        rho (float, optional): transfer coefficient for loss of immunity from vaccinated. Defaults to 0.0.
+        eta_group (list, optional): vaccination coefficient for each group. Defaults to 0.0.
+        start_vaccination (list, optional): day of start of the vaccination period for each group. Defaults to -1 (no vaccination).
+
+    Returns:
+        np.ndarray: structured array of shape (batch_size,), the fields can be then overwritten with the draws
+    """
+    params = np.zeros(batch_size, dtype=batch_parameters_dtype(n_groups))
+    if beta_matrix is not None:
+        params["beta_matrix"] = beta_matrix
+    params["gamma"] = gamma
+    params["mu_group"] = mu_group
+    params["phi"] = phi
+    params["rho"] = rho
+    params["eta_group"] = eta_group
+    params["start_vaccination"] = start_vaccination
+    return params
+
+def make_sirvd_batch(params):
+    """Build the right-hand side of the SIRVSD model for a whole ensemble.
+
+    The ensemble is stored in the last axis of the state (shape (5, n_groups, batch)),
+    so that every operation works on contiguous rows of length batch instead of tiny per-member vectors.
+
+    Args:
+        params (np.ndarray): structured array of parameters (see batch_parameters_dtype)
+
+    Returns:
+        function: sirvd_batch(t, x) with x of shape (5, n_groups, batch)
+    """
+    beta_matrix = np.ascontiguousarray(np.moveaxis(params["beta_matrix"], 0, -1)) # (n_groups, n_groups, batch)
+    gamma = params["gamma"]
+    mu_group = np.ascontiguousarray(params["mu_group"].T)
+    phi = params["phi"]
+    rho = params["rho"]
+    eta_group = np.ascontiguousarray(params["eta_group"].T)
+    start_vaccination = np.ascontiguousarray(params["start_vaccination"].T)
+    vaccinated = start_vaccination != -1 # -1 means no vaccination for a specific age group
+    removal = gamma + mu_group
+    force_of_infection = np.empty(mu_group.shape) # buffers shared by all the evaluations of a solve
+    infections = np.empty(mu_group.shape)
+    eta = np.empty(mu_group.shape)
+
+    def sirvd_batch(t, x):
+        """
+        Compute the derivatives of all the ensemble members at t with one batched matrix product.
+        """
+        s, i, r, v, _ = x
+        derivatives = np.empty(x.shape)
+        ds, di, dr, dv, dd = derivatives
+        np.multiply(eta_group, vaccinated & (t >= start_vaccination), out=eta) # time-dependent parameter
+        np.einsum("jkb,kb->jb", beta_matrix, i, out=force_of_infection)
+        np.multiply(s, force_of_infection, out=infections)
+        np.subtract(phi*r + rho*v - eta*s, infections, out=ds) # dsdt
+        np.subtract(infections, removal*i, out=di) # didt
+        np.subtract(gamma*i, phi*r, out=dr) # drdt
+        np.subtract(eta*s, rho*v, out=dv) # dvdt
+        np.multiply(mu_group, i, out=dd) # dddt
+        return derivatives
+
+    return sirvd_batch
+
+def _next_jumps(jumps, t):
+    """Next start day of vaccination of every member after its time t (inf if there is none)"""
+    return np.where(jumps > t, jumps, np.inf).min(axis=0)
+
+def _rk4(fun, t, x, y, substeps, jumps):
+    """Classic Runge-Kutta of order 4 with a fixed number of steps between two consecutive timestamps.
+
+    A step crossing start days of vaccination is split, for each member, into pieces ending at its own start days
+    (pieces of zero length for the members that have already reached the end of the step).
+    """
+    for idx in range(1, len(t)):
+        h = (t[idx] - t[idx-1])/substeps
+        for k in range(substeps):
+            t_step = np.full(x.shape[-1], t[idx-1] + k*h)
+            t_end = t[idx] if k == substeps - 1 else t[idx-1] + (k + 1)*h
+            while True:
+                t_piece = np.minimum(_next_jumps(jumps, t_step), t_end)
+                hv = t_piece - t_step # step of each member
+                k1 = fun(t_step, x) # eta frozen at the start of the piece
+                k2 = fun(t_step, x + hv/2*k1)
+                k3 = fun(t_step, x + hv/2*k2)
+                k4 = fun(t_step, x + hv*k3)
+                x = x + hv/6*(k1 + 2*k2 + 2*k3 + k4)
+                if np.all(t_piece >= t_end):
+                    break
+                t_step = t_piece
+        if not np.all(np.isfinite(x)):
+            raise ValueError("Integration with RK4 failed at t="+str(t[idx])+": the state is not finite for the members "
+                             +str(np.flatnonzero(~np.isfinite(x.reshape(-1, x.shape[-1])).all(axis=0)).tolist()))
+        y[idx] = x
+
+def _dopri5(fun, t, x, y, rtol, atol, jumps):
+    """Adaptive Dormand-Prince 5(4) with a step size shared by all the ensemble members.
+
+    A step crossing start days of vaccination is split, for each member, into pieces ending at its own start days
+    (pieces of zero length for the members that have already reached the end of the step), so eta is constant on every piece.
+    The error of a member is the largest error of its pieces, and a step is accepted only if it is accurate for all of them.
+    The timestamps falling inside an accepted step are filled with the dense output of the piece containing them
+    (as solve_ivp does with t_eval), so the output grid does not limit the step size.
+    The integration stops with a ValueError naming the failing members if their state is not finite
+    or if the step needed by them is smaller than the spacing between floating point numbers.
+    """
+    batch_size = x.shape[-1]
+    k = np.empty((7, *x.shape))
+    k0 = fun(t[0], x)
+    t_old, t_end = t[0], t[-1]
+    h = min(1.0, t_end - t_old) # one day, then adapted by the error control
+    idx = 1
+    while idx < len(t):
+        h = min(h, t_end - t_old)
+        t_new = t_end if t_end - t_old - h <= 1e-12*abs(t_end) else t_old + h
+        t_piece, x_piece, k[0] = np.full(batch_size, t_old), x, k0
+        member_norms = np.zeros(batch_size)
+        pieces = [] # (start, step, state at the start, stages) of every piece
+        while True:
+            t_next = np.minimum(_next_jumps(jumps, t_piece), t_new)
+            hv = t_next - t_piece # step of each member
+            for s in range(1, 6):
+                dx = sum(a*k[j] for j, a in enumerate(DOPRI_A[s, :s]))
+                k[s] = fun(t_piece, x_piece + hv*dx) # eta frozen at the start of the piece
+            x_new = x_piece + hv*np.tensordot(DOPRI_B, k[:6], axes=1)
+            k[6] = fun(t_piece, x_new)
+            scale = atol + np.maximum(np.abs(x_piece), np.abs(x_new))*rtol
+            error = hv*np.tensordot(DOPRI_E, k, axes=1)/scale
+            np.maximum(member_norms, np.sqrt(np.mean(error.reshape(-1, batch_size)**2, axis=0)), out=member_norms)
+            if np.all(t_next >= t_new):
+                pieces.append((t_piece, hv, x_piece, k))
+                break
+            pieces.append((t_piece, hv, x_piece, k.copy()))
+            t_piece, x_piece = t_next, x_new
+            k[0] = fun(t_piece, x_piece) # eta changed for some members
+        if not np.all(np.isfinite(member_norms)):
+            raise ValueError("Integration with DOPRI5 failed at t="+str(t_old)+": the state is not finite for the members "
+                             +str(np.flatnonzero(~np.isfinite(member_norms)).tolist()))
+        error_norm = member_norms.max()
+        if error_norm < 1:
+            if idx < len(t) and t[idx] <= t_new:
+                # dense output coefficients (4, 5, n_groups, batch) of every piece
+                pieces = [(tp, hp, xp, np.tensordot(DOPRI_P, kp, axes=([0], [0]))) for tp, hp, xp, kp in pieces]
+            while idx < len(t) and t[idx] <= t_new:
+                for j, (tp, hp, xp, q) in enumerate(pieces):
+                    inside = (tp <= t[idx]) & (hp > 0) # the last piece starting before t[idx] contains it
+                    theta = np.where(inside, t[idx] - tp, 0)/np.where(hp > 0, hp, 1)
+                    value = xp + hp*np.einsum("pb,pcgb->cgb", theta**np.arange(1, 5)[:, None], q)
+                    y[idx] = value if j == 0 else np.where(inside, value, y[idx])
+                idx += 1
+            # first same as last, unless eta changed for some members at the end of the step
+            k0 = k[6].copy() if len(pieces) == 1 and np.all(_next_jumps(jumps, t_old) > t_new) else fun(t_new, x_new)
+            t_old, x = t_new, x_new
+            factor = 10 if error_norm == 0 else min(10, 0.9*error_norm**-0.2)
+        else:
+            factor = max(0.2, 0.9*error_norm**-0.2)
+            if h*factor < 10*abs(np.nextafter(t_old, np.inf) - t_old): # same minimum step of solve_ivp
+                raise ValueError("Integration with DOPRI5 failed at t="+str(t_old)+": required step size is less than spacing "
+                                 "between numbers for the members "+str(np.flatnonzero(member_norms >= 1).tolist()))
+        h *= factor
+
+def sirvd_solver_batch(t, params, x0_batch, method = "DOPRI5", rtol = 1e-3, atol = 1e-6, substeps = 4):
+    """Integrate a whole ensemble of parameter sets in one call, advancing all the members together.
+
+    As in sirvd_solver, no step crosses the jump of eta at a start day of vaccination, but the steps are split for
+    each member at its own start days (see _dopri5), so members with many different start days do not shorten
+    the steps of the whole batch.
+
+    Args:
+        t (np.ndarray): simulation time
+        params (np.ndarray): structured array of parameters, one entry for each member (see batch_parameters)
+        x0_batch (np.ndarray): initial conditions of each member (shape (batch, 5*n_groups)),
+            a single 1-D vector of initial conditions is used for all the members
+        method (str, optional): "DOPRI5" (adaptive) or "RK4" (fixed step). Defaults to "DOPRI5".
+        rtol (float, optional): relative tolerance of DOPRI5. Defaults to 1e-3.
+        atol (float, optional): absolute tolerance of DOPRI5. Defaults to 1e-6.
+        substeps (int, optional): number of RK4 steps between two consecutive timestamps. Defaults to 4.
+
+    Returns:
+        np.ndarray: measurements of each member for each timestamp (shape (batch, len(t), 5*n_groups))
+    """
+    batch_size = len(params)
+    n_groups = params.dtype["mu_group"].shape[0]
+    x0_batch = np.broadcast_to(np.asarray(x0_batch, dtype=float), (batch_size, N_COMPARTMENTS*n_groups))
+    x = np.ascontiguousarray(x0_batch.T).reshape(N_COMPARTMENTS, n_groups, batch_size)
+    y = np.empty((len(t), N_COMPARTMENTS, n_groups, batch_size))
+    y[0] = x
+    if method not in ("RK4", "DOPRI5"):
+        raise ValueError("Unknown method "+method+" (expected 'DOPRI5' or 'RK4')")
+    t = np.asarray(t, dtype=float)
+    sirvd_batch = make_sirvd_batch(params)
+    start_vaccination = params["start_vaccination"].T
+    jumps = np.where(start_vaccination == -1, np.inf, start_vaccination) # -1 means no vaccination, so no jump of eta
+    if method == "RK4":
+        _rk4(sirvd_batch, t, x, y, substeps, jumps)
+    else:
+        _dopri5(sirvd_batch, t, x, y, rtol, atol, jumps)
+    return np.moveaxis(y.reshape(len(t), -1, batch_size), -1, 0)
@@ -0,0 +1,42 @@
+import sys
+from benchmarks.rhs import benchmark_rhs
+from benchmarks.batch import benchmark_batch
+from benchmarks.scenarios import benchmark_scenarios
+from benchmarks.events import benchmark_events
+from benchmarks.compiled import benchmark_numba
+from benchmarks.long_run import benchmark_equilibrium
+from benchmarks.plots import benchmark_plots
+from benchmarks.sweep_metrics import benchmark_metrics
+from benchmarks.calibration import benchmark_calibration
+from benchmarks.sparse_contacts import benchmark_sparse_contacts
+from benchmarks.methods import benchmark_methods
+from benchmarks.replicates import benchmark_stochastic
+from benchmarks.restarts import benchmark_incremental
+
+BENCHMARKS = { # name: (title, function), in the order in which they are run
+    "rhs": ("Vectorized right-hand side against the original loop", benchmark_rhs),
+    "batch": ("Batched ensemble solver against one solve_ivp run for each parameter set", benchmark_batch),
+    "scenarios": ("Scenario sweep on a pool of processes", benchmark_scenarios),
+    "events": ("Integration split at the start days of vaccination", benchmark_events),
+    "numba": ("Compiled numba backend against SciPy", benchmark_numba),
+    "equilibrium": ("Long-run state without integrating for years", benchmark_equilibrium),
+    "metrics": ("Vectorized metrics of a sweep", benchmark_metrics),
+    "calibration": ("Calibration with forward sensitivities", benchmark_calibration),
+    "sparse_contacts": ("Sparse and Kronecker contacts of age x region metapopulations", benchmark_sparse_contacts),
+    "methods": ("Methods and tolerances on the main.py scenarios, a long horizon and many groups", benchmark_methods),
+    "stochastic": ("Stochastic replicates and extinction times", benchmark_stochastic),
+    "incremental": ("What-if start days restarted from checkpoints", benchmark_incremental),
+    "plots": ("Headless plot rendering on a pool of processes", benchmark_plots),
+}
+
+if __name__ == "__main__":
+
+    # ----- Run the benchmarks given on the command line (all of them without arguments) -----
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError("Unknown benchmark "+name+" (expected one of "+", ".join(BENCHMARKS)+")")
+    for name in names:
+        title, benchmark = BENCHMARKS[name]
+        print(f"----- {title} -----")
+        benchmark()
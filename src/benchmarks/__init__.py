@@ -0,0 +1,2 @@
+# benchmarks of the solver, one module for each feature, the benchmarks check their results before reporting the timings (the metrics in the tests)
+# (run them all with python src/benchmark.py, or some of them with python src/benchmark.py rhs batch ...)
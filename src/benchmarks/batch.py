@@ -0,0 +1,40 @@
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver
+from batch_solver import sirvd_solver_batch, batch_parameters
+from benchmarks.common import check, random_parameters
+
+def benchmark_batch(batch_sizes = (100, 1000, 10000), n_groups = 4, n_loop = 100, n_check = 10, max_error = 1e-3):
+    """Compare the batched ensemble solver with one sirvd_solver call for each parameter set,
+    with the same start days of vaccination for all the members and with start days sampled for each member,
+    the first members of every batch are checked against a tight-tolerance sirvd_solver run
+
+    Args:
+        batch_sizes (tuple, optional): number of ensemble members to test. Defaults to (100, 1000, 10000).
+        n_groups (int, optional): number of groups. Defaults to 4.
+        n_loop (int, optional): number of sequential sirvd_solver calls used to estimate the per-run cost. Defaults to 100.
+        n_check (int, optional): number of members checked against sirvd_solver. Defaults to 10.
+        max_error (float, optional): largest accepted difference from sirvd_solver. Defaults to 1e-3.
+    """
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+    rng = np.random.default_rng(0)
+    start = timeit.default_timer()
+    for _ in range(n_loop):
+        sirvd_solver(t, beta_matrix*rng.uniform(0.5, 1.5), gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    loop_per_run = (timeit.default_timer() - start)/n_loop
+    print(f"{'batch':>6} | {'start days':>10} | {'loop (s)':>9} | {'batch (s)':>9} | {'per run (us)':>12} | {'speedup':>7} | {'max error':>9}")
+    for batch_size in batch_sizes:
+        params = batch_parameters(batch_size, n_groups, beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+        params["beta_matrix"] *= rng.uniform(0.5, 1.5, (batch_size, 1, 1)) # one draw of the contact intensity for each member
+        for start_days in ("shared", "sampled"):
+            if start_days == "sampled": # continuous draws, every member switches eta at different times
+                params["start_vaccination"] = rng.uniform(0, 120, (batch_size, n_groups))
+            start = timeit.default_timer()
+            y = sirvd_solver_batch(t, params, x0)
+            batch_time = timeit.default_timer() - start
+            error = max(np.abs(y[member] - sirvd_solver(t, params["beta_matrix"][member], gamma, mu_group, phi, rho, eta_group, x0,
+                                                        params["start_vaccination"][member], rtol=1e-10, atol=1e-12)).max()
+                        for member in range(min(n_check, batch_size)))
+            print(f"{batch_size:>6} | {start_days:>10} | {loop_per_run*batch_size:>9.2f} | {batch_time:>9.2f} | {batch_time/batch_size*1e6:>12.1f} | {loop_per_run*batch_size/batch_time:>6.1f}x | {error:>9.1e}")
+            check(error <= max_error, f"batched solver differs from sirvd_solver by {error:.1e} ({batch_size} members, {start_days} start days)")
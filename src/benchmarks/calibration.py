@@ -0,0 +1,44 @@
+import timeit
+import numpy as np
+from scipy.optimize import least_squares
+from sirvd_solver import sirvd_solver
+from sensitivity import calibrate, observed_series
+from benchmarks.common import check, main_parameters, MAIN_STRATEGIES
+
+def benchmark_calibration(days = 120, seed = 1):
+    """Fit beta_matrix, gamma and mu_group to synthetic incidence and death series (from the main.py parameters)
+    with the forward sensitivities against least_squares with finite-difference Jacobians,
+    the fit with the sensitivities is checked to recover the parameters of the series
+
+    Args:
+        days (int, optional): length of the observed series. Defaults to 120.
+        seed (int, optional): seed of the perturbation of the initial guess. Defaults to 1.
+    """
+    t = np.linspace(0, days, days+1)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    start_vaccination, eta_group = MAIN_STRATEGIES["vaccination_strategy_ascending_order"]
+    observations = observed_series(sirvd_solver(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, rtol=1e-8, atol=1e-10), t, gamma, 4)
+    rng = np.random.default_rng(seed)
+    guess = (beta_matrix*rng.uniform(0.7, 1.3, (4, 4)), gamma*1.2, np.asarray(mu_group)*rng.uniform(0.7, 1.3, 4))
+    weights = {"deaths": 10}
+    start = timeit.default_timer()
+    fitted = calibrate(t, observations, *guess, phi, rho, eta_group, x0, start_vaccination, weights=weights)
+    sensitivity_time = timeit.default_timer() - start
+    n_solves = [0]
+
+    def residuals(theta):
+        n_solves[0] += 1
+        y = sirvd_solver(t, theta[:16].reshape(4, 4), theta[16], theta[17:], phi, rho, eta_group, x0, start_vaccination, rtol=1e-8, atol=1e-10)
+        model = observed_series(y, t, theta[16], 4)
+        return np.concatenate([(model[name] - observations[name]).ravel()*weights.get(name, 1.0) for name in observations])
+
+    start = timeit.default_timer()
+    result = least_squares(residuals, np.concatenate([guess[0].ravel(), [guess[1]], guess[2]]), bounds=(0, np.inf), x_scale="jac")
+    difference_time = timeit.default_timer() - start
+    print(f"{'jacobian':>18} | {'solves':>6} | {'time (s)':>8} | {'beta error':>10} | {'cost':>8}")
+    beta_error = np.abs(fitted["beta_matrix"] - beta_matrix).max()
+    print(f"{'sensitivities':>18} | {fitted['result'].nfev:>6} | {sensitivity_time:>8.2f} | {beta_error:>10.1e} | {fitted['result'].cost:>8.1e}")
+    check(beta_error <= 1e-3, f"calibration with the sensitivities does not recover beta_matrix (error {beta_error:.1e})")
+    beta_error = np.abs(result.x[:16].reshape(4, 4) - beta_matrix).max()
+    print(f"{'finite differences':>18} | {n_solves[0]:>6} | {difference_time:>8.2f} | {beta_error:>10.1e} | {result.cost:>8.1e}")
+
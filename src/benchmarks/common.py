@@ -0,0 +1,100 @@
+import numpy as np
+from scipy import sparse
+from contacts import KroneckerContacts
+
+def check(passed, message):
+    """Stop a benchmark whose results are wrong (a faster wrong result is not a speedup)
+
+    Args:
+        passed (bool): outcome of the check
+        message (str): description of the failure
+
+    Raises:
+        AssertionError: if passed is False
+    """
+    if not passed:
+        raise AssertionError(message)
+
+
+def random_parameters(n_groups, seed = 0):
+    """Generate a plausible set of model parameters and initial conditions for a given number of groups
+
+    Args:
+        n_groups (int): number of age (or region) groups
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        tuple: (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    """
+    rng = np.random.default_rng(seed)
+    beta_matrix = rng.uniform(0.005, 0.1, (n_groups, n_groups))
+    beta_matrix = (beta_matrix + beta_matrix.T)/2 # contacts are symmetric
+    beta_matrix *= 0.2/beta_matrix.sum(axis=1).mean() # same order of magnitude of main.py for every n_groups
+    mu_group = rng.uniform(0.00005, 0.15, n_groups)
+    eta_group = np.full(n_groups, 0.01)
+    start_vaccination = rng.choice([-1, 0, 30, 60, 90], n_groups)
+    x0 = np.concatenate([np.full(n_groups, 0.99), np.full(n_groups, 0.01), np.zeros(3*n_groups)])
+    return beta_matrix, 1/15, mu_group, 1/180, 1/270, eta_group, x0, start_vaccination
+
+
+def legacy_sirvd(t,x,beta_matrix,gamma,mu_group,phi,rho,eta_group,start_vaccination):
+    """
+    Original loop-based right-hand side (one np.dot per group), with the shape of the
+    derivatives matrix generalized to n_groups so that it can be used as a reference.
+    """
+    n_groups = len(start_vaccination)
+    derivatives_matrix = np.zeros((5,n_groups))
+    n_infectious = [x[j+n_groups] for j in range(0,n_groups)]
+    for j in range(0,n_groups):
+        s = x[j]
+        i = x[j+n_groups]
+        r = x[j+n_groups*2]
+        v = x[j+n_groups*3]
+        eta = 0 if t < start_vaccination[j] or start_vaccination[j] == -1 else eta_group[j]
+        derivatives_matrix[0][j] = phi*r - eta*s + rho*v - s*np.dot(beta_matrix[j],n_infectious)
+        derivatives_matrix[1][j] = s*np.dot(beta_matrix[j],n_infectious) - gamma*i - mu_group[j]*i
+        derivatives_matrix[2][j] = gamma*i - phi*r
+        derivatives_matrix[3][j] = eta*s - rho*v
+        derivatives_matrix[4][j] = mu_group[j]*i
+    return derivatives_matrix.reshape(-1)
+
+
+def main_parameters():
+    """Parameters and initial conditions of main.py (four age groups)
+
+    Returns:
+        tuple: (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0)
+    """
+    beta_matrix = np.array([[0.05,0.01,0.04,0.008],[0.01,0.09,0.08,0.008],[0.04,0.08,0.1,0.02],[0.008,0.008,0.02,0.03]])
+    mu_group = [0.00009, 0.00005, 0.00688, 0.15987]
+    x0 = [0.99, 0.99, 0.99, 0.99, 0.01, 0.01, 0.01, 0.01, *[0]*12]
+    return beta_matrix, 1/15, mu_group, 1/180, 1/270, [0.01, 0.01, 0.01, 0.01], x0
+
+
+MAIN_STRATEGIES = { # start_vaccination and eta_group of the strategies compared in main.py
+    "no_vaccination": ([-1, -1, -1, -1], [0.01, 0.01, 0.01, 0.01]),
+    "vaccination_strategy_ascending_order": ([0, 30, 60, 90], [0.01, 0.01, 0.01, 0.01]),
+    "vaccination_strategy_descending_order": ([90, 60, 30, 0], [0.01, 0.01, 0.01, 0.01]),
+    "vaccination_strategy_same_time": ([0, 0, 0, 0], [0.0025, 0.0025, 0.0025, 0.0025]),
+}
+
+
+def metapopulation_parameters(n_ages, n_regions, neighbours = 4, seed = 0):
+    """Age x region metapopulation: dense age mixing, sparse mobility between a region and a few nearby regions
+
+    Returns:
+        tuple: (contacts as KroneckerContacts, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    """
+    rng = np.random.default_rng(seed)
+    age_matrix = rng.uniform(0.01, 0.1, (n_ages, n_ages))
+    rows = np.repeat(np.arange(n_regions), neighbours)
+    cols = (rows + np.tile(np.arange(1, neighbours+1) - (neighbours+1)//2, n_regions)) % n_regions # nearby regions on a ring
+    mobility = sparse.csr_matrix((rng.uniform(0, 0.05, len(rows)), (rows, cols)), shape=(n_regions, n_regions)) + sparse.identity(n_regions)
+    contacts = KroneckerContacts(age_matrix, mobility)
+    n_groups = n_ages*n_regions
+    infectious = np.where(rng.uniform(size=n_groups) < 0.01, 0.01, 0.0) # seeded in a few strata
+    x0 = np.concatenate([1 - infectious, infectious, np.zeros(3*n_groups)])
+    mu_group = np.repeat(rng.uniform(0.00005, 0.01, n_ages), n_regions)
+    start_vaccination = np.repeat(rng.choice([-1, 0, 30, 60], n_ages), n_regions)
+    return contacts, 1/15, mu_group, 1/180, 1/270, np.full(n_groups, 0.01), x0, start_vaccination
+
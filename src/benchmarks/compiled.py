@@ -0,0 +1,32 @@
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver
+import numba_backend
+from benchmarks.common import check, main_parameters, MAIN_STRATEGIES
+
+def benchmark_numba(configurations = (("RK45", 1, 1e-3), ("RK4", 1, 1e-3), ("DOPRI5", 1, 1e-3), ("ImplicitEuler", 8, 1e-2)), repeat = 20):
+    """Per-solve latency and error of the compiled numba backend against the SciPy backend on the main.py strategies
+
+    Args:
+        configurations (tuple, optional): (method, substeps, largest accepted error against a Radau reference) of the numba
+            backend to test ("RK45" is the SciPy backend). Defaults to (("RK45", 1, 1e-3), ("RK4", 1, 1e-3), ("DOPRI5", 1, 1e-3),
+            ("ImplicitEuler", 8, 1e-2)), the first order implicit Euler is the least accurate.
+        repeat (int, optional): number of solves (the best one is taken). Defaults to 20.
+    """
+    if not numba_backend.NUMBA_AVAILABLE:
+        print("numba is not installed, skipping the benchmark of the numba backend")
+        return
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    print(f"{'strategy':>38} | {'backend':>7} | {'method':>13} | {'latency (us)':>12} | {'error':>8}")
+    for vacc_name, (start_vaccination, eta_group) in MAIN_STRATEGIES.items():
+        args = (t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+        reference = sirvd_solver(*args, method="Radau", rtol=1e-10, atol=1e-12)
+        for method, substeps, max_error in configurations:
+            backend = "scipy" if method == "RK45" else "numba"
+            sirvd_solver(*args, method=method, backend=backend, substeps=substeps) # compile or load from the disk cache
+            latency = min(timeit.repeat(lambda: sirvd_solver(*args, method=method, backend=backend, substeps=substeps), number=1, repeat=repeat))
+            error = np.abs(sirvd_solver(*args, method=method, backend=backend, substeps=substeps) - reference).max()
+            print(f"{vacc_name:>38} | {backend:>7} | {method:>13} | {latency*1e6:>12.0f} | {error:>8.1e}")
+            check(error <= max_error, f"{method} of the {backend} backend has an error of {error:.1e} ({vacc_name})")
+
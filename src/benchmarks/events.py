@@ -0,0 +1,29 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+from sirvd_solver import sirvd_solver, make_sirvd
+from benchmarks.common import check, main_parameters, MAIN_STRATEGIES
+
+def benchmark_events(methods = ("RK45", "LSODA"), max_error = 1e-3):
+    """Compare the number of RHS evaluations and the error of one solve over the whole time span
+    (discontinuities located by rejecting steps) with the integration split at the start days of vaccination
+
+    Args:
+        methods (tuple, optional): solve_ivp methods to test. Defaults to ("RK45", "LSODA").
+        max_error (float, optional): largest accepted error of the split integration against a Radau reference. Defaults to 1e-3.
+    """
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    print(f"{'strategy':>38} | {'method':>6} | {'nfev whole':>10} | {'nfev split':>10} | {'error whole':>11} | {'error split':>11}")
+    for vacc_name, (start_vaccination, eta_group) in MAIN_STRATEGIES.items():
+        args = (beta_matrix, gamma, mu_group, phi, rho, eta_group)
+        reference = sirvd_solver(t, *args, x0, start_vaccination, method="Radau", rtol=1e-10, atol=1e-12)
+        for method in methods:
+            sirvd, sirvd_jacobian = make_sirvd(*args, start_vaccination)
+            options = {"jac": sirvd_jacobian} if method in ("BDF", "Radau", "LSODA") else {}
+            whole = solve_ivp(sirvd, [t[0], t[-1]], x0, method=method, t_eval=t, **options)
+            stats = {}
+            split = sirvd_solver(t, *args, x0, start_vaccination, method=method, stats=stats)
+            error = np.abs(split-reference).max()
+            print(f"{vacc_name:>38} | {method:>6} | {whole.nfev:>10} | {stats['nfev']:>10} | {np.abs(whole.y.T-reference).max():>11.2e} | {error:>11.2e}")
+            check(error <= max_error, f"split integration with {method} has an error of {error:.1e} ({vacc_name})")
+
@@ -0,0 +1,38 @@
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver
+from equilibrium import surrogate_long_run_state
+from benchmarks.common import check, main_parameters, MAIN_STRATEGIES
+
+def benchmark_equilibrium(years = 10, repeat = 5):
+    """Constant-size surrogate of the long-run state against a multi-year sirvd_solver run on the main.py strategies.
+
+    The states are compared as fractions of the living people of each group (S, I, R, V over S+I+R+V), since the
+    surrogate replaces the deceased and sirvd does not: the disease-free equilibrium is a fixed point of sirvd and it
+    matches the integration when the disease dies out, the endemic equilibrium of the surrogate does not.
+    The benchmark checks that the surrogate predicts the simulated outcome (eradicated or endemic) and, when the disease
+    dies out, the state of the integration.
+
+    Args:
+        years (int, optional): length of the integration used to read the long-run state. Defaults to 10.
+        repeat (int, optional): number of repetitions (the best one is taken). Defaults to 5.
+    """
+    t = np.linspace(0, 365*years, 365*years+1)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    print(f"{'strategy':>38} | {'R_eff':>5} | {'integration (ms)':>16} | {'surrogate (ms)':>14} | {'surrogate':>10} | {'simulated':>10} | {'max D':>5} | {'state error':>11}")
+    for vacc_name, (start_vaccination, eta_group) in MAIN_STRATEGIES.items():
+        args = (beta_matrix, gamma, mu_group, phi, rho, eta_group)
+        integration = min(timeit.repeat(lambda: sirvd_solver(t, *args, x0, start_vaccination), number=1, repeat=repeat))
+        direct = min(timeit.repeat(lambda: surrogate_long_run_state(*args, x0, start_vaccination), number=1, repeat=repeat))
+        result = surrogate_long_run_state(*args, x0, start_vaccination)
+        surrogate = result["disease_free"] if result["disease_free_stable"] else result["endemic"]
+        simulated = sirvd_solver(t, *args, x0, start_vaccination, rtol=1e-8, atol=1e-10)[-1].reshape(5, 4)
+        living = simulated[:4]/simulated[:4].sum(axis=0)
+        surrogate_living = surrogate.reshape(5, 4)[:4]/surrogate.reshape(5, 4)[:4].sum(axis=0)
+        long_run = "eradicated" if result["disease_free_stable"] else "endemic"
+        simulated_long_run = "eradicated" if simulated[1].max() <= 1e-6 else "endemic"
+        error = np.abs(living - surrogate_living).max()
+        print(f"{vacc_name:>38} | {result['r_effective']:>5.2f} | {integration*1e3:>16.1f} | {direct*1e3:>14.2f} | {long_run:>10} | {simulated_long_run:>10} | {simulated[4].max():>5.2f} | {error:>11.1e}")
+        check(long_run == simulated_long_run, f"the surrogate predicts {long_run} but the integration is {simulated_long_run} ({vacc_name})")
+        check(long_run == "endemic" or error <= 1e-6, f"disease-free equilibrium differs from the integration by {error:.1e} ({vacc_name})")
+
@@ -0,0 +1,74 @@
+import json
+import os
+import numpy as np
+from sirvd_solver import sirvd_solver, record_solver_calls
+from benchmarks.common import check, random_parameters, main_parameters, MAIN_STRATEGIES
+
+def method_workloads():
+    """Workloads of the method comparison: the four strategies of main.py, a long horizon and many groups
+
+    Returns:
+        dict: {workload_name: (t, sirvd_solver arguments without t)}
+    """
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    workloads = {vacc_name: (t, (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination))
+                 for vacc_name, (start_vaccination, eta_group) in MAIN_STRATEGIES.items()}
+    start_vaccination, eta_group = MAIN_STRATEGIES["vaccination_strategy_ascending_order"]
+    workloads["ascending_order_10_years"] = (np.linspace(0, 3650, 3651), (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination))
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(64)
+    workloads["64_groups"] = (t, (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination))
+    return workloads
+
+
+METHOD_CONFIGURATIONS = { # name: keyword arguments of sirvd_solver
+    "RK45": {"method": "RK45"},
+    "LSODA": {"method": "LSODA"},
+    "BDF": {"method": "BDF"},
+    "Radau": {"method": "Radau"},
+    "numba DOPRI5": {"method": "DOPRI5", "backend": "numba"},
+    "numba RK4": {"method": "RK4", "backend": "numba"},
+}
+
+
+def benchmark_methods(tolerances = ((1e-3, 1e-6), (1e-6, 1e-9)), repeat = 3, baseline = None, slowdown = 1.5):
+    """Wall time, counters of the instrumentation hook and error against a tight-tolerance reference (DOP853, rtol 1e-12)
+    of every method on every workload, to choose method and tolerances and to catch performance regressions.
+    An error larger than 10*rtol stops the benchmark, the regressions of the timings are only reported.
+
+    Args:
+        tolerances (tuple, optional): (rtol, atol) pairs to test. Defaults to ((1e-3, 1e-6), (1e-6, 1e-9)).
+        repeat (int, optional): number of repetitions (the best wall time is taken). Defaults to 3.
+        baseline (str, optional): json file of a previous run: if it exists the results are compared with it,
+            otherwise they are saved in it. Defaults to None.
+        slowdown (float, optional): wall time ratio to the baseline reported as a regression
+            (nfev is deterministic, any increase is reported). Defaults to 1.5.
+    """
+    previous = None
+    if baseline is not None and os.path.exists(baseline):
+        with open(baseline) as baseline_file:
+            previous = json.load(baseline_file)
+    results = {}
+    print(f"{'workload':>38} | {'method':>12} | {'rtol':>5} | {'time (ms)':>9} | {'nfev':>6} | {'njev':>4} | {'steps':>5} | {'rejected':>8} | {'max error':>9} | {'':>10}")
+    for workload, (t, args) in method_workloads().items():
+        reference = sirvd_solver(t, *args, method="DOP853", rtol=1e-12, atol=1e-14)
+        for name, options in METHOD_CONFIGURATIONS.items():
+            for rtol, atol in tolerances:
+                sirvd_solver(t, *args, rtol=rtol, atol=atol, **options) # warm up (numba compilation)
+                with record_solver_calls() as reports:
+                    for _ in range(repeat):
+                        y = sirvd_solver(t, *args, rtol=rtol, atol=atol, **options)
+                report = min(reports, key=lambda report: report["wall_time"])
+                key = f"{workload} {name} {rtol:g}"
+                results[key] = {"wall_time": report["wall_time"], "nfev": report["nfev"], "max_error": float(np.abs(y - reference).max())}
+                flag = ""
+                if previous is not None and key in previous:
+                    if report["nfev"] > previous[key]["nfev"] or report["wall_time"] > slowdown*previous[key]["wall_time"]:
+                        flag = "REGRESSION"
+                counters = [("-" if report[counter] is None else str(report[counter])) for counter in ("njev", "n_steps", "n_rejected")]
+                print(f"{workload:>38} | {name:>12} | {rtol:>5.0e} | {report['wall_time']*1e3:>9.2f} | {report['nfev']:>6} | {counters[0]:>4} | {counters[1]:>5} | {counters[2]:>8} | {results[key]['max_error']:>9.1e} | {flag:>10}")
+                check(results[key]["max_error"] <= 10*rtol, f"{name} has an error of {results[key]['max_error']:.1e} with rtol {rtol:g} ({workload})")
+    if baseline is not None and previous is None:
+        with open(baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=1)
+
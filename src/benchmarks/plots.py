@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from sirvd_solver import sirvd_solver
+from plot_batch import render_batch
+from benchmarks.common import check, main_parameters, MAIN_STRATEGIES
+
+def plot_jobs(directory):
+    """Plot jobs of the main.py strategies (all age groups, entire population, infections and deaths, zero day, comparisons)
+
+    Args:
+        directory (str): directory of the images (one subdirectory for each strategy)
+
+    Returns:
+        list: (function_name, kwargs) for render_batch
+    """
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    group_dict = {"children": 0, "teenagers": 1, "adults": 2, "senior": 3}
+    results_dict = {}
+    for vacc_name, (start_vaccination, eta_group) in MAIN_STRATEGIES.items():
+        y = sirvd_solver(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+        results_dict[vacc_name] = {group: y[:, group_id::len(group_dict)] for group, group_id in group_dict.items()}
+    jobs = []
+    for vacc_name in MAIN_STRATEGIES:
+        path = os.path.join(directory, vacc_name)
+        os.makedirs(path, exist_ok=True)
+        jobs.append(("plot_all_compartments_age_group", dict(t=t, group_dict=group_dict, results_dict=results_dict[vacc_name], path=path+"/all_compartments_")))
+        jobs.append(("plot_all_compartments_entire_population", dict(t=t, group_dict=group_dict, results_dict=results_dict[vacc_name], length_period=len(t), path=path+"/all_compartments_entire_population")))
+        for compartment_id in (1, 4):
+            jobs.append(("plot_specific_compartment_all_age_group", dict(t=t, group_dict=group_dict, vacc_strategy=vacc_name, results_dict=results_dict, compartment_id=compartment_id, path=directory+"/")))
+            jobs.append(("plot_pie_chart_zero_day", dict(group_dict=group_dict, vacc_strategy=vacc_name, results_dict=results_dict[vacc_name], compartment_id=compartment_id, length_period=len(t), path=directory+"/")))
+    for compartment_id in (1, 2, 4):
+        jobs.append(("plot_specific_compartment_compare_strategy", dict(t=t, results_dict=results_dict, compartment_id=compartment_id, length_period=len(t), path=directory)))
+        jobs.append(("plot_bar_chart_compartment_compare_strategy", dict(group_dict=group_dict, results_dict=results_dict, vaccination_dict=MAIN_STRATEGIES, compartment_id=compartment_id, length_period=len(t), path=directory)))
+    return jobs
+
+
+def benchmark_plots(max_workers = None):
+    """Serial rendering of the main.py plots against render_batch, the second batch skips all the unchanged plots,
+    the third one renders again the plots whose images were deleted (the counts of the three batches are checked)
+
+    Args:
+        max_workers (int, optional): number of processes. Defaults to None (number of CPUs).
+    """
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+    import plot_result
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = plot_jobs(directory)
+        start = time.perf_counter()
+        for function_name, kwargs in jobs:
+            getattr(plot_result, function_name)(show=False, **kwargs)
+        serial = time.perf_counter() - start
+        manifest = os.path.join(directory, "manifest.json")
+        timings = {}
+        for run in ("first batch", "second batch", "deleted"):
+            if run == "deleted":
+                with open(manifest) as manifest_file:
+                    with_images = sum(1 for images in json.load(manifest_file).values() if images)
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        if name.endswith(".jpg"):
+                            os.remove(os.path.join(root, name))
+            start = time.perf_counter()
+            counts = render_batch(jobs, manifest=manifest, max_workers=max_workers)
+            timings[run] = (time.perf_counter() - start, counts)
+        print(f"{len(jobs)} plot jobs, open figures after the serial run: {len(plt.get_fignums())}")
+        print(f"{'serial':>12} | {serial:>6.2f} s")
+        for run, (elapsed, counts) in timings.items():
+            print(f"{run:>12} | {elapsed:>6.2f} s | rendered {counts['rendered']:>2}, skipped {counts['skipped']:>2}")
+        check(not plt.get_fignums(), "the serial run left open figures")
+        expected = {"first batch": len(jobs), "second batch": 0, "deleted": with_images}
+        for run, (_, counts) in timings.items():
+            check(counts["rendered"] == expected[run] and counts["rendered"] + counts["skipped"] == len(jobs),
+                  f"{run} rendered {counts['rendered']} plots instead of {expected[run]}")
+
@@ -0,0 +1,34 @@
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver
+from stochastic import sirvd_stochastic, extinction_summary
+from benchmarks.common import check, main_parameters, MAIN_STRATEGIES
+
+def benchmark_stochastic(n_replicates = 10000, days = 365, runs = ((100, "gillespie", 0.1), (100, "tau_leaping", 0.1), (10000, "tau_leaping", 5e-2))):
+    """Stochastic replicates of the main.py ascending strategy: exact Gillespie on small groups and binomial tau-leaping
+    on large ones, with the distribution of the extinction time and the mean against the deterministic solution.
+    The people of every group are checked to be conserved in each replicate.
+
+    Args:
+        n_replicates (int, optional): number of replicates. Defaults to 10000.
+        days (int, optional): simulated days. Defaults to 365.
+        runs (tuple, optional): (people in each group, method, largest accepted mean error) of the runs, Gillespie only
+            on small groups (its events grow with the population), the mean is not the deterministic solution since some
+            replicates go extinct (most of them with few people). Defaults to ((100, "gillespie", 0.1), (100, "tau_leaping", 0.1), (10000, "tau_leaping", 5e-2)).
+    """
+    t = np.linspace(0, days, days+1)
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    start_vaccination, eta_group = MAIN_STRATEGIES["vaccination_strategy_ascending_order"]
+    deterministic = sirvd_solver(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)[-1].reshape(5, 4)
+    print(f"{'people':>6} | {'method':>11} | {'time (s)':>8} | {'extinct':>7} | {'median day':>10} | {'mean error':>10}")
+    for people, method, max_error in runs:
+        start = timeit.default_timer()
+        results = sirvd_stochastic(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, [people]*4,
+                                   n_replicates=n_replicates, method=method, seed=0)
+        elapsed = timeit.default_timer() - start
+        summary = extinction_summary(results["extinction_time"], t[-1])
+        mean_error = np.abs(results["final"].mean(axis=0)/people - deterministic).max()
+        print(f"{people:>6} | {method:>11} | {elapsed:>8.2f} | {summary['probability']:>7.1%} | {summary['quantiles'][0.5]:>10.1f} | {mean_error:>10.1e}")
+        check(np.all(results["final"].sum(axis=1) == people), f"{method} does not conserve the people of each group")
+        check(mean_error <= max_error, f"mean of {method} differs from the deterministic solution by {mean_error:.1e} ({people} people)")
+
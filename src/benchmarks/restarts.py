@@ -0,0 +1,37 @@
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver
+from incremental import IncrementalSolver
+from benchmarks.common import check, main_parameters
+
+def benchmark_incremental(days = 365, checkpoint_interval = 10, start_days = range(30, 361, 10)):
+    """Sweeps of staggered start days of the vaccination on the main.py parameters, solved in full against restarts from
+    the checkpoints of a base run in which the swept groups are not vaccinated (each scenario diverges at its start day),
+    the restarts are checked to give the same trajectories as the full solves
+
+    Args:
+        days (int, optional): length of the simulation. Defaults to 365.
+        checkpoint_interval (float, optional): days between two regular checkpoints. Defaults to 10.
+        start_days (range, optional): start days of the swept groups. Defaults to range(30, 361, 10).
+    """
+    t = np.linspace(0, days, days+1)
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0)
+    sweeps = { # (base start_vaccination, scenarios)
+        "seniors": ([0, 30, 60, -1], [[0, 30, 60, day] for day in start_days]),
+        "staggered": ([0, 0, -1, -1], [[0, 0, day, day + 30] for day in start_days]),
+    }
+    print(f"{'sweep':>9} | {'runs':>4} | {'full (s)':>8} | {'incremental (s)':>15} | {'speedup':>7} | {'solved rows':>11} | {'max error':>9}")
+    for name, (base, scenarios) in sweeps.items():
+        start = timeit.default_timer()
+        full = [sirvd_solver(t, *args, scenario, checkpoint_interval=checkpoint_interval) for scenario in scenarios]
+        full_time = timeit.default_timer() - start
+        start = timeit.default_timer()
+        solver = IncrementalSolver(t, *args, base, checkpoint_interval=checkpoint_interval)
+        incremental = [solver.solve(start_vaccination=scenario) for scenario in scenarios]
+        incremental_time = timeit.default_timer() - start
+        solved = solver.stats["solved_rows"]/(solver.stats["solved_rows"] + solver.stats["reused_rows"])
+        error = max(np.abs(y - y_full).max() for y, y_full in zip(incremental, full))
+        print(f"{name:>9} | {len(scenarios):>4} | {full_time:>8.3f} | {incremental_time:>15.3f} | {full_time/incremental_time:>6.1f}x | {solved:>11.0%} | {error:>9.1e}")
+        check(error <= 1e-12, f"restarts from the checkpoints differ from the full solves by {error:.1e} ({name})")
+
@@ -0,0 +1,30 @@
+import timeit
+import numpy as np
+from scipy.integrate import solve_ivp
+from sirvd_solver import sirvd_solver, make_sirvd
+from benchmarks.common import check, random_parameters, legacy_sirvd
+
+def benchmark_rhs(group_sizes = (4, 16, 64, 256), repeat = 5):
+    """Compare the right-hand side evaluation and the whole solve of the legacy loop with the vectorized model
+    (the two right-hand sides are checked to be the same before and after the start days of vaccination)
+
+    Args:
+        group_sizes (tuple, optional): number of groups to test. Defaults to (4, 16, 64, 256).
+        repeat (int, optional): number of repetitions (the best one is taken). Defaults to 5.
+    """
+    t = np.linspace(0, 365, 366)
+    print(f"{'groups':>6} | {'legacy rhs (us)':>15} | {'vector rhs (us)':>15} | {'speedup':>7} | {'legacy solve (ms)':>17} | {'vector solve (ms)':>17} | {'speedup':>7}")
+    for n_groups in group_sizes:
+        beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+        args = (beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+        sirvd, _ = make_sirvd(*args)
+        for t_check in (0.0, 45.0, 100.0): # before and after the start days of vaccination
+            check(np.allclose(sirvd(t_check, x0), legacy_sirvd(t_check, x0, *args), rtol=1e-12, atol=1e-15),
+                  f"vectorized right-hand side differs from the loop ({n_groups} groups, t={t_check})")
+        number = max(1, 20000//n_groups)
+        legacy_rhs = min(timeit.repeat(lambda: legacy_sirvd(45.0, x0, *args), number=number, repeat=repeat))/number
+        vector_rhs = min(timeit.repeat(lambda: sirvd(45.0, x0), number=number, repeat=repeat))/number
+        legacy_solve = min(timeit.repeat(lambda: solve_ivp(legacy_sirvd, [t[0], t[-1]], x0, t_eval=t, args=args), number=1, repeat=repeat))
+        vector_solve = min(timeit.repeat(lambda: sirvd_solver(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination), number=1, repeat=repeat))
+        print(f"{n_groups:>6} | {legacy_rhs*1e6:>15.1f} | {vector_rhs*1e6:>15.1f} | {legacy_rhs/vector_rhs:>6.1f}x | {legacy_solve*1e3:>17.1f} | {vector_solve*1e3:>17.1f} | {legacy_solve/vector_solve:>6.1f}x")
+
@@ -0,0 +1,38 @@
+import itertools
+import os
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver
+from scenario_runner import scenario_grid, run_scenarios_results
+from benchmarks.common import check, random_parameters
+
+def benchmark_scenarios(n_groups = 4, max_workers = None):
+    """Measure the scaling of the process-pool scenario runner with the number of workers on a sweep of start days,
+    every run is checked against one sirvd_solver call for each scenario
+
+    Args:
+        n_groups (int, optional): number of groups. Defaults to 4.
+        max_workers (int, optional): largest number of workers to test. Defaults to None (number of CPUs).
+    """
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+    base = {"beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho,
+            "eta_group": eta_group, "x0": x0, "start_vaccination": start_vaccination}
+    days = [0, 30, 60, 90]
+    scenarios = scenario_grid(cartesian={"start_vaccination": [list(order) for order in itertools.product(days, repeat=n_groups)],
+                                         "eta_group": [np.full(n_groups, 0.005), np.full(n_groups, 0.01)]})
+    group_dict = {str(group_id): group_id for group_id in range(n_groups)}
+    max_workers = max_workers or os.cpu_count() or 1
+    expected = np.array([sirvd_solver(t, **{**base, **changes}).reshape(len(t), 5, n_groups) for changes in scenarios.values()])
+    print(f"{len(scenarios)} scenarios")
+    print(f"{'workers':>7} | {'time (s)':>8} | {'speedup':>7} | {'max diff':>8}")
+    serial = None
+    for n_workers in sorted({1, *range(2, max_workers+1, 2), max_workers}):
+        start = timeit.default_timer()
+        results = run_scenarios_results(t, base, scenarios, group_dict, max_workers=n_workers)
+        elapsed = timeit.default_timer() - start
+        serial = serial or elapsed
+        difference = np.abs(results.data - expected).max()
+        print(f"{n_workers:>7} | {elapsed:>8.2f} | {serial/elapsed:>6.1f}x | {difference:>8.1e}")
+        check(difference <= 1e-12, f"scenarios solved by {n_workers} workers differ from sirvd_solver ({difference:.1e})")
+
@@ -0,0 +1,46 @@
+import timeit
+import numpy as np
+from sirvd_solver import sirvd_solver, make_sirvd
+from benchmarks.common import check, metapopulation_parameters
+
+def benchmark_sparse_contacts(configurations = ((10, 100), (10, 1000)), days = 100, repeat = 20):
+    """Dense, sparse (CSR) and Kronecker contact operators on age x region metapopulations (1k and 10k strata):
+    memory of the operator, cost of the right-hand side and solves with RK45 and BDF (sparse Jacobian).
+    The three operators are the same matrix, so their RK45 solves are checked to differ only by rounding.
+
+    Args:
+        configurations (tuple, optional): (n_ages, n_regions) of each metapopulation. Defaults to ((10, 100), (10, 1000)).
+        days (int, optional): length of the simulation. Defaults to 100.
+        repeat (int, optional): number of evaluations of the right-hand side (the best one is taken). Defaults to 20.
+    """
+    t = np.linspace(0, days, days+1)
+    print(f"{'strata':>6} | {'operator':>10} | {'memory (MB)':>11} | {'rhs (ms)':>8} | {'RK45 (s)':>8} | {'BDF (s)':>7} | {'BDF njev':>8} | {'max diff':>8}")
+    for n_ages, n_regions in configurations:
+        contacts, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = metapopulation_parameters(n_ages, n_regions)
+        n_groups = n_ages*n_regions
+        operators = {"sparse": contacts.tosparse(), "kronecker": contacts}
+        if n_groups <= 1000: # the dense matrix and its Jacobian do not fit in memory for larger metapopulations
+            operators = {"dense": contacts.toarray(), **operators}
+        reference = None
+        for name, beta_matrix in operators.items():
+            if name == "dense":
+                memory = beta_matrix.nbytes
+            elif name == "sparse":
+                memory = beta_matrix.data.nbytes + beta_matrix.indices.nbytes + beta_matrix.indptr.nbytes
+            else:
+                memory = beta_matrix.age_matrix.nbytes + sum(array.nbytes for array in (beta_matrix.mobility_matrix.data, beta_matrix.mobility_matrix.indices, beta_matrix.mobility_matrix.indptr))
+            sirvd, _ = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+            rhs = min(timeit.repeat(lambda: sirvd(0.0, x0), number=1, repeat=repeat))
+            args = (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+            start = timeit.default_timer()
+            y = sirvd_solver(t, *args)
+            explicit = timeit.default_timer() - start
+            stats = {}
+            start = timeit.default_timer()
+            sirvd_solver(t, *args, method="BDF", stats=stats)
+            implicit = timeit.default_timer() - start
+            reference = y if reference is None else reference
+            difference = np.abs(y - reference).max()
+            print(f"{n_groups:>6} | {name:>10} | {memory/2**20:>11.2f} | {rhs*1e3:>8.3f} | {explicit:>8.2f} | {implicit:>7.2f} | {stats['njev']:>8} | {difference:>8.1e}")
+            check(difference <= 1e-10, f"{name} contacts give a different solution ({difference:.1e}, {n_groups} strata)")
+
@@ -0,0 +1,45 @@
+import math
+import timeit
+import numpy as np
+from batch_solver import sirvd_solver_batch, batch_parameters
+import metrics
+from benchmarks.common import random_parameters
+
+def legacy_zero_eradication_day(population, compartment_id = 1):
+    """Zero day and eradication day with the element-by-element loops of the original plot_result.py"""
+    zero_day, eradication_day = -1, -1
+    measurements = population[:, compartment_id]
+    for idx, x in np.ndenumerate(measurements):
+        if idx[0] != 0 and math.isclose(x, measurements[idx[0]-1], abs_tol=0.00001):
+            zero_day = idx[0]
+            break
+    for idx, x in np.ndenumerate(population[:, 1]):
+        if x <= 1e-6:
+            eradication_day = idx[0]
+            break
+    return zero_day, eradication_day
+
+
+def benchmark_metrics(batch_size = 10000, n_groups = 4, n_loop = 100):
+    """Summary metrics of a whole sweep with the vectorized metrics module against the original loops on each run
+    (the days of the two are compared in tests/test_metrics.py)
+
+    Args:
+        batch_size (int, optional): number of runs of the sweep (solved with sirvd_solver_batch). Defaults to 10000.
+        n_groups (int, optional): number of groups. Defaults to 4.
+        n_loop (int, optional): number of runs used to estimate the per-run cost of the loops. Defaults to 100.
+    """
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+    params = batch_parameters(batch_size, n_groups, beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    params["beta_matrix"] *= np.random.default_rng(0).uniform(0.5, 1.5, (batch_size, 1, 1))
+    data = sirvd_solver_batch(t, params, x0).reshape(batch_size, len(t), 5, n_groups)
+    start = timeit.default_timer()
+    for run in data[:n_loop]:
+        legacy_zero_eradication_day(metrics.population(run)[..., 0])
+    loop_per_run = (timeit.default_timer() - start)/n_loop
+    start = timeit.default_timer()
+    metrics.summarize(data, t, params["gamma"])
+    vector_time = timeit.default_timer() - start
+    print(f"{'runs':>6} | {'loops, 2 metrics (s)':>20} | {'summarize, 7 metrics (s)':>24} | {'speedup':>7}")
+    print(f"{batch_size:>6} | {loop_per_run*batch_size:>20.2f} | {vector_time:>24.2f} | {loop_per_run*batch_size/vector_time:>6.1f}x")
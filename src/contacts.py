@@ -0,0 +1,66 @@
+import numpy as np
+from scipy import sparse
+
+class KroneckerContacts:
+    """Contact operator age_matrix ⊗ mobility_matrix of a metapopulation stratified by age and region.
+
+    The strata are ordered by age and then by region (stratum age*n_regions + region), the entry of the full matrix
+    between two strata is age_matrix[age, age'] * mobility_matrix[region, region']. The full matrix is never stored:
+    the product with the infectious is age_matrix @ I @ mobility_matrix.T on I viewed as a (n_ages, n_regions) matrix.
+
+    Args:
+        age_matrix (np.ndarray): infection coefficient between age groups (shape (n_ages, n_ages))
+        mobility_matrix (np.ndarray or scipy.sparse matrix): mixing between regions (shape (n_regions, n_regions))
+    """
+
+    def __init__(self, age_matrix, mobility_matrix):
+        self.age_matrix = np.asarray(age_matrix, dtype=float)
+        self.mobility_matrix = sparse.csr_matrix(mobility_matrix, dtype=float) if sparse.issparse(mobility_matrix) else np.asarray(mobility_matrix, dtype=float)
+        self.n_ages, self.n_regions = len(self.age_matrix), self.mobility_matrix.shape[0]
+        self.shape = (self.n_ages*self.n_regions, self.n_ages*self.n_regions)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __matmul__(self, infectious):
+        infectious = np.asarray(infectious, dtype=float).reshape(self.n_ages, self.n_regions)
+        return (self.age_matrix @ (self.mobility_matrix @ infectious.T).T).ravel()
+
+    def __mul__(self, factor):
+        # scalar factors, e.g. the reduced contacts of a schedule (beta_matrix*0.5)
+        return KroneckerContacts(self.age_matrix*factor, self.mobility_matrix)
+
+    __rmul__ = __mul__
+
+    def tosparse(self):
+        """Full matrix in CSR format (as many entries as n_ages**2 times the entries of mobility_matrix)"""
+        return sparse.kron(sparse.csr_matrix(self.age_matrix), sparse.csr_matrix(self.mobility_matrix), format="csr")
+
+    def toarray(self):
+        """Full dense matrix"""
+        return self.tosparse().toarray()
+
+def contact_operator(beta_matrix):
+    """Normalize beta_matrix to one of the supported contact operators
+
+    Args:
+        beta_matrix (np.ndarray, scipy.sparse matrix or KroneckerContacts): infection coefficient between groups
+
+    Returns:
+        np.ndarray (dense), scipy.sparse.csr_matrix or KroneckerContacts
+    """
+    if isinstance(beta_matrix, KroneckerContacts):
+        return beta_matrix
+    if sparse.issparse(beta_matrix):
+        return sparse.csr_matrix(beta_matrix, dtype=float)
+    return np.asarray(beta_matrix, dtype=float)
+
+def contact_matrix_sparse(contacts):
+    """Sparse matrix of a contact operator returned by contact_operator, used for the sparse Jacobian
+
+    Returns:
+        scipy.sparse.csr_matrix: contact matrix
+    """
+    if isinstance(contacts, KroneckerContacts):
+        return contacts.tosparse()
+    return sparse.csr_matrix(contacts)
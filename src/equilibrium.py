@@ -0,0 +1,167 @@
+import numpy as np
+from sirvd_solver import N_COMPARTMENTS, make_sirvd, assign_vaccination_coefficient
+
+# Deaths remove people from the living population, so with mu_group > 0 the only fixed points of the SIRVSD model
+# integrated by sirvd_solver have I = R = 0 and eta*S = rho*V (disease_free_equilibrium): they form a family, one for
+# each size of the living groups, and which one is reached depends on the deaths along the whole trajectory, so it
+# cannot be found without integrating. The surrogate_ functions study a different model, in which the size of each
+# group (S+I+R+V) is kept constant, i.e. deaths are replaced by newborns in S: the I, R, V equations are the same of
+# sirvd, the S equation is replaced by the conservation of the group size, which also removes the zero eigenvalues
+# of the Jacobian. Its endemic equilibrium is NOT the long-run state of sirvd_solver (e.g. without vaccination the
+# simulated seniors are almost all deceased after ten years, while the surrogate keeps them alive), it only tells
+# whether the disease can persist when the population is renewed.
+
+def reproduction_number(beta_matrix, gamma, mu_group, susceptible = None):
+    """Basic (or effective) reproduction number as spectral radius of the next-generation matrix diag(S) beta diag(1/(gamma+mu))
+
+    Args:
+        beta_matrix (np.ndarray): infection coefficient for each group
+        gamma (float): recovery coefficient (same for all group)
+        mu_group (list): mortality coefficient for each group
+        susceptible (np.ndarray, optional): fraction of susceptible of each group. Defaults to None (fully susceptible population, R0).
+
+    Returns:
+        float: reproduction number (the disease dies out if it is smaller than 1)
+    """
+    beta_matrix = np.asarray(beta_matrix, dtype=float)
+    susceptible = np.ones(len(beta_matrix)) if susceptible is None else np.asarray(susceptible, dtype=float)
+    next_generation = susceptible[:, None]*beta_matrix/(gamma + np.asarray(mu_group, dtype=float))[None, :]
+    return np.abs(np.linalg.eigvals(next_generation)).max()
+
+def disease_free_equilibrium(rho, eta, population):
+    """Disease-free fixed point: S and V balanced by vaccination and loss of immunity (eta*S = rho*V)
+
+    Args:
+        rho (float): transfer coefficient for loss of immunity from vaccinated
+        eta (np.ndarray): long-run vaccination coefficient of each group
+        population (np.ndarray): size of each group (S+I+R+V)
+
+    Returns:
+        np.ndarray: state with shape (5*n_groups) (D is left to 0, deaths do not change at the equilibrium)
+    """
+    eta = np.asarray(eta, dtype=float)
+    population = np.asarray(population, dtype=float)
+    zeros = np.zeros(len(population))
+    susceptible = population*rho/(rho + eta)
+    return np.concatenate([susceptible, zeros, zeros, population - susceptible, zeros])
+
+def surrogate_jacobian(x, beta_matrix, gamma, mu_group, phi, rho, eta):
+    """Jacobian of the model with constant group sizes, restricted to I, R, V (S = N - I - R - V)
+
+    Args:
+        x (np.ndarray): state with shape (5*n_groups)
+        beta_matrix (np.ndarray): infection coefficient for each group
+        gamma (float): recovery coefficient
+        mu_group (list): mortality coefficient for each group
+        phi (float): transfer coefficient for loss of immunity from recovered
+        rho (float): transfer coefficient for loss of immunity from vaccinated
+        eta (np.ndarray): long-run vaccination coefficient of each group
+
+    Returns:
+        np.ndarray: Jacobian with shape (3*n_groups, 3*n_groups)
+    """
+    n_groups = len(eta)
+    _, sirvd_jacobian = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta, np.full(n_groups, -np.inf))
+    jacobian = sirvd_jacobian(0.0, np.asarray(x, dtype=float))
+    # d(I,R,V)/d(I,R,V) minus the derivative through S = N - I - R - V
+    return jacobian[n_groups:4*n_groups, n_groups:4*n_groups] - np.tile(jacobian[n_groups:4*n_groups, :n_groups], (1, 3))
+
+def is_stable(x, beta_matrix, gamma, mu_group, phi, rho, eta):
+    """Linear stability of a fixed point of the constant-size surrogate model from the eigenvalues of surrogate_jacobian
+
+    Returns:
+        tuple: (True if all the eigenvalues have negative real part, eigenvalues)
+    """
+    eigenvalues = np.linalg.eigvals(surrogate_jacobian(x, beta_matrix, gamma, mu_group, phi, rho, eta))
+    return bool(np.all(eigenvalues.real < 0)), eigenvalues
+
+def surrogate_endemic_equilibrium(beta_matrix, gamma, mu_group, phi, rho, eta, population, x_guess = None, tol = 1e-12, max_iter = 100):
+    """Endemic fixed point (I > 0) of the constant-size surrogate model (not a fixed point of sirvd, see the top of the module),
+    found with Newton's method on the vectorized right-hand side and its analytic Jacobian
+
+    Args:
+        beta_matrix (np.ndarray): infection coefficient for each group
+        gamma (float): recovery coefficient
+        mu_group (list): mortality coefficient for each group
+        phi (float): transfer coefficient for loss of immunity from recovered
+        rho (float): transfer coefficient for loss of immunity from vaccinated
+        eta (np.ndarray): long-run vaccination coefficient of each group
+        population (np.ndarray): size of each group (S+I+R+V)
+        x_guess (np.ndarray, optional): initial guess with shape (5*n_groups). Defaults to None (guess from the reproduction number).
+        tol (float, optional): tolerance on the max norm of the residual. Defaults to 1e-12.
+        max_iter (int, optional): maximum number of Newton iterations. Defaults to 100.
+
+    Returns:
+        np.ndarray: state with shape (5*n_groups) (D is left to 0), None if the effective reproduction number
+            at the disease-free equilibrium is not greater than 1 or Newton's method does not reach a point with I > 0
+    """
+    eta = np.asarray(eta, dtype=float)
+    population = np.asarray(population, dtype=float)
+    n_groups = len(population)
+    disease_free = disease_free_equilibrium(rho, eta, population)
+    r_effective = reproduction_number(beta_matrix, gamma, mu_group, disease_free[:n_groups]/population)
+    if r_effective <= 1:
+        return None
+    sirvd, sirvd_jacobian = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta, np.full(n_groups, -np.inf))
+    if x_guess is None:
+        # homogeneous mixing guess: S reduced by R from the disease-free level, R and V in balance with I and S,
+        # I takes the rest of the group (never 0, otherwise Newton's method stays on the disease-free equilibrium)
+        s = disease_free[:n_groups]/r_effective
+        v = eta*s/rho
+        i = np.maximum(population - s - v, 1e-3*population)/(1 + gamma/phi)
+        x_guess = np.concatenate([s, i, gamma*i/phi, v, np.zeros(n_groups)])
+    x = np.array(x_guess, dtype=float)
+    x[4*n_groups:] = 0
+    for _ in range(max_iter):
+        residual = sirvd(0.0, x)[:4*n_groups]
+        residual[:n_groups] = x[:4*n_groups].reshape(4, n_groups).sum(axis=0) - population # conservation of each group instead of dS/dt
+        if np.abs(residual).max() <= tol:
+            break
+        jacobian = sirvd_jacobian(0.0, x)[:4*n_groups, :4*n_groups]
+        jacobian[:n_groups] = np.tile(np.eye(n_groups), 4)
+        step = np.linalg.solve(jacobian, -residual)
+        # damping: the fractions have to remain non negative
+        negative = step < 0
+        ratio = -x[:4*n_groups][negative]/step[negative]
+        damping = min(1.0, 0.9*ratio.min()) if ratio.size else 1.0
+        x[:4*n_groups] += damping*step
+    else:
+        return None
+    if np.all(x[n_groups:2*n_groups] <= tol):
+        return None # converged to the disease-free equilibrium
+    return x
+
+def surrogate_long_run_state(beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination):
+    """Long-run analysis of the constant-size surrogate model with the same parameters of sirvd_solver.
+
+    The disease-free equilibrium is also a fixed point of sirvd (for groups of the given size), the endemic one only of
+    the surrogate: it is not the state reached by sirvd_solver, which keeps losing people to D while the disease persists.
+
+    Args:
+        beta_matrix (np.ndarray): infection coefficient for each group
+        gamma (float): recovery coefficient (same for all group)
+        mu_group (list): mortality coefficient for each group
+        phi (float): transfer coefficient for loss of immunity from recovered
+        rho (float): transfer coefficient for loss of immunity from vaccinated
+        eta_group (list): vaccination coefficient for each group
+        x0 (list): initial conditions (used for the size of each group)
+        start_vaccination (list): day of start of the vaccination period for each group
+
+    Returns:
+        dict: r0, effective reproduction number at the disease-free equilibrium, disease-free and endemic equilibria
+            of the surrogate (None if it does not exist) with their stability (the disease dies out if the disease-free one is stable)
+    """
+    n_groups = len(start_vaccination)
+    eta = assign_vaccination_coefficient(np.inf, np.asarray(eta_group, dtype=float), np.asarray(start_vaccination)) # after all start days
+    population = np.asarray(x0, dtype=float).reshape(N_COMPARTMENTS, n_groups)[:4].sum(axis=0)
+    disease_free = disease_free_equilibrium(rho, eta, population)
+    endemic = surrogate_endemic_equilibrium(beta_matrix, gamma, mu_group, phi, rho, eta, population)
+    args = (beta_matrix, gamma, mu_group, phi, rho, eta)
+    return {
+        "r0": reproduction_number(beta_matrix, gamma, mu_group),
+        "r_effective": reproduction_number(beta_matrix, gamma, mu_group, disease_free[:n_groups]/population),
+        "disease_free": disease_free,
+        "disease_free_stable": is_stable(disease_free, *args)[0],
+        "endemic": endemic,
+        "endemic_stable": is_stable(endemic, *args)[0] if endemic is not None else None,
+    }
@@ -0,0 +1,126 @@
+import bisect
+import hashlib
+import numpy as np
+from sirvd_solver import sirvd_solver
+from solver_cache import hash_update
+
+def _same(value, other):
+    """True if two arguments of sirvd_solver have the same content (see hash_update)"""
+    digests = [hashlib.sha256(), hashlib.sha256()]
+    hash_update(digests[0], value)
+    hash_update(digests[1], other)
+    return digests[0].digest() == digests[1].digest()
+
+def _vaccination_start(start_vaccination):
+    """Start day of each group, inf for the groups that are never vaccinated"""
+    start_vaccination = np.asarray(start_vaccination, dtype=float)
+    return np.where(start_vaccination == -1, np.inf, start_vaccination)
+
+def divergence_time(t, base, scenario):
+    """First time in which the trajectory of a scenario can differ from the one of the base scenario
+
+    Only the vaccination and the schedule can change after t[0]: a different start day of a group diverges at the
+    earliest of the two days, a different eta at the start of the vaccination of the group, a different schedule at the
+    earliest change that the two schedules do not share. Every other difference diverges at t[0].
+
+    Args:
+        t (np.ndarray): simulation time
+        base (dict): arguments of sirvd_solver (model parameters, x0 and options) of the base scenario
+        scenario (dict): arguments of sirvd_solver of the other scenario
+
+    Returns:
+        float: divergence time, inf if the two scenarios have the same trajectory
+    """
+    for name in set(base) | set(scenario):
+        if name in ("stats", "start_vaccination", "eta_group", "schedule"):
+            continue
+        if name not in base or name not in scenario or not _same(base[name], scenario[name]):
+            return float(t[0])
+    start, other_start = _vaccination_start(base["start_vaccination"]), _vaccination_start(scenario["start_vaccination"])
+    eta = np.broadcast_to(np.asarray(base["eta_group"], dtype=float), start.shape)
+    other_eta = np.broadcast_to(np.asarray(scenario["eta_group"], dtype=float), start.shape)
+    changed = np.where(start != other_start, np.minimum(start, other_start), np.where(eta != other_eta, start, np.inf))
+    divergence = changed.min()
+    schedule, other_schedule = base.get("schedule") or [], scenario.get("schedule") or []
+    for change in schedule:
+        if not any(_same(change, other_change) for other_change in other_schedule):
+            divergence = min(divergence, change[0])
+    for change in other_schedule:
+        if not any(_same(change, base_change) for base_change in schedule):
+            divergence = min(divergence, change[0])
+    return max(float(divergence), float(t[0]))
+
+class IncrementalSolver:
+    """What-if scenarios solved from the checkpoints of a base scenario.
+
+    The base scenario is solved once keeping the state at t[0], at the multiples of checkpoint_interval and at the
+    breakpoints (start days of vaccination and days of change of the schedule). A scenario with some arguments changed
+    has the same trajectory as the base one up to its divergence time (see divergence_time), so it is integrated only
+    from the latest checkpoint before it and the rows before the checkpoint are copied from the base trajectory.
+    The integration is always split at the multiples of checkpoint_interval, so a restart from one of them gives the same
+    result as sirvd_solver(..., checkpoint_interval=checkpoint_interval) on the whole simulation time (a restart from a
+    breakpoint of the base scenario only, within the tolerances of the solver).
+
+    Args:
+        t (np.ndarray): simulation time
+        checkpoint_interval (float, optional): days between two regular checkpoints. Defaults to 30.
+        (the other arguments are the ones of sirvd_solver, e.g. method, rtol, atol, schedule)
+    """
+
+    def __init__(self, t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, checkpoint_interval = 30, **options):
+        self.t = np.asarray(t, dtype=float)
+        self.checkpoint_interval = checkpoint_interval
+        self.base = {"beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho,
+                     "eta_group": eta_group, "x0": x0, "start_vaccination": start_vaccination, **options}
+        self.stats = {"solves": 0, "reused_rows": 0, "solved_rows": 0}
+        checkpoints = {}
+        self.y = sirvd_solver(self.t, **self.base, checkpoint_interval=checkpoint_interval, checkpoints=checkpoints)
+        self.base.pop("stats", None) # filled by the base solve only
+        self.y.flags.writeable = False
+        self.checkpoint_times = sorted(checkpoints)
+        self.checkpoints = checkpoints
+
+    def restart_time(self, **changes):
+        """Latest checkpoint before the divergence of a scenario (None if it has the same trajectory as the base scenario)
+
+        Args:
+            **changes: arguments of sirvd_solver that differ from the base ones
+
+        Returns:
+            float: time of the checkpoint
+        """
+        divergence = divergence_time(self.t, self.base, {**self.base, **changes})
+        if divergence >= self.t[-1]:
+            return None
+        return self.checkpoint_times[bisect.bisect_right(self.checkpoint_times, divergence) - 1]
+
+    def solve(self, stats = None, **changes):
+        """Trajectory of the base scenario with some arguments changed, integrated from the latest shared checkpoint
+
+        Args:
+            stats (dict, optional): if given, it is filled with the counters of sirvd_solver and the "restart" time
+                (None if nothing was integrated). Defaults to None.
+            **changes: arguments of sirvd_solver that differ from the base ones (e.g. start_vaccination=[0, 30, 60, 60])
+
+        Returns:
+            np.ndarray: measurements for each timestamp (shape (len(t), 5*n_groups))
+        """
+        restart = self.restart_time(**changes)
+        y = np.array(self.y)
+        if stats is not None:
+            stats["restart"] = restart
+        if restart is None:
+            self.stats["reused_rows"] += len(self.t)
+            return y
+        suffix = self.t >= restart
+        n_suffix = int(np.count_nonzero(suffix))
+        t_suffix = np.concatenate([[restart], self.t[suffix & (self.t > restart)]]) # the restart is always the first time
+        params = {**self.base, **changes, "stats": stats}
+        if restart > self.t[0]: # a scenario diverging at t[0] keeps its own initial conditions
+            params["x0"] = self.checkpoints[restart]
+        y_suffix = sirvd_solver(t_suffix, **params, checkpoint_interval=self.checkpoint_interval)
+        y[suffix] = y_suffix[len(t_suffix) - n_suffix:]
+        self.stats["solves"] += 1
+        self.stats["reused_rows"] += len(self.t) - n_suffix
+        self.stats["solved_rows"] += n_suffix
+        return y
@@ -1,5 +1,7 @@
 import numpy as np
 from sirvd_solver import sirvd_solver
+from scenario_runner import scenario_grid, run_scenarios_results
+from results import SimulationResults
 import plot_result as plt
 
 
@@ -36,15 +38,11 @@ if __name__ == "__main__":
 
     # ---------- FUNCTION CALL WITH SAME VACCINATION STRATEGY ----------
 
-    results_dict = {}
     x_0 = [*S_0_GROUP, *I_0_GROUP, *R_0_GROUP, *V_0_GROUP, *D_0_GROUP] # unpacking list operator
     y = sirvd_solver(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x_0, START_VACCINATION_GROUP)
-    _, n_total_column = y.shape
-    n_groups = len(group_dict) # number of age groups
-    n_compartments = int(n_total_column/n_groups) # number of compartments of the model
-    for group_name, group_id in group_dict.items():
-        # select the right columns (the compartments) for each age group 
-        results_dict[group_name] = y[:,[group_id+n_groups*j for j in range(0,n_compartments)]]
+    results = SimulationResults(t, ["single_strategy"], group_dict) # one array (strategy, time, compartment, group)
+    results.set("single_strategy", y)
+    results_dict = results.results_dict("single_strategy") # views with the compartments of each age group (no copies)
 
     # ---------- SOME PLOT EXPERIMENTS WITH ABOVE FUNCTION CALL ----------
 
@@ -84,24 +82,20 @@ if __name__ == "__main__":
         "vaccination_strategy_descending_order": 2,
         "vaccination_strategy_same_time": 3
     }
-    results_dict = {}
     x_0 = [*S_0_GROUP, *I_0_GROUP, *R_0_GROUP, *V_0_GROUP, *D_0_GROUP] # unpacking list operator
-    for vacc_name, vacc_id in vaccination_dict.items():
-        results_dict[vacc_name] = {}
-        if(vacc_id == 1): # ascending order
-            START_VACCINATION_GROUP = [0, 30, 60, 90]
-        elif(vacc_id == 2): # descending order
-            START_VACCINATION_GROUP = [90, 60, 30, 0]
-        elif(vacc_id == 3): # same time
-            START_VACCINATION_GROUP = [0, 0, 0, 0]
-            eta_group = [0.0025, 0.0025, 0.0025, 0.0025]
-        y = sirvd_solver(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x_0, START_VACCINATION_GROUP)
-        _, n_total_column = y.shape
-        n_groups = len(group_dict) # number of age groups
-        n_compartments = int(n_total_column/n_groups) # number of compartments of the model
-        for group_name, group_id in group_dict.items():
-            # select the right columns (the compartments) for each age group 
-            results_dict[vacc_name][group_name] = y[:,[group_id+n_groups*j for j in range(0,n_compartments)]]
+    base_params = {
+        "beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho,
+        "eta_group": eta_group, "x0": x_0, "start_vaccination": START_VACCINATION_GROUP
+    }
+    scenarios = scenario_grid(explicit={
+        "no_vaccination": {}, # START_VACCINATION_GROUP defined above
+        "vaccination_strategy_ascending_order": {"start_vaccination": [0, 30, 60, 90]},
+        "vaccination_strategy_descending_order": {"start_vaccination": [90, 60, 30, 0]},
+        "vaccination_strategy_same_time": {"start_vaccination": [0, 0, 0, 0], "eta_group": [0.0025, 0.0025, 0.0025, 0.0025]}
+    })
+    # each scenario is solved in a separate process, results_dict[vacc_name][group_name] as in the single strategy case
+    results = run_scenarios_results(t, base_params, scenarios, group_dict)
+    results_dict = results.results_dict()
 
     # ---------- SOME PLOT EXPERIMENTS WITH ABOVE FUNCTION CALL ----------
 
@@ -0,0 +1,156 @@
+import numpy as np
+from sirvd_solver import N_COMPARTMENTS, new_infections
+
+# Every metric takes measurements with shape (..., time, compartment, group), e.g. SimulationResults.data
+# (strategy, time, compartment, group) or the output of sirvd_solver_batch reshaped to (batch, time, 5, n_groups),
+# and reduces the time axis for all the leading axes and the groups at once. Use population to get the same
+# metrics for the entire population (one group).
+
+def population(data, weights = None):
+    """Population-weighted aggregate of all groups, kept as a single group
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        weights (list, optional): fraction of the population in each group. Defaults to None (same size for all groups).
+
+    Returns:
+        np.ndarray: measurements with shape (..., len(t), 5, 1)
+    """
+    n_groups = data.shape[-1]
+    weights = np.full(n_groups, 1/n_groups) if weights is None else np.asarray(weights, dtype=float)/np.sum(weights)
+    return np.dot(data.reshape(-1, n_groups), weights).reshape(data.shape[:-1] + (1,))
+
+def first_index(mask, axis = -1):
+    """Index of the first True along an axis
+
+    Returns:
+        np.ndarray: indices, -1 where mask is never True
+    """
+    idx = mask.argmax(axis=axis) # 0 also when mask is never True, checked on the element it points to
+    found = np.take_along_axis(mask, np.expand_dims(idx, axis), axis=axis)
+    return np.where(np.squeeze(found, axis=axis), idx, -1)
+
+def _at_time(idx, t):
+    """Convert indices of the time axis to times (nan where the index is -1), unchanged if t is None"""
+    if t is None:
+        return idx
+    return np.where(idx >= 0, np.asarray(t, dtype=float)[idx], np.nan)
+
+def zero_day(data, compartment_id = 1, abs_tol = 1e-5, t = None):
+    """'Zero Day': first day with no change of a compartment from the day before, i.e. zero new infections (or deaths)
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        compartment_id (int, optional): id of the compartment. Defaults to 1 (Infectious).
+        abs_tol (float, optional): largest change considered zero. Defaults to 1e-5.
+        t (np.ndarray, optional): simulation time. Defaults to None (indices of the time axis).
+
+    Returns:
+        np.ndarray: day (index, -1 if there is none, or time, nan if there is none) with shape (..., n_groups)
+    """
+    measurements = data[..., compartment_id, :]
+    still = np.abs(np.diff(measurements, axis=-2)) <= abs_tol
+    idx = first_index(still, axis=-2)
+    return _at_time(np.where(idx >= 0, idx + 1, -1), t)
+
+def eradication_day(data, threshold = 1e-6, t = None):
+    """First day with a fraction of infectious not greater than a threshold
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        threshold (float, optional): fraction of infectious considered eradication. Defaults to 1e-6.
+        t (np.ndarray, optional): simulation time. Defaults to None (indices of the time axis).
+
+    Returns:
+        np.ndarray: day (index, -1 if the disease is never eradicated, or time, nan if it is never eradicated) with shape (..., n_groups)
+    """
+    return _at_time(first_index(data[..., 1, :] <= threshold, axis=-2), t)
+
+def peak(data, compartment_id = 1, t = None):
+    """Time and height of the peak of a compartment
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        compartment_id (int, optional): id of the compartment. Defaults to 1 (Infectious).
+        t (np.ndarray, optional): simulation time. Defaults to None (indices of the time axis).
+
+    Returns:
+        tuple: (day of the peak, height of the peak), both with shape (..., n_groups)
+    """
+    measurements = data[..., compartment_id, :]
+    idx = measurements.argmax(axis=-2)
+    return _at_time(idx, t), np.take_along_axis(measurements, idx[..., None, :], axis=-2)[..., 0, :]
+
+def cumulative_infections(data, t, gamma):
+    """New infections over the whole period, the sum of new_infections between the output times
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        t (np.ndarray): simulation time
+        gamma (float): recovery coefficient (or an array with the leading shape of data, one value for each run)
+
+    Returns:
+        np.ndarray: cumulative infections with shape (..., n_groups)
+    """
+    return new_infections(data, t, gamma).sum(axis=-2)
+
+def attack_rate(data, t, gamma):
+    """Cumulative infections divided by the initial size of the group (S+I+R+V); with loss of immunity people can be
+    infected more than once, so it can be greater than 1
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        t (np.ndarray): simulation time
+        gamma (float): recovery coefficient (or an array with the leading shape of data)
+
+    Returns:
+        np.ndarray: attack rate with shape (..., n_groups)
+    """
+    return cumulative_infections(data, t, gamma)/data[..., 0, :N_COMPARTMENTS-1, :].sum(axis=-2)
+
+def cumulative_deaths(data):
+    """Deaths over the whole period
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+
+    Returns:
+        np.ndarray: cumulative deaths with shape (..., n_groups)
+    """
+    return data[..., -1, 4, :] - data[..., 0, 4, :]
+
+def summarize(data, t, gamma, weights = None, chunk_size = 4096):
+    """All the metrics for each group and for the entire population, computed in chunks of the first axis
+    (so a memory-mapped sweep larger than the RAM is read once)
+
+    Args:
+        data (np.ndarray): measurements with shape (runs, len(t), 5, n_groups), e.g. SimulationResults.data
+        t (np.ndarray): simulation time
+        gamma (float): recovery coefficient (or an array with shape (runs,))
+        weights (list, optional): fraction of the population in each group. Defaults to None (same size for all groups).
+        chunk_size (int, optional): number of runs in memory at the same time. Defaults to 4096.
+
+    Returns:
+        dict: {"groups": {metric: array with shape (runs, n_groups)}, "population": {metric: array with shape (runs,)}}
+            with metrics zero_day_infections, zero_day_deaths, eradication_day, peak_time, peak_height, attack_rate, cumulative_deaths
+            (days as times of t, nan if they do not exist)
+    """
+    gamma = np.broadcast_to(np.asarray(gamma, dtype=float), data.shape[:1])
+    summary = {"groups": {}, "population": {}}
+    for start in range(0, len(data), chunk_size):
+        chunk = np.asarray(data[start:start+chunk_size])
+        chunk_gamma = gamma[start:start+chunk_size]
+        for level, values in (("groups", chunk), ("population", population(chunk, weights))):
+            peak_time, peak_height = peak(values, t=t)
+            metrics = {
+                "zero_day_infections": zero_day(values, 1, t=t),
+                "zero_day_deaths": zero_day(values, 4, t=t),
+                "eradication_day": eradication_day(values, t=t),
+                "peak_time": peak_time,
+                "peak_height": peak_height,
+                "attack_rate": attack_rate(values, t, chunk_gamma),
+                "cumulative_deaths": cumulative_deaths(values),
+            }
+            for name, value in metrics.items():
+                summary[level].setdefault(name, []).append(value if level == "groups" else value[..., 0])
+    return {level: {name: np.concatenate(values) for name, values in metrics.items()} for level, metrics in summary.items()}
@@ -0,0 +1,232 @@
+import numpy as np
+from dormand_prince import DOPRI_A, DOPRI_B, DOPRI_E
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError: # numba is an optional dependency, sirvd_solver falls back to SciPy without it
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+NUMBA_METHODS = {"RK4": 0, "DOPRI5": 1, "ImplicitEuler": 2}
+NUMBA_ALIASES = {"RK45": "DOPRI5"} # solve_ivp name of the same Dormand-Prince pair
+SCIPY_FALLBACK = {"RK4": "RK45", "DOPRI5": "RK45", "ImplicitEuler": "BDF"} # closest solve_ivp method when numba is missing
+# status returned by _integrate, the failures stop the integration and are raised by solve_segment
+SUCCESS, STEP_TOO_SMALL, NOT_FINITE, NOT_CONVERGED = 0, 1, 2, 3
+STATUS_MESSAGES = {
+    STEP_TOO_SMALL: "required step size is less than spacing between numbers",
+    NOT_FINITE: "the state is not finite",
+    NOT_CONVERGED: "Newton iterations of the implicit Euler method did not converge (try more substeps)",
+}
+
+@njit(cache=True)
+def _rhs(x, out, beta_matrix, gamma, mu_group, phi, rho, eta):
+    """Derivatives of the SIRVSD model (eta is constant on the segment being integrated)"""
+    n = len(mu_group)
+    for j in range(n):
+        force = 0.0
+        for k in range(n):
+            force += beta_matrix[j, k]*x[n+k]
+        s, i, r, v = x[j], x[n+j], x[2*n+j], x[3*n+j]
+        infections = s*force
+        out[j] = phi*r - eta[j]*s + rho*v - infections # dsdt
+        out[n+j] = infections - (gamma + mu_group[j])*i # didt
+        out[2*n+j] = gamma*i - phi*r # drdt
+        out[3*n+j] = eta[j]*s - rho*v # dvdt
+        out[4*n+j] = mu_group[j]*i # dddt
+
+@njit(cache=True)
+def _jacobian(x, jac, beta_matrix, gamma, mu_group, phi, rho, eta):
+    """Analytic Jacobian of _rhs with respect to x"""
+    n = len(mu_group)
+    jac[:, :] = 0.0
+    for j in range(n):
+        force = 0.0
+        for k in range(n):
+            force += beta_matrix[j, k]*x[n+k]
+            jac[j, n+k] = -x[j]*beta_matrix[j, k] # dS/dI
+            jac[n+j, n+k] = x[j]*beta_matrix[j, k] # dI/dI
+        jac[j, j] = -eta[j] - force # dS/dS
+        jac[j, 2*n+j] = phi # dS/dR
+        jac[j, 3*n+j] = rho # dS/dV
+        jac[n+j, j] = force # dI/dS
+        jac[n+j, n+j] -= gamma + mu_group[j]
+        jac[2*n+j, n+j] = gamma # dR/dI
+        jac[2*n+j, 2*n+j] = -phi # dR/dR
+        jac[3*n+j, j] = eta[j] # dV/dS
+        jac[3*n+j, 3*n+j] = -rho # dV/dV
+        jac[4*n+j, n+j] = mu_group[j] # dD/dI
+
+@njit(cache=True)
+def _solve_in_place(a, b):
+    """Gaussian elimination with partial pivoting, the solution of a @ x = b is written in b (a is overwritten)"""
+    m = len(b)
+    for col in range(m):
+        pivot = col
+        for row in range(col+1, m):
+            if abs(a[row, col]) > abs(a[pivot, col]):
+                pivot = row
+        if pivot != col:
+            for j in range(m):
+                a[col, j], a[pivot, j] = a[pivot, j], a[col, j]
+            b[col], b[pivot] = b[pivot], b[col]
+        for row in range(col+1, m):
+            factor = a[row, col]/a[col, col]
+            if factor != 0.0:
+                for j in range(col, m):
+                    a[row, j] -= factor*a[col, j]
+                b[row] -= factor*b[col]
+    for row in range(m-1, -1, -1):
+        total = b[row]
+        for j in range(row+1, m):
+            total -= a[row, j]*b[j]
+        b[row] = total/a[row, row]
+
+@njit(cache=True)
+def _all_finite(x):
+    for c in range(len(x)):
+        if not np.isfinite(x[c]):
+            return False
+    return True
+
+@njit(cache=True)
+def _integrate(t_eval, x0, y, beta_matrix, gamma, mu_group, phi, rho, eta, method_id, substeps, rtol, atol):
+    """Integrate one smooth segment in a single nopython loop, writing the state at every t_eval in y.
+
+    Returns:
+        tuple: number of evaluations of the right-hand side, status (SUCCESS or a failure of STATUS_MESSAGES)
+            and the time reached (the rows of y after it are not written on failure)
+    """
+    m = len(x0)
+    x = x0.copy()
+    y[0] = x
+    nfev = 0
+    k = np.empty((7, m))
+    stage = np.empty(m)
+    x_new = np.empty(m)
+    jac = np.empty((m, m))
+    h_adaptive = 0.0
+    if method_id == 1:
+        _rhs(x, k[0], beta_matrix, gamma, mu_group, phi, rho, eta)
+        nfev += 1
+    for idx in range(1, len(t_eval)):
+        t0, t1 = t_eval[idx-1], t_eval[idx]
+        if method_id == 0: # RK4
+            h = (t1 - t0)/substeps
+            for _ in range(substeps):
+                _rhs(x, k[0], beta_matrix, gamma, mu_group, phi, rho, eta)
+                for c in range(m):
+                    stage[c] = x[c] + h/2*k[0, c]
+                _rhs(stage, k[1], beta_matrix, gamma, mu_group, phi, rho, eta)
+                for c in range(m):
+                    stage[c] = x[c] + h/2*k[1, c]
+                _rhs(stage, k[2], beta_matrix, gamma, mu_group, phi, rho, eta)
+                for c in range(m):
+                    stage[c] = x[c] + h*k[2, c]
+                _rhs(stage, k[3], beta_matrix, gamma, mu_group, phi, rho, eta)
+                for c in range(m):
+                    x[c] += h/6*(k[0, c] + 2*k[1, c] + 2*k[2, c] + k[3, c])
+                nfev += 4
+            if not _all_finite(x):
+                return nfev, NOT_FINITE, t0
+        elif method_id == 1: # DOPRI5, steps clipped at the output times
+            t = t0
+            h = h_adaptive if h_adaptive > 0 else t1 - t0
+            while t < t1:
+                if h < 10*np.abs(np.nextafter(t, np.inf) - t): # same minimum step of solve_ivp
+                    return nfev, STEP_TOO_SMALL, t
+                last = h >= t1 - t
+                if last:
+                    h = t1 - t
+                for s in range(1, 6):
+                    for c in range(m):
+                        dx = 0.0
+                        for j in range(s):
+                            dx += DOPRI_A[s, j]*k[j, c]
+                        stage[c] = x[c] + h*dx
+                    _rhs(stage, k[s], beta_matrix, gamma, mu_group, phi, rho, eta)
+                for c in range(m):
+                    dx = 0.0
+                    for s in range(6):
+                        dx += DOPRI_B[s]*k[s, c]
+                    x_new[c] = x[c] + h*dx
+                _rhs(x_new, k[6], beta_matrix, gamma, mu_group, phi, rho, eta)
+                nfev += 6
+                error_norm = 0.0
+                for c in range(m):
+                    error = 0.0
+                    for s in range(7):
+                        error += DOPRI_E[s]*k[s, c]
+                    error *= h/(atol + max(abs(x[c]), abs(x_new[c]))*rtol)
+                    error_norm += error*error
+                error_norm = np.sqrt(error_norm/m)
+                if not np.isfinite(error_norm):
+                    return nfev, NOT_FINITE, t
+                if error_norm < 1:
+                    t = t1 if last else t + h
+                    x[:] = x_new
+                    k[0] = k[6] # first same as last
+                    factor = 10.0 if error_norm == 0 else min(10.0, 0.9*error_norm**-0.2)
+                else:
+                    factor = max(0.2, 0.9*error_norm**-0.2)
+                h *= factor
+            h_adaptive = h
+        else: # implicit Euler, Newton iterations with the analytic Jacobian
+            h = (t1 - t0)/substeps
+            for _ in range(substeps):
+                x_new[:] = x
+                converged = False
+                for _ in range(10):
+                    _rhs(x_new, k[0], beta_matrix, gamma, mu_group, phi, rho, eta)
+                    _jacobian(x_new, jac, beta_matrix, gamma, mu_group, phi, rho, eta)
+                    nfev += 1
+                    for c in range(m):
+                        stage[c] = x_new[c] - x[c] - h*k[0, c] # residual of the implicit equation
+                        for j in range(m):
+                            jac[c, j] = -h*jac[c, j]
+                        jac[c, c] += 1.0
+                    _solve_in_place(jac, stage) # Newton step
+                    converged = True
+                    for c in range(m):
+                        x_new[c] -= stage[c]
+                        if not abs(stage[c]) <= atol + rtol*abs(x_new[c]): # also False for nan
+                            converged = False
+                    if converged:
+                        break
+                if not converged: # a diverging or slow iteration is never accepted as the new state
+                    return nfev, NOT_CONVERGED if _all_finite(x_new) else NOT_FINITE, t0
+                x[:] = x_new
+        y[idx] = x
+    return nfev, SUCCESS, t_eval[-1]
+
+def solve_segment(t_eval, x0, beta_matrix, gamma, mu_group, phi, rho, eta_group, method = "DOPRI5", substeps = 1, rtol = 1e-3, atol = 1e-6, **unused):
+    """Integrate one smooth segment with the compiled kernel (same parameters returned by sirvd_solver.segment_parameters)
+
+    Args:
+        t_eval (np.ndarray): output times of the segment (first one is the initial time)
+        x0 (np.ndarray): state at t_eval[0]
+        method (str, optional): "RK4", "DOPRI5" (alias "RK45") or "ImplicitEuler". Defaults to "DOPRI5".
+        substeps (int, optional): fixed steps between two output times for RK4 and ImplicitEuler. Defaults to 1.
+
+    Returns:
+        tuple: measurements at t_eval (shape (len(t_eval), 5*n_groups)) and number of evaluations of the right-hand side
+
+    Raises:
+        ValueError: if the state is not finite, the step size of DOPRI5 becomes too small or the Newton iterations
+            of ImplicitEuler do not converge
+    """
+    method = NUMBA_ALIASES.get(method, method)
+    if method not in NUMBA_METHODS:
+        raise ValueError("Unknown method "+method+" for the numba backend (expected one of "+", ".join(NUMBA_METHODS)+")")
+    x0 = np.asarray(x0, dtype=float)
+    if not np.all(np.isfinite(x0)):
+        raise ValueError("All components of the initial state x0 must be finite")
+    y = np.empty((len(t_eval), len(x0)))
+    nfev, status, t_failure = _integrate(np.asarray(t_eval, dtype=float), x0, y,
+                      np.ascontiguousarray(beta_matrix, dtype=float), float(gamma), np.asarray(mu_group, dtype=float),
+                      float(phi), float(rho), np.asarray(eta_group, dtype=float),
+                      NUMBA_METHODS[method], int(substeps), float(rtol), float(atol))
+    if status != SUCCESS:
+        raise ValueError("Integration with "+method+" failed at t="+str(t_failure)+": "+STATUS_MESSAGES[status])
+    return y, nfev
@@ -0,0 +1,78 @@
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+import plot_result
+import metrics
+from solver_cache import hash_update
+
+def _init_worker():
+    """Executor initializer: non-interactive backend, so the workers never open a window"""
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+
+def _render(function_name, kwargs):
+    """Draw one plot of plot_result without showing it (its figures are closed by the plot function)
+
+    Returns:
+        list: paths of the saved images
+    """
+    return getattr(plot_result, function_name)(show=False, **kwargs)
+
+def job_key(function_name, kwargs):
+    """Hash of a plot job: inputs of the plot function, the source code of plot_result and of metrics (the plot functions,
+    their helpers and the metrics they draw), PLOT_VERSION and the matplotlib version, so a changed plot, helper or style renders again
+
+    Args:
+        function_name (str): name of a plot function of plot_result
+        kwargs (dict): keyword arguments of the plot function (the path included)
+
+    Returns:
+        str: hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256(function_name.encode())
+    digest.update(f"{plot_result.PLOT_VERSION} {matplotlib.__version__}".encode())
+    for module in (plot_result, metrics):
+        digest.update(inspect.getsource(module).encode())
+    hash_update(digest, kwargs)
+    return digest.hexdigest()
+
+def render_batch(jobs, manifest = None, max_workers = None):
+    """Render many plots of plot_result headless on a pool of processes, skipping the ones whose inputs did not change
+    and whose images are all still on disk.
+
+    Args:
+        jobs (list): (function_name, kwargs) for each plot, kwargs must include the path of the images
+        manifest (str, optional): json file with the key of each rendered job (see job_key) and the paths of its images.
+            Defaults to None (render all).
+        max_workers (int, optional): number of processes. Defaults to None (number of CPUs).
+
+    Returns:
+        dict: number of "rendered" and "skipped" jobs
+    """
+    keys = [job_key(function_name, kwargs) for function_name, kwargs in jobs]
+    done = {}
+    if manifest is not None and os.path.exists(manifest):
+        with open(manifest) as manifest_file:
+            done = json.load(manifest_file)
+        if not isinstance(done, dict): # manifest without the paths of the images, everything is rendered again
+            done = {}
+    # a job is done only if all its images still exist, otherwise its entry is dropped and it is rendered again
+    done = {key: images for key, images in done.items() if all(os.path.exists(image) for image in images)}
+    pending = [idx for idx, key in enumerate(keys) if key not in done]
+    rendered = {}
+    try:
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(pending)), initializer=_init_worker) as executor:
+                futures = {executor.submit(_render, *jobs[idx]): idx for idx in pending}
+                for future in as_completed(futures):
+                    rendered[keys[futures[future]]] = future.result()
+    finally:
+        if manifest is not None:
+            # only the jobs of this batch are kept, so the manifest does not grow with old inputs
+            entries = {**done, **rendered}
+            with open(manifest, "w") as manifest_file:
+                json.dump({key: entries[key] for key in sorted(set(keys)) if key in entries}, manifest_file)
+    return {"rendered": len(rendered), "skipped": len(keys) - len(pending)}
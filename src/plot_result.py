@@ -1,8 +1,58 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import math
+import metrics
 
-def plot_all_compartments_age_group(t, group_dict, results_dict, path = None):
+PLOT_VERSION = 1 # part of the keys of plot_batch, to be increased when the style of the plots changes outside this module and metrics
+
+def _figure(fig = None, figsize = (20,5)):
+    """Figure for the next plot: a given figure is reused (its axes are cleared), otherwise a new one is created
+
+    Args:
+        fig (matplotlib.figure.Figure, optional): figure to reuse. Defaults to None.
+        figsize (tuple, optional): size of a new figure. Defaults to (20,5).
+
+    Returns:
+        matplotlib.figure.Figure: current figure
+    """
+    if fig is None:
+        return plt.figure(figsize=figsize)
+    plt.figure(fig.number) # make it the current figure
+    plt.cla()
+    return fig
+
+def _finish(fig, image_path = None, show = True, close = True):
+    """Save, show and close a figure
+
+    Args:
+        fig (matplotlib.figure.Figure): figure to finish
+        image_path (str, optional): path to save the figure as an image. Defaults to None.
+        show (bool, optional): show the figure (False for batch rendering). Defaults to True.
+        close (bool, optional): close the figure to release its memory. Defaults to True.
+
+    Returns:
+        list: path of the saved image (empty if image_path is None)
+    """
+    saved = []
+    if image_path is not None:
+        # Saving the figure.
+        fig.savefig(image_path)
+        saved.append(image_path)
+    if show:
+        plt.show()
+    if close:
+        plt.close(fig)
+    return saved
+
+def _entire_population(group_dict, results_dict, weights = None):
+    """Population-weighted aggregate of the age groups of results_dict (same as SimulationResults.population)
+
+    Returns:
+        np.ndarray: measurements of the entire population with shape (len(t), 5), between 0 and 1
+    """
+    data = np.stack([results_dict[group] for group in group_dict], axis=-1) # (len(t), 5, n_groups)
+    return metrics.population(data, weights)[..., 0]
+
+def plot_all_compartments_age_group(t, group_dict, results_dict, path = None, show = True):
     """Line plot to show all compartment for a specific age group
 
     Args:
@@ -10,9 +60,14 @@ def plot_all_compartments_age_group(t, group_dict, results_dict, path = None):
         group_dict (dict): definition of all age groups
         results_dict (dict): dictionary with all measurements for each timestamp and for each age group (shape (len(t), #compartments) for each dict_item)
         path (str, optional): path to save plots as an image. Defaults to None.
+        show (bool, optional): show the plots, otherwise one figure is reused for all age groups. Defaults to True.
+
+    Returns:
+        list: paths of the saved images (empty without path)
     """
+    fig, saved = None, []
     for group in group_dict:
-        plt.figure(figsize=(20,5))
+        fig = _figure(None if show else fig)
         plt.plot(t, results_dict[group][:, 0], 'g', label='S(t)')
         plt.plot(t, results_dict[group][:, 1], 'm', label='I(t)')
         plt.plot(t, results_dict[group][:, 2], 'r', label='R(t)')
@@ -25,12 +80,12 @@ def plot_all_compartments_age_group(t, group_dict, results_dict, path = None):
         plt.ylabel('value')
         plt.title(group)
         plt.grid()
-        if path is not None:
-            # Saving the figure.
-            plt.savefig(path+group+".jpg")
-        plt.show()
+        saved += _finish(fig, path+group+".jpg" if path is not None else None, show, close=show)
+    if fig is not None:
+        plt.close(fig)
+    return saved
 
-def plot_all_compartments_entire_population(t, group_dict, results_dict, length_period, path = None, eradication = False):
+def plot_all_compartments_entire_population(t, group_dict, results_dict, length_period, path = None, eradication = False, show = True, weights = None):
     """Line plot to show all compartment for the whole population
 
     Args:
@@ -40,14 +95,16 @@ def plot_all_compartments_entire_population(t, group_dict, results_dict, length_
         length_period (int): duration of the observation period
         path (str, optional): path to save plots as an image. Defaults to None.
         eradication (bool, optional): if we want to see also indicated the day of eradication of the disease. Defaults to False.
+        show (bool, optional): show the plot (False for batch rendering). Defaults to True.
+        weights (list, optional): fraction of the population in each age group. Defaults to None (same size for all groups).
+
+    Returns:
+        list: paths of the saved images (empty without path)
     """
     eradication_disease_day = None
     space_values_time = 10 # spacing between values
-    population = np.zeros((length_period, 5))
-    for group in group_dict:
-        population += results_dict[group]
-    population = population/4 # values have to remain between 0 and 1
-    plt.figure(figsize=(20,5))
+    population = _entire_population(group_dict, results_dict, weights) # values have to remain between 0 and 1
+    fig = _figure()
     plt.plot(t, population[:, 0], 'g', label='S(t)')
     plt.plot(t, population[:, 1], 'm', label='I(t)')
     plt.plot(t, population[:, 2], 'r', label='R(t)')
@@ -55,11 +112,9 @@ def plot_all_compartments_entire_population(t, group_dict, results_dict, length_
     plt.plot(t, population[:, 4], 'k', label='D(t)')
     if eradication:
         space_values_time = 30 # we expected the eradication of the disease after some years, so we study the curve month by month
-        measurements = population[:, 1].T # transpose the measurements to work with a 1-D array
-        for idx, x in np.ndenumerate(measurements):
-            if x <= 1e-6: # very very little fraction of infectious w.r.t the whole population
-                eradication_disease_day = idx[0]
-                break
+        day = metrics.eradication_day(population[:, :, None], threshold=1e-6)[0] # very very little fraction of infectious w.r.t the whole population
+        if day >= 0:
+            eradication_disease_day = day
     plt.legend(loc='best')
     plt.xticks(np.arange(t.min(), t.max()+1, space_values_time))
     plt.yticks(np.arange(0, 1.005, 0.05))
@@ -69,12 +124,9 @@ def plot_all_compartments_entire_population(t, group_dict, results_dict, length_
     plt.grid()
     if eradication_disease_day is not None:
         plt.annotate('Eradication disease', xy=(eradication_disease_day, 0), xytext=(180, 0.85), arrowprops=dict(facecolor='black', arrowstyle='->'),)
-    if path is not None:
-        # Saving the figure.
-        plt.savefig(path+".jpg")
-    plt.show()
+    return _finish(fig, path+".jpg" if path is not None else None, show)
 
-def plot_specific_compartment_all_age_group(t, group_dict, vacc_strategy, results_dict, compartment_id, path = None):
+def plot_specific_compartment_all_age_group(t, group_dict, vacc_strategy, results_dict, compartment_id, path = None, show = True):
     """Line plot to show a specific compartments for all age group to compare the measurements for a specific vaccination strategy.
 
     Args:
@@ -84,8 +136,12 @@ def plot_specific_compartment_all_age_group(t, group_dict, vacc_strategy, result
         results_dict (dict): dict with all measurements for each vaccination strategy for each age group
         compartment_id (int): id of the compartment
         path (str, optional): path to save plots as an image. Defaults to None.
+        show (bool, optional): show the plot (False for batch rendering). Defaults to True.
+
+    Returns:
+        list: paths of the saved images (empty without path)
     """
-    plt.figure(figsize=(20,5))
+    fig = _figure()
     if compartment_id == 1: # Infectious
         comp_label = 'I(t)_'
         image_path = "/infectious_comparison.jpg"
@@ -103,12 +159,9 @@ def plot_specific_compartment_all_age_group(t, group_dict, vacc_strategy, result
     plt.ylabel('value')
     plt.title(graph_title+vacc_strategy)
     plt.grid()
-    if path is not None:
-        # Saving the figure.
-        plt.savefig(path+vacc_strategy+image_path)
-    plt.show()
+    return _finish(fig, path+vacc_strategy+image_path if path is not None else None, show)
 
-def plot_specific_compartment_compare_strategy(t, results_dict, compartment_id, length_period, path = None):
+def plot_specific_compartment_compare_strategy(t, results_dict, compartment_id, length_period, path = None, show = True, weights = None):
     """Line plot to compare a specific compartment with different vaccination strategies.
 
     Args:
@@ -117,6 +170,11 @@ def plot_specific_compartment_compare_strategy(t, results_dict, compartment_id,
         compartment_id (int): id of the compartment
         length_period (int): duration of the observation period
         path (str, optional): path to save plots as an image. Defaults to None.
+        show (bool, optional): show the plot (False for batch rendering). Defaults to True.
+        weights (list, optional): fraction of the population in each age group. Defaults to None (same size for all groups).
+
+    Returns:
+        list: paths of the saved images (empty without path)
     """
     population = {}
     if compartment_id == 1: # Infectious
@@ -132,11 +190,8 @@ def plot_specific_compartment_compare_strategy(t, results_dict, compartment_id,
         graph_title = "Mortality comparison - "
         image_path = "/deaths_comparison.jpg"
     for vacc_strategy, item_age_group in results_dict.items():
-        population[vacc_strategy] = np.zeros((length_period))
-        for age_group, values in item_age_group.items():
-            population[vacc_strategy] += values[:, compartment_id]
-        population[vacc_strategy] = population[vacc_strategy]/4 # values have to remain between 0 and 1
-    plt.figure(figsize=(20,5))
+        population[vacc_strategy] = _entire_population(item_age_group, item_age_group, weights)[:, compartment_id] # values have to remain between 0 and 1
+    fig = _figure()
     for vacc_strategy in results_dict:
         plt.plot(t, population[vacc_strategy], label=comp_label+vacc_strategy)
     plt.legend(loc='best')
@@ -146,12 +201,9 @@ def plot_specific_compartment_compare_strategy(t, results_dict, compartment_id,
     plt.ylabel('value')
     plt.title(graph_title+" entire population")
     plt.grid()
-    if path is not None:
-        # Saving the figure.
-        plt.savefig(path+image_path)
-    plt.show()
+    return _finish(fig, path+image_path if path is not None else None, show)
 
-def plot_pie_chart_zero_day(group_dict, vacc_strategy, results_dict, compartment_id, length_period, path = None):
+def plot_pie_chart_zero_day(group_dict, vacc_strategy, results_dict, compartment_id, length_period, path = None, show = True, weights = None):
     """Pie chart to analyze the situation for each compartment on 'Zero Day',
     i.e. the first day with zero infections (or deaths, depending on compartment_id).
 
@@ -162,6 +214,11 @@ def plot_pie_chart_zero_day(group_dict, vacc_strategy, results_dict, compartment
         compartment_id (int): id of the compartment
         length_period (int): duration of the observation period
         path (str, optional): path to save plots as an image. Defaults to None.
+        show (bool, optional): show the plot (False for batch rendering). Defaults to True.
+        weights (list, optional): fraction of the population in each age group. Defaults to None (same size for all groups).
+
+    Returns:
+        list: paths of the saved images (empty without path or without a zero day)
     """
     if compartment_id == 1: # Infectious
         comp_label = 'infections'
@@ -169,32 +226,23 @@ def plot_pie_chart_zero_day(group_dict, vacc_strategy, results_dict, compartment
     elif compartment_id == 4: # Deceased
         comp_label = 'deaths'
         image_path = "/zero_day_deaths.jpg"
-    zero_day = []
-    population = np.zeros((length_period, 5))
-    for group in group_dict:
-        population += results_dict[group]
-    population = population/4 # values have to remain between 0 and 1
-    measurements = population[:, compartment_id].T # transpose the measurements for a specific compartment
-    for idx, x in np.ndenumerate(measurements):
-        if idx != 0 and math.isclose(x, measurements[idx[0]-1], abs_tol=0.00001):
-            zero_day.append(idx[0]) # use list for any future analysis on the stability of zero infections (or deaths)
-    if zero_day: # check if we actually have a zero day (zero deaths or zero infections in one day)        
+    population = _entire_population(group_dict, results_dict, weights) # values have to remain between 0 and 1
+    zero_day = metrics.zero_day(population[:, :, None], compartment_id, abs_tol=0.00001)[0]
+    if zero_day >= 0: # check if we actually have a zero day (zero deaths or zero infections in one day)
         # Pie chart, where the slices will be ordered and plotted counter-clockwise:
         labels = 'Susceptible', 'Infectious', 'Recovered', 'Vaccinated', 'Deaceased'
-        sizes = population[zero_day[0], :].reshape(-1) # plt.pie require an 1-D array to suppress warnings
+        sizes = population[zero_day, :].reshape(-1) # plt.pie require an 1-D array to suppress warnings
         explode = (0, 0, 0, 0, 0.1)  # only "explode" the fifth slice (i.e. 'Deceased')
         colors = ['g','m','r','b', 'c']
         fig1, ax1 = plt.subplots()
         ax1.pie(sizes, explode=explode, labels=labels, colors=colors, autopct='%1.1f%%',
                 shadow=True, startangle=90)
         ax1.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-        plt.title("'Zero Day' for "+comp_label+" with "+vacc_strategy+" (day "+str(zero_day[0])+") ")
-        if path is not None:
-            # Saving the figure.
-            plt.savefig(path+vacc_strategy+image_path)
-        plt.show()
+        plt.title("'Zero Day' for "+comp_label+" with "+vacc_strategy+" (day "+str(zero_day)+") ")
+        return _finish(fig1, path+vacc_strategy+image_path if path is not None else None, show)
+    return []
 
-def plot_bar_chart_compartment_compare_strategy(group_dict, results_dict, vaccination_dict, compartment_id, length_period, path = None):
+def plot_bar_chart_compartment_compare_strategy(group_dict, results_dict, vaccination_dict, compartment_id, length_period, path = None, show = True, weights = None):
     """Stacked bar chart to analyze a specific compartment and compare different vaccination strategies on the final observation day
 
     Args:
@@ -204,7 +252,14 @@ def plot_bar_chart_compartment_compare_strategy(group_dict, results_dict, vaccin
         compartment_id (int): id of the compartment
         length_period (int): duration of the observation period
         path (str, optional): path to save plots as an image. Defaults to None.
+        show (bool, optional): show the plot (False for batch rendering). Defaults to True.
+        weights (list, optional): fraction of the population in each age group. Defaults to None (same size for all groups).
+
+    Returns:
+        list: paths of the saved images (empty without path)
     """
+    n_groups = len(group_dict)
+    weights = np.full(n_groups, 1/n_groups) if weights is None else np.asarray(weights, dtype=float)/np.sum(weights)
     population = {}
     for age_group in group_dict:
         population[age_group] = []
@@ -227,9 +282,9 @@ def plot_bar_chart_compartment_compare_strategy(group_dict, results_dict, vaccin
     width = 0.35 # the width of the bars
     fig, ax = plt.subplots()
     tmp = [0,None] # tmp variable for a correct bar stacking
-    for age_group in group_dict:
+    for group_idx, age_group in enumerate(group_dict):
         population[age_group] = np.array(population[age_group])
-        population[age_group] = (population[age_group]/4)*100 # percentage values
+        population[age_group] = population[age_group]*weights[group_idx]*100 # percentage of the entire population
         if tmp[0] == 0:
             ax.bar(labels, population[age_group], width,label=comp_label+age_group)
         else:
@@ -239,7 +294,4 @@ def plot_bar_chart_compartment_compare_strategy(group_dict, results_dict, vaccin
     ax.set_ylabel('% of population')
     ax.set_title(graph_title+ " entire population")
     ax.legend()
-    if path is not None:
-        # Saving the figure.
-        plt.savefig(path+image_path)
-    plt.show()
+    return _finish(fig, path+image_path if path is not None else None, show)
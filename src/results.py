@@ -0,0 +1,119 @@
+import json
+import numpy as np
+from sirvd_solver import N_COMPARTMENTS
+
+def npy_path(path):
+    """Path of the .npy file of results (np.save adds the suffix when it is missing, the same is done on load)"""
+    path = str(path)
+    return path if path.endswith(".npy") else path+".npy"
+
+class SimulationResults:
+    """Measurements of a set of strategies stored in one contiguous array with shape (strategy, time, compartment, group).
+
+    Every accessor returns a view on the array, the population aggregates are computed only when requested
+    and kept until the data of the strategy changes. With a path the array is a memory-mapped .npy file,
+    so sweeps larger than the RAM can be written and read back.
+
+    Args:
+        t (np.ndarray): simulation time
+        strategies (list): names of the strategies (vaccination strategies or scenarios)
+        group_dict (dict): definition of all age groups ({group_name: group_id})
+        data (np.ndarray, optional): existing measurements with shape (len(strategies), len(t), 5, len(group_dict)). Defaults to None.
+        path (str, optional): path of the .npy file backing the measurements when data is None (".npy" is added if missing).
+            Defaults to None (in memory).
+    """
+
+    def __init__(self, t, strategies, group_dict, data = None, path = None):
+        self.t = np.asarray(t, dtype=float)
+        self.strategies = {strategy: idx for idx, strategy in enumerate(strategies)}
+        self.group_dict = dict(group_dict)
+        shape = (len(self.strategies), len(self.t), N_COMPARTMENTS, len(self.group_dict))
+        if data is None:
+            if path is None:
+                data = np.zeros(shape)
+            else:
+                path = npy_path(path)
+                data = np.lib.format.open_memmap(path, mode="w+", dtype=float, shape=shape)
+        elif data.shape != shape:
+            raise ValueError("data has shape "+str(data.shape)+", expected "+str(shape))
+        self.data = data
+        self.path = path
+        self._population = {} # lazy aggregates {(strategy, weights): array}
+
+    def set(self, strategy, y):
+        """Store the output of sirvd_solver (shape (len(t), 5*n_groups)) for a strategy"""
+        self.data[self.strategies[strategy]] = np.asarray(y).reshape(len(self.t), N_COMPARTMENTS, len(self.group_dict))
+        self._population = {key: value for key, value in self._population.items() if key[0] != strategy}
+
+    def strategy(self, strategy):
+        """View with shape (len(t), 5, n_groups) of a strategy"""
+        return self.data[self.strategies[strategy]]
+
+    def group(self, strategy, group):
+        """View with shape (len(t), 5) of all the compartments of an age group (same layout of results_dict)"""
+        return self.data[self.strategies[strategy], :, :, self.group_dict[group]]
+
+    def compartment(self, strategy, compartment_id):
+        """View with shape (len(t), n_groups) of a compartment for all age groups"""
+        return self.data[self.strategies[strategy], :, compartment_id, :]
+
+    def population(self, strategy, weights = None):
+        """Population-weighted aggregate of all age groups, computed on the first request
+
+        Args:
+            strategy (str): name of the strategy
+            weights (list, optional): fraction of the population in each age group. Defaults to None (same size for all groups).
+
+        Returns:
+            np.ndarray: measurements of the entire population with shape (len(t), 5)
+        """
+        n_groups = len(self.group_dict)
+        weights = np.full(n_groups, 1/n_groups) if weights is None else np.asarray(weights, dtype=float)/np.sum(weights)
+        key = (strategy, tuple(weights))
+        if key not in self._population:
+            self._population[key] = self.strategy(strategy) @ weights
+        return self._population[key]
+
+    def results_dict(self, strategy = None):
+        """Nested dictionary of views with the layout used by main.py and plot_result.py
+
+        Args:
+            strategy (str, optional): name of a strategy. Defaults to None (all strategies).
+
+        Returns:
+            dict: results_dict[group_name] for one strategy, results_dict[strategy][group_name] otherwise
+        """
+        if strategy is not None:
+            return {group: self.group(strategy, group) for group in self.group_dict}
+        return {name: self.results_dict(name) for name in self.strategies}
+
+    def save(self, path):
+        """Save the measurements in a .npy file and the metadata in the same path + ".json"
+
+        Args:
+            path (str): path of the .npy file, ".npy" is added if missing (if it is the backing file, the memory map is only flushed)
+        """
+        path = npy_path(path)
+        if path == self.path and isinstance(self.data, np.memmap):
+            self.data.flush()
+        else:
+            np.save(path, self.data)
+        with open(path+".json", "w") as metadata:
+            json.dump({"t": self.t.tolist(), "strategies": list(self.strategies), "group_dict": self.group_dict}, metadata)
+
+    @classmethod
+    def load(cls, path, mmap_mode = "r"):
+        """Load results saved with save
+
+        Args:
+            path (str): path given to save (with or without ".npy")
+            mmap_mode (str, optional): memory-map mode of np.load ("r", "r+", "c" or None to read it in memory). Defaults to "r".
+
+        Returns:
+            SimulationResults: results backed by the (memory-mapped) file
+        """
+        path = npy_path(path)
+        with open(path+".json") as metadata:
+            metadata = json.load(metadata)
+        data = np.load(path, mmap_mode=mmap_mode)
+        return cls(metadata["t"], metadata["strategies"], metadata["group_dict"], data=data, path=path if mmap_mode else None)
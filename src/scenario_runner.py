@@ -0,0 +1,127 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from sirvd_solver import sirvd_solver
+from results import SimulationResults
+
+_worker = {} # state of each worker process (shared memory block, simulation time and base parameters)
+
+def scenario_grid(cartesian = None, explicit = None):
+    """Declarative definition of a sweep of scenarios.
+
+    Args:
+        cartesian (dict, optional): for each parameter of sirvd_solver, the values to combine with all the other ones.
+            Values can be a list or a dict {label: value} to get readable scenario names. Defaults to None.
+        explicit (dict, optional): scenarios listed one by one as {scenario_name: {parameter: value}}. Defaults to None.
+
+    Returns:
+        dict: {scenario_name: {parameter: value}} with the parameters overriding the base ones of the sweep
+    """
+    scenarios = {}
+    if explicit is not None:
+        scenarios.update(explicit)
+    if cartesian:
+        axes = []
+        for param_name, values in cartesian.items():
+            if not isinstance(values, dict):
+                values = {str(np.asarray(value).tolist()): value for value in values}
+            axes.append([(param_name, label, value) for label, value in values.items()])
+        for combination in itertools.product(*axes):
+            scenario_name = "_".join(param_name+"="+label for param_name, label, _ in combination)
+            scenarios[scenario_name] = {param_name: value for param_name, _, value in combination}
+    return scenarios
+
+def _init_worker(shm_name, t, base):
+    """Executor initializer: attach to the shared output block once for each worker process"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["t"] = t
+    _worker["base"] = base
+
+def _run_chunk(start_idx, chunk, n_scenarios, n_columns):
+    """Solve a chunk of scenarios and write them directly in the shared output block"""
+    t = _worker["t"]
+    y = np.ndarray((n_scenarios, len(t), n_columns), dtype=float, buffer=_worker["shm"].buf)
+    for offset, overrides in enumerate(chunk):
+        params = {**_worker["base"], **overrides}
+        y[start_idx+offset] = sirvd_solver(t, **params)
+    del y # release the exported buffer before the next chunk
+    return start_idx, len(chunk)
+
+def iter_scenarios(t, base, scenarios, max_workers = None, chunksize = None):
+    """Run sirvd_solver for every scenario on a pool of processes, yielding the results as soon as each chunk is done.
+
+    The workers write the trajectories in a shared memory block, so only the indices of the completed chunks are pickled back.
+
+    Args:
+        t (np.ndarray): simulation time
+        base (dict): keyword arguments of sirvd_solver shared by all scenarios (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+        scenarios (dict): {scenario_name: {parameter: value}} (see scenario_grid)
+        max_workers (int, optional): number of processes. Defaults to None (number of CPUs).
+        chunksize (int, optional): number of scenarios solved by a worker in one task. Defaults to None (about 4 chunks per worker).
+
+    Yields:
+        tuple: (scenario_name, measurements with shape (len(t), 5*n_groups)), in order of completion
+    """
+    names = list(scenarios)
+    chunks = [scenarios[name] for name in names]
+    n_scenarios = len(names)
+    if n_scenarios == 0:
+        return
+    n_columns = len(base["x0"]) if "x0" in base else len(chunks[0]["x0"])
+    max_workers = max_workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, math.ceil(n_scenarios/(4*max_workers)))
+    shm = shared_memory.SharedMemory(create=True, size=n_scenarios*len(t)*n_columns*np.dtype(float).itemsize)
+    y = None
+    try:
+        y = np.ndarray((n_scenarios, len(t), n_columns), dtype=float, buffer=shm.buf)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shm.name, t, base)) as executor:
+            futures = [executor.submit(_run_chunk, start_idx, chunks[start_idx:start_idx+chunksize], n_scenarios, n_columns)
+                       for start_idx in range(0, n_scenarios, chunksize)]
+            for future in as_completed(futures):
+                start_idx, n_done = future.result()
+                for idx in range(start_idx, start_idx+n_done):
+                    yield names[idx], y[idx].copy() # copy out of the shared block before it is released
+    finally:
+        y = None # the block can be closed only when no array points to it
+        shm.close()
+        shm.unlink()
+
+def run_scenarios_results(t, base, scenarios, group_dict, max_workers = None, chunksize = None, path = None):
+    """Run all the scenarios in parallel and collect them in a single SimulationResults.
+
+    Args:
+        t (np.ndarray): simulation time
+        base (dict): keyword arguments of sirvd_solver shared by all scenarios
+        scenarios (dict): {scenario_name: {parameter: value}} (see scenario_grid)
+        group_dict (dict): definition of all age groups
+        max_workers (int, optional): number of processes. Defaults to None (number of CPUs).
+        chunksize (int, optional): number of scenarios solved by a worker in one task. Defaults to None.
+        path (str, optional): .npy file backing the results, for sweeps that do not fit in memory. Defaults to None.
+
+    Returns:
+        SimulationResults: measurements with shape (scenario, time, compartment, group), in the order of scenarios
+    """
+    results = SimulationResults(t, scenarios, group_dict, path=path)
+    for scenario_name, y in iter_scenarios(t, base, scenarios, max_workers, chunksize):
+        results.set(scenario_name, y)
+    return results
+
+def run_scenarios(t, base, scenarios, group_dict, max_workers = None, chunksize = None):
+    """Run all the scenarios in parallel and collect them with the same layout used in main.py.
+
+    Args:
+        t (np.ndarray): simulation time
+        base (dict): keyword arguments of sirvd_solver shared by all scenarios
+        scenarios (dict): {scenario_name: {parameter: value}} (see scenario_grid)
+        group_dict (dict): definition of all age groups
+        max_workers (int, optional): number of processes. Defaults to None (number of CPUs).
+        chunksize (int, optional): number of scenarios solved by a worker in one task. Defaults to None.
+
+    Returns:
+        dict: results_dict[scenario_name][group_name] with shape (len(t), #compartments), views on a single SimulationResults
+    """
+    return run_scenarios_results(t, base, scenarios, group_dict, max_workers, chunksize).results_dict()
@@ -0,0 +1,220 @@
+import numpy as np
+from scipy import sparse
+from scipy.integrate import solve_ivp
+from scipy.optimize import least_squares
+from sirvd_solver import N_COMPARTMENTS, IMPLICIT_METHODS, make_sirvd, iter_segments, segment_parameters, new_infections
+from contacts import contact_operator
+
+DIFFERENTIABLE = ("beta_matrix", "gamma", "mu_group") # parameters with forward sensitivities
+OBSERVATIONS = ("incidence", "deaths") # series that can be fitted by calibrate
+
+def parameter_shapes(n_groups, parameters = DIFFERENTIABLE):
+    """Shape of each differentiable parameter
+
+    Returns:
+        dict: {parameter: shape}
+    """
+    shapes = {"beta_matrix": (n_groups, n_groups), "gamma": (), "mu_group": (n_groups,)}
+    for name in parameters:
+        if name not in shapes:
+            raise ValueError("Unknown parameter "+name+" (expected one of "+", ".join(DIFFERENTIABLE)+")")
+    return {name: shapes[name] for name in parameters}
+
+def check_contacts(beta_matrix, parameters):
+    """Raise ValueError if beta_matrix has to be differentiated but it is a sparse contact operator
+    (one column of sensitivities for every entry of the full matrix, also the zero ones)"""
+    if "beta_matrix" in parameters and not isinstance(contact_operator(beta_matrix), np.ndarray):
+        raise ValueError("The derivatives with respect to beta_matrix need a dense beta_matrix, "
+                         "use parameters=(\"gamma\", \"mu_group\") with sparse or Kronecker contacts")
+
+def make_sirvd_sensitivity(beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination, parameters = DIFFERENTIABLE, frozen = ()):
+    """Build the right-hand side of the SIRVSD model augmented with its forward sensitivity equations
+    dS/dt = J(x) S + df/dparameters, where S = dx/dparameters has one column for each entry of the parameters.
+
+    The augmented state is [x, S.ravel()] with S of shape (5*n_groups, n_parameters).
+
+    Args:
+        parameters (tuple, optional): differentiable parameters, in the order of the columns of S. Defaults to DIFFERENTIABLE.
+        frozen (tuple, optional): parameters replaced by the schedule on this segment, their direct term is zero. Defaults to ().
+        (the other arguments are the ones of make_sirvd)
+
+    Returns:
+        tuple: functions sirvd_sensitivity(t, z) and its block-diagonal Jacobian (J on every column of S) to pass to solve_ivp
+    """
+    check_contacts(beta_matrix, parameters)
+    sirvd, sirvd_jacobian = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    n_groups = len(start_vaccination)
+    n_states = N_COMPARTMENTS*n_groups
+    shapes = parameter_shapes(n_groups, parameters)
+    n_parameters = sum(int(np.prod(shape)) for shape in shapes.values())
+    diag = np.arange(n_groups)
+    beta_rows = np.repeat(diag, n_groups) # entry (j, k) of beta_matrix changes the infections of group j
+    columns = {}
+    offset = 0
+    for name, shape in shapes.items():
+        columns[name] = offset
+        offset += int(np.prod(shape))
+
+    def sirvd_sensitivity(t, z):
+        x = z[:n_states]
+        sensitivity = z[n_states:].reshape(n_states, n_parameters)
+        derivatives = np.empty(len(z))
+        derivatives[:n_states] = sirvd(t, x)
+        d_sensitivity = derivatives[n_states:].reshape(n_states, n_parameters)
+        d_sensitivity[:] = sirvd_jacobian(t, x) @ sensitivity # dense or sparse Jacobian (sparse and Kronecker contacts)
+        s, i = x[:n_groups], x[n_groups:2*n_groups]
+        if "beta_matrix" in columns and "beta_matrix" not in frozen:
+            cols = columns["beta_matrix"] + np.arange(n_groups*n_groups)
+            contacts = (s[:, None]*i[None, :]).ravel() # d(s_j * beta_jk * i_k)/d(beta_jk)
+            d_sensitivity[beta_rows, cols] -= contacts # S
+            d_sensitivity[n_groups + beta_rows, cols] += contacts # I
+        if "gamma" in columns and "gamma" not in frozen:
+            d_sensitivity[n_groups:2*n_groups, columns["gamma"]] -= i # I
+            d_sensitivity[2*n_groups:3*n_groups, columns["gamma"]] += i # R
+        if "mu_group" in columns and "mu_group" not in frozen:
+            d_sensitivity[n_groups + diag, columns["mu_group"] + diag] -= i # I
+            d_sensitivity[4*n_groups + diag, columns["mu_group"] + diag] += i # D
+        return derivatives
+
+    def sirvd_sensitivity_jacobian(t, z):
+        """
+        Jacobian of the augmented system without the derivatives of J(x) and df/dparameters with respect to x
+        (staggered approximation, enough for the Newton iterations of the implicit methods).
+        """
+        jacobian = sparse.csr_matrix(sirvd_jacobian(t, z[:n_states]))
+        return sparse.block_diag([jacobian, sparse.kron(jacobian, sparse.identity(n_parameters))], format="csr")
+
+    return sirvd_sensitivity, sirvd_sensitivity_jacobian
+
+def sirvd_solver_sensitivity(t,beta_matrix,gamma,mu_group,phi,rho,eta_group,x0,start_vaccination,parameters=DIFFERENTIABLE,method="RK45",rtol=1e-6,atol=1e-9,schedule=None,stats=None):
+    """sirvd_solver with the exact derivatives of the trajectory with respect to the parameters, from one integration
+    of the forward sensitivity equations (instead of one more solve for each entry of the parameters with finite differences).
+
+    The integration is split at the same segments of sirvd_solver (iter_segments). A parameter replaced by the schedule
+    has no direct effect on the segments after the change, the derivatives are always with respect to the base values.
+
+    Args:
+        parameters (tuple, optional): any of "beta_matrix", "gamma" and "mu_group". Defaults to DIFFERENTIABLE.
+        method (str, optional): integration method of solve_ivp. Defaults to "RK45".
+        rtol (float, optional): relative tolerance of the integration. Defaults to 1e-6.
+        atol (float, optional): absolute tolerance of the integration. Defaults to 1e-9.
+        (the other arguments are the ones of sirvd_solver)
+
+    Returns:
+        tuple: measurements (shape (len(t), 5*n_groups)) and {parameter: derivatives with shape (len(t), 5*n_groups, *parameter_shape)}
+    """
+    t = np.asarray(t, dtype=float)
+    n_groups = len(start_vaccination)
+    n_states = N_COMPARTMENTS*n_groups
+    shapes = parameter_shapes(n_groups, parameters)
+    n_parameters = sum(int(np.prod(shape)) for shape in shapes.values())
+    params = {"beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho,
+              "eta_group": eta_group, "start_vaccination": start_vaccination}
+    z = np.concatenate([np.asarray(x0, dtype=float), np.zeros(n_states*n_parameters)]) # x0 does not depend on the parameters
+    z_all = np.empty((len(t), len(z)))
+    counters = {"nfev": 0, "njev": 0, "nlu": 0, "n_segments": 0}
+    for seg_start, seg_end, t_eval, in_segment, rows in iter_segments(t, start_vaccination, schedule):
+        frozen = {name for day, changes in (schedule or []) if day <= seg_start for name in changes}
+        seg_params = segment_parameters(seg_start, params, schedule)
+        sirvd_sensitivity, sirvd_sensitivity_jacobian = make_sirvd_sensitivity(**seg_params, parameters=parameters, frozen=frozen)
+        options = {"jac": sirvd_sensitivity_jacobian} if method in IMPLICIT_METHODS else {}
+        sol = solve_ivp(sirvd_sensitivity,[seg_start,seg_end],z,method=method,t_eval=t_eval,rtol=rtol,atol=atol,**options)
+        if not sol.success:
+            raise ValueError("Integration with "+method+" failed on the segment ["+str(seg_start)+", "+str(seg_end)+"]: "+sol.message)
+        z_all[in_segment] = sol.y.T[rows]
+        z = sol.y[:, -1]
+        for counter in ("nfev", "njev", "nlu"):
+            counters[counter] += getattr(sol, counter)
+        counters["n_segments"] += 1
+    if stats is not None:
+        stats.update(counters)
+    y = z_all[:, :n_states]
+    sensitivity = z_all[:, n_states:].reshape(len(t), n_states, n_parameters)
+    derivatives = {}
+    offset = 0
+    for name, shape in shapes.items():
+        size = int(np.prod(shape))
+        derivatives[name] = sensitivity[:, :, offset:offset+size].reshape(len(t), n_states, *shape)
+        offset += size
+    return y, derivatives
+
+def observed_series(y, t, gamma, n_groups):
+    """Incidence and deaths between consecutive timestamps, the series fitted by calibrate
+
+    Args:
+        y (np.ndarray): measurements (shape (len(t), 5*n_groups))
+        t (np.ndarray): simulation time
+        gamma (float): recovery coefficient
+        n_groups (int): number of groups
+
+    Returns:
+        dict: "incidence" (new infections, delta I + gamma * trapezoid integral of I + delta D) and "deaths" (new deaths),
+            both with shape (len(t)-1, n_groups)
+    """
+    x = np.asarray(y).reshape(len(t), N_COMPARTMENTS, n_groups)
+    return {"incidence": new_infections(x, t, gamma), "deaths": np.diff(x[:, 4], axis=0)}
+
+def calibrate(t,observations,beta_matrix,gamma,mu_group,phi,rho,eta_group,x0,start_vaccination,parameters=DIFFERENTIABLE,weights=None,schedule=None,method="RK45",rtol=1e-6,atol=1e-9,**least_squares_options):
+    """Least-squares fit of the parameters to observed incidence and death series, with the exact Jacobian of the residuals
+    from the forward sensitivities (one augmented solve for each iteration of scipy.optimize.least_squares).
+
+    Args:
+        t (np.ndarray): simulation time (timestamps of the observations)
+        observations (dict): any of "incidence" and "deaths" with shape (len(t)-1, n_groups) (see observed_series)
+        parameters (tuple, optional): parameters to fit, the other ones are kept to the given values. Defaults to DIFFERENTIABLE.
+        weights (dict, optional): weight of the residuals of each series, e.g. to balance incidence and deaths. Defaults to None (1).
+        **least_squares_options: other keyword arguments of least_squares (e.g. max_nfev, ftol)
+        (beta_matrix, gamma, mu_group are the initial guess, the other arguments are the ones of sirvd_solver)
+
+    Returns:
+        dict: fitted {parameter: value} and "result" (OptimizeResult of least_squares)
+    """
+    for name in observations:
+        if name not in OBSERVATIONS:
+            raise ValueError("Unknown observation "+name+" (expected one of "+", ".join(OBSERVATIONS)+")")
+    check_contacts(beta_matrix, parameters)
+    weights = weights or {}
+    n_groups = len(start_vaccination)
+    shapes = parameter_shapes(n_groups, parameters)
+    values = {"beta_matrix": contact_operator(beta_matrix), "gamma": float(gamma), "mu_group": np.asarray(mu_group, dtype=float)}
+    theta0 = np.concatenate([np.ravel(values[name]) for name in parameters])
+    dt = np.diff(np.asarray(t, dtype=float))[:, None, None]
+    last = {} # least_squares asks for the residuals and the Jacobian at the same point, both come from the same solve
+
+    def unpack(theta):
+        fitted = dict(values)
+        offset = 0
+        for name, shape in shapes.items():
+            size = int(np.prod(shape))
+            fitted[name] = theta[offset:offset+size].reshape(shape) if shape else float(theta[offset])
+            offset += size
+        return fitted
+
+    def solve(theta):
+        if last.get("theta") is not None and np.array_equal(last["theta"], theta):
+            return last["residuals"], last["jacobian"]
+        fitted = unpack(theta)
+        y, derivatives = sirvd_solver_sensitivity(t, fitted["beta_matrix"], fitted["gamma"], fitted["mu_group"], phi, rho, eta_group, x0,
+                                                  start_vaccination, parameters=parameters, method=method, rtol=rtol, atol=atol, schedule=schedule)
+        model = observed_series(y, t, fitted["gamma"], n_groups)
+        # derivatives of the series: same linear combination of the columns of the sensitivities
+        sensitivity = np.concatenate([derivatives[name].reshape(len(t), N_COMPARTMENTS, n_groups, -1) for name in parameters], axis=-1)
+        d_infectious, d_deaths = sensitivity[:, 1], sensitivity[:, 4]
+        d_new_deaths = np.diff(d_deaths, axis=0)
+        d_incidence = np.diff(d_infectious, axis=0) + fitted["gamma"]*dt*(d_infectious[1:] + d_infectious[:-1])/2 + d_new_deaths
+        if "gamma" in shapes:
+            # gamma also multiplies the integral of I directly
+            infectious = y.reshape(len(t), N_COMPARTMENTS, n_groups)[:, 1]
+            column = sum(int(np.prod(shapes[name])) for name in parameters[:list(parameters).index("gamma")])
+            d_incidence[:, :, column] += dt[:, :, 0]*(infectious[1:] + infectious[:-1])/2
+        d_model = {"incidence": d_incidence, "deaths": d_new_deaths}
+        residuals = [weights.get(name, 1.0)*(model[name] - np.asarray(observed, dtype=float)).ravel() for name, observed in observations.items()]
+        jacobian = [weights.get(name, 1.0)*d_model[name].reshape(-1, len(theta)) for name in observations]
+        last.update(theta=theta.copy(), residuals=np.concatenate(residuals), jacobian=np.concatenate(jacobian))
+        return last["residuals"], last["jacobian"]
+
+    least_squares_options.setdefault("bounds", (0, np.inf)) # rates are non negative
+    least_squares_options.setdefault("x_scale", "jac")
+    result = least_squares(lambda theta: solve(theta)[0], theta0, jac=lambda theta: solve(theta)[1], **least_squares_options)
+    fitted = unpack(result.x)
+    return {**{name: fitted[name] for name in parameters}, "result": result}
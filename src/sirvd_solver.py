@@ -1,12 +1,328 @@
+import time
+import warnings
+from contextlib import contextmanager
 import numpy as np
-from scipy.integrate import odeint, solve_ivp
+from scipy import sparse
+from scipy.integrate import solve_ivp, RK23, RK45, DOP853, Radau, BDF, LSODA
+import numba_backend
+from contacts import contact_operator, contact_matrix_sparse
 
-def sirvd_solver(t,beta_matrix,gamma,mu_group,phi, rho,eta_group,x0,start_vaccination):
-    """Wrapper function to compute ODEs using different APIs (currently only with methods of SciPy)
+N_COMPARTMENTS = 5 # Susceptible, Infectious, Recovered, Vaccinated, Deceased
+IMPLICIT_METHODS = ("BDF", "Radau", "LSODA") # solve_ivp methods that make use of the Jacobian
+SOLVER_CLASSES = {solver.__name__: solver for solver in (RK23, RK45, DOP853, Radau, BDF, LSODA)}
+BACKENDS = ("scipy", "numba")
+
+_solver_hooks = [] # functions called with the report of every sirvd_solver call (see add_solver_hook)
+
+def assign_vaccination_coefficient(t, eta_group, start_vaccination):
+    """Auxiliary function to assign time-dependent vaccination coefficient eta to all groups at once
+
+    Args:
+        t (float): scalar representing the current timestamp
+        eta_group (np.ndarray): vaccination coefficient for each group
+        start_vaccination (np.ndarray): starting day of vaccination for each group
+
+    Returns:
+        np.ndarray: eta of each group for a specific timestamp (0 or eta)
+    """
+    # -1 means no vaccination for a specific age group
+    return np.where((start_vaccination != -1) & (t >= start_vaccination), eta_group, 0.0)
+
+def make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination):
+    """Build the vectorized right-hand side of the SIRVSD model and its analytic Jacobian for any number of groups.
+
+    The state is the flat vector [S_0..S_n-1, I_0..I_n-1, R_0..R_n-1, V_0..V_n-1, D_0..D_n-1],
+    so it can be viewed as a (5, n_groups) matrix without copying.
+    The force of infection is computed with a single beta_matrix @ I product and stored,
+    together with the other intermediate quantities, in buffers allocated once per solve.
+    beta_matrix can also be a scipy.sparse matrix or a KroneckerContacts operator (thousands of age x region strata):
+    the product then costs as much as the nonzero entries and the Jacobian is a sparse matrix.
+
+    Args:
+        beta_matrix (np.ndarray, scipy.sparse matrix or KroneckerContacts): infection coefficient for each group
+        gamma (float): recovery coefficient (same for all group)
+        mu_group (list): mortality coefficient for each group
+        phi (float): transfer coefficient for loss of immunity from recovered
+        rho (float): transfer coefficient for loss of immunity from vaccinated
+        eta_group (list): vaccination coefficient for each group
+        start_vaccination (list): day of start of the vaccination period for each group
+
+    Returns:
+        tuple: functions sirvd(t, x) and sirvd_jacobian(t, x) to pass to solve_ivp
+    """
+    beta_matrix = contact_operator(beta_matrix)
+    dense = isinstance(beta_matrix, np.ndarray)
+    mu_group = np.asarray(mu_group, dtype=float)
+    eta_group = np.asarray(eta_group, dtype=float)
+    start_vaccination = np.asarray(start_vaccination)
+    n_groups = len(start_vaccination) # or any other "_group" parameter
+    n_states = N_COMPARTMENTS*n_groups
+    removal = gamma + mu_group # rate of leaving the infectious compartment for each group
+    force_of_infection = np.empty(n_groups) # buffers shared by all the evaluations of a solve
+    infections = np.empty(n_groups)
+    vaccinations = np.empty(n_groups)
+    recovered_loss = np.empty(n_groups) # immunity lost by the recovered
+    vaccinated_loss = np.empty(n_groups) # immunity lost by the vaccinated
+    eta = np.empty(n_groups)
+    scheduled = start_vaccination != -1 # -1 means no vaccination for a specific age group
+    vaccinating = np.empty(n_groups, dtype=bool)
+    derivatives = np.empty(n_states)
+    ds, di, dr, dv, dd = derivatives.reshape(N_COMPARTMENTS, n_groups)
+    diag = np.arange(n_groups)
+    block = [slice(k*n_groups, (k+1)*n_groups) for k in range(N_COMPARTMENTS)]
+    # constant part of the Jacobian as (row block, column block, diagonal), the state and time dependent blocks are added on each evaluation
+    constant_entries = [
+        (0, 2, phi), # dS/dR
+        (0, 3, rho), # dS/dV
+        (1, 1, -removal), # dI/dI (diagonal part)
+        (2, 1, gamma), # dR/dI
+        (2, 2, -phi), # dR/dR
+        (3, 3, -rho), # dV/dV
+        (4, 1, mu_group), # dD/dI
+    ]
+    constant_rows = np.concatenate([row*n_groups + diag for row, _, _ in constant_entries])
+    constant_cols = np.concatenate([col*n_groups + diag for _, col, _ in constant_entries])
+    constant_data = np.concatenate([np.broadcast_to(value, n_groups) for _, _, value in constant_entries]).astype(float)
+    if dense:
+        jacobian_constant = np.zeros((n_states, n_states))
+        jacobian_constant[constant_rows, constant_cols] = constant_data
+    sparse_pattern = {} # rows, columns and contact entries of the sparse Jacobian, built on the first evaluation
+
+    def update_eta(t):
+        """Same as assign_vaccination_coefficient, written into eta"""
+        np.greater_equal(t, start_vaccination, out=vaccinating)
+        np.logical_and(vaccinating, scheduled, out=vaccinating)
+        eta.fill(0.0)
+        np.copyto(eta, eta_group, where=vaccinating)
+
+    def sirvd(t, x):
+        """
+        Function called by solve_ivp to compute the derivative of x at t.
+        The derivatives are computed in the buffers and copied into a new array on return because SciPy keeps
+        references to the previous evaluations.
+        """
+        s, i, r, v, _ = x.reshape(N_COMPARTMENTS, n_groups)
+        update_eta(t) # time-dependent parameter
+        if dense:
+            np.matmul(beta_matrix, i, out=force_of_infection)
+        else:
+            force_of_infection[:] = beta_matrix @ i
+        np.multiply(s, force_of_infection, out=infections)
+        np.multiply(eta, s, out=vaccinations)
+        np.multiply(phi, r, out=recovered_loss)
+        np.multiply(rho, v, out=vaccinated_loss)
+        np.add(recovered_loss, vaccinated_loss, out=ds) # dsdt
+        np.subtract(ds, vaccinations, out=ds)
+        np.subtract(ds, infections, out=ds)
+        np.multiply(removal, i, out=di) # didt
+        np.subtract(infections, di, out=di)
+        np.multiply(gamma, i, out=dr) # drdt
+        np.subtract(dr, recovered_loss, out=dr)
+        np.subtract(vaccinations, vaccinated_loss, out=dv) # dvdt
+        np.multiply(mu_group, i, out=dd) # dddt
+        return derivatives.copy()
+
+    def sirvd_jacobian(t, x):
+        """
+        Analytic Jacobian of sirvd with respect to x, used by the implicit methods (BDF, Radau, LSODA).
+        """
+        s, i = x[:n_groups], x[n_groups:2*n_groups]
+        update_eta(t)
+        if not dense:
+            return sparse_jacobian(s, i)
+        np.matmul(beta_matrix, i, out=force_of_infection)
+        jacobian = jacobian_constant.copy()
+        contacts = s[:, None]*beta_matrix # d(s*beta@i)/di
+        jacobian[block[0], block[1]] = -contacts # dS/dI
+        jacobian[block[1], block[1]] += contacts # dI/dI
+        jacobian[diag, diag] = -eta - force_of_infection # dS/dS
+        jacobian[n_groups + diag, diag] = force_of_infection # dI/dS
+        jacobian[3*n_groups + diag, diag] = eta # dV/dS
+        return jacobian
+
+    def sparse_jacobian(s, i):
+        """Same entries of the dense Jacobian in CSR format (the duplicated entries of dI/dI are summed)"""
+        if not sparse_pattern:
+            contacts = contact_matrix_sparse(beta_matrix).tocoo()
+            sparse_pattern["contact_rows"], sparse_pattern["contact_data"] = contacts.row, contacts.data
+            sparse_pattern["rows"] = np.concatenate([constant_rows, contacts.row, n_groups + contacts.row, diag, n_groups + diag, 3*n_groups + diag])
+            sparse_pattern["cols"] = np.concatenate([constant_cols, n_groups + contacts.col, n_groups + contacts.col, diag, diag, diag])
+        force_of_infection[:] = beta_matrix @ i
+        contacts = s[sparse_pattern["contact_rows"]]*sparse_pattern["contact_data"] # d(s*beta@i)/di
+        data = np.concatenate([constant_data, -contacts, contacts, -eta - force_of_infection, force_of_infection, eta])
+        return sparse.csr_matrix((data, (sparse_pattern["rows"], sparse_pattern["cols"])), shape=(n_states, n_states))
+
+    return sirvd, sirvd_jacobian
+
+def breakpoints(t, start_vaccination, schedule = None):
+    """Times in which the right-hand side is discontinuous: start days of vaccination (also the ones set by the schedule)
+    and days of change of the schedule
 
     Args:
         t (np.ndarray): simulation time
-        beta_matrix (np.ndarray): infection coefficient for each group
+        start_vaccination (list): day of start of the vaccination period for each group
+        schedule (list, optional): list of (day, {parameter: value}) changes of the parameters. Defaults to None.
+
+    Returns:
+        np.ndarray: sorted breakpoints strictly inside the simulation time
+    """
+    days = [day for day in start_vaccination if day != -1] # -1 means no vaccination for a specific age group
+    if schedule is not None:
+        days += [day for day, _ in schedule]
+        for change_day, changes in schedule:
+            # a start day set by the schedule is effective only after the change (before it the change day is the jump)
+            days += [day for day in np.ravel(changes.get("start_vaccination", [])) if day != -1 and day > change_day]
+    days = np.unique(np.asarray(days, dtype=float))
+    return days[(days > t[0]) & (days < t[-1])]
+
+def segment_parameters(t_start, params, schedule = None):
+    """Parameters of the model frozen on a smooth segment starting at t_start
+
+    Args:
+        t_start (float): starting time of the segment
+        params (dict): parameters of make_sirvd (beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+        schedule (list, optional): list of (day, {parameter: value}) changes of the parameters. Defaults to None.
+
+    Returns:
+        dict: parameters of make_sirvd with the changes of the schedule applied and a constant eta for each group
+    """
+    params = dict(params)
+    for day, changes in sorted(schedule or [], key=lambda change: change[0]):
+        if day <= t_start:
+            params.update(changes)
+    eta_group = np.asarray(params["eta_group"], dtype=float)
+    params["eta_group"] = assign_vaccination_coefficient(t_start, eta_group, np.asarray(params["start_vaccination"]))
+    params["start_vaccination"] = np.full(len(eta_group), -np.inf) # eta is already the one of the segment
+    return params
+
+def checkpoint_times(t, interval):
+    """Checkpoints at regular intervals, at the multiples of interval (so a run restarted from one of them keeps the same ones)
+
+    Args:
+        t (np.ndarray): simulation time
+        interval (float): days between two checkpoints (None for no regular checkpoints)
+
+    Returns:
+        np.ndarray: sorted checkpoints strictly inside the simulation time
+    """
+    if interval is None:
+        return np.empty(0)
+    days = interval*np.arange(np.floor(t[0]/interval) + 1, np.ceil(t[-1]/interval))
+    return days[(days > t[0]) & (days < t[-1])]
+
+def iter_segments(t, start_vaccination, schedule = None, checkpoint_interval = None):
+    """Smooth segments of the simulation time, split at the breakpoints and at the checkpoints, in order
+
+    Args:
+        t (np.ndarray): simulation time
+        start_vaccination (list): day of start of the vaccination period for each group
+        schedule (list, optional): list of (day, {parameter: value}) changes of the parameters. Defaults to None.
+        checkpoint_interval (float, optional): also split at the multiples of checkpoint_interval. Defaults to None.
+
+    Yields:
+        tuple: (seg_start, seg_end, t_eval, in_segment, rows) with the times to evaluate on the segment (the timestamps
+            inside it, its start and its end, always evaluated to carry the state), the mask of the timestamps of t
+            in the segment and their rows in t_eval
+    """
+    boundaries = [t[0], *np.union1d(breakpoints(t, start_vaccination, schedule), checkpoint_times(t, checkpoint_interval)), t[-1]]
+    for seg_start, seg_end in zip(boundaries[:-1], boundaries[1:]):
+        last = seg_end == t[-1]
+        in_segment = (t >= seg_start) & ((t <= seg_end) if last else (t < seg_end))
+        t_eval = np.unique(np.concatenate([[seg_start], t[in_segment], [seg_end]]))
+        yield seg_start, seg_end, t_eval, in_segment, np.searchsorted(t_eval, t[in_segment])
+
+def new_infections(data, t, gamma):
+    """New infections between consecutive timestamps, from the balance of the infectious: delta I + gamma * integral of I
+    + delta D (the integral is computed with the trapezoid rule on the timestamps)
+
+    Args:
+        data (np.ndarray): measurements with shape (..., len(t), 5, n_groups)
+        t (np.ndarray): simulation time
+        gamma (float): recovery coefficient (or an array with the leading shape of data, one value for each run)
+
+    Returns:
+        np.ndarray: new infections with shape (..., len(t)-1, n_groups)
+    """
+    infectious, deaths = data[..., 1, :], data[..., 4, :]
+    dt = np.diff(np.asarray(t, dtype=float))[:, None]
+    gamma = np.asarray(gamma, dtype=float)[..., None, None]
+    return np.diff(infectious, axis=-2) + gamma*dt*(infectious[..., 1:, :] + infectious[..., :-1, :])/2 + np.diff(deaths, axis=-2)
+
+def add_solver_hook(hook):
+    """Opt-in instrumentation: call hook(report) after every sirvd_solver call.
+
+    The report is a dict with method, backend, n_groups, n_times, rtol, atol, wall_time (seconds) and the counters
+    nfev, njev, nlu, n_segments, n_steps (accepted steps) and n_rejected (rejected steps, Runge-Kutta methods only),
+    None for the counters not available with the backend. Without hooks sirvd_solver does not measure anything.
+
+    Args:
+        hook (callable): function with one argument, the report
+
+    Returns:
+        callable: the hook, so it can be used as a decorator
+    """
+    _solver_hooks.append(hook)
+    return hook
+
+def remove_solver_hook(hook):
+    """Stop calling a hook registered with add_solver_hook"""
+    _solver_hooks.remove(hook)
+
+@contextmanager
+def record_solver_calls():
+    """Collect the reports of all the sirvd_solver calls of a block
+
+    Yields:
+        list: reports (see add_solver_hook), filled while the block runs
+    """
+    reports = []
+    add_solver_hook(reports.append)
+    try:
+        yield reports
+    finally:
+        remove_solver_hook(reports.append)
+
+def counting_solver(method, counters):
+    """Subclass of a solve_ivp method that counts the accepted steps and, for the Runge-Kutta methods, the rejected ones
+    (through the public step, nfev and n_stages of OdeSolver only)
+
+    Args:
+        method (str): name of the solve_ivp method
+        counters (dict): incremented in place ("n_steps", and "n_rejected" for the Runge-Kutta methods)
+
+    Returns:
+        type: OdeSolver subclass to pass to solve_ivp as method
+    """
+    base = SOLVER_CLASSES[method]
+    counters.setdefault("n_steps", 0)
+    if base in (RK23, RK45, DOP853):
+        counters.setdefault("n_rejected", 0)
+
+    class CountingSolver(base):
+        # one call of step is one accepted step, and a Runge-Kutta step
+        # evaluates the function n_stages times for each attempt
+        def step(self):
+            nfev = self.nfev
+            message = super().step()
+            counters["n_steps"] += self.status != "failed"
+            if "n_rejected" in counters:
+                counters["n_rejected"] += (self.nfev - nfev)//self.n_stages - 1
+            return message
+
+    return CountingSolver
+
+def sirvd_solver(t,beta_matrix,gamma,mu_group,phi, rho,eta_group,x0,start_vaccination,method="RK45",rtol=1e-3,atol=1e-6,schedule=None,stats=None,backend="scipy",substeps=1,checkpoint_interval=None,checkpoints=None):
+    """Wrapper function to compute ODEs using different APIs (methods of SciPy or compiled integrators with numba)
+
+    The simulation time is split at the start days of vaccination (and at the days of change of the schedule),
+    so that every segment is smooth and the adaptive methods do not have to locate the discontinuities by rejecting steps.
+    The state at the end of a segment is the initial condition of the next one, and it can be kept as a checkpoint
+    to restart the integration from there (see IncrementalSolver).
+
+    Args:
+        t (np.ndarray): simulation time
+        beta_matrix (np.ndarray, scipy.sparse matrix or KroneckerContacts): infection coefficient for each group
+            (the sparse operators need the SciPy backend and are not supported by LSODA; BDF and Radau use a sparse Jacobian)
         gamma (float): recovery coefficient (same for all group)
         mu_group (list): mortality coefficient for each group (case fatality rate ISS report January 2021)
         phi (float): transfer coefficient for loss of immunity from recovered (six months of immunity and same for all group)
@@ -14,49 +330,138 @@ def sirvd_solver(t,beta_matrix,gamma,mu_group,phi, rho,eta_group,x0,start_vaccin
         eta_group (list): vaccination coefficient for each group
         x0 (list): initial conditions
         start_vaccination (list): day of start of the vaccination period for each group
+        method (str, optional): integration method of solve_ivp, or "RK4", "DOPRI5" (same as "RK45") and "ImplicitEuler"
+            with the numba backend. Defaults to "RK45".
+        rtol (float, optional): relative tolerance of the integration. Defaults to 1e-3.
+        atol (float, optional): absolute tolerance of the integration. Defaults to 1e-6.
+        schedule (list, optional): piecewise-constant changes of the parameters as a list of (day, {parameter: value}),
+            e.g. [(30, {"beta_matrix": lockdown_matrix}), (90, {"beta_matrix": beta_matrix})]. Defaults to None.
+        stats (dict, optional): if given, it is filled with the counters of the integration
+            (nfev, njev, nlu summed over all segments and n_segments). Defaults to None.
+        backend (str, optional): "scipy" (solve_ivp) or "numba" (compiled kernel, cached on disk after the first call).
+            Without numba installed the SciPy backend is used with the closest method. Defaults to "scipy".
+        substeps (int, optional): fixed steps between two timestamps for the RK4 and ImplicitEuler methods of numba. Defaults to 1.
+        checkpoint_interval (float, optional): also split the simulation time at the multiples of checkpoint_interval. Defaults to None.
+        checkpoints (dict, optional): if given, it is filled with {time: state} at t[0] and at the end of every segment. Defaults to None.
+
+    Returns:
+        np.ndarray: measurements for each timestamp (shape (len(t), 5*n_groups))
     """
+    start_time = time.perf_counter()
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend "+str(backend)+" (expected one of "+", ".join(BACKENDS)+")")
+    if backend == "numba" and not numba_backend.NUMBA_AVAILABLE:
+        warnings.warn("numba is not installed, falling back to the SciPy backend")
+        backend, method = "scipy", numba_backend.SCIPY_FALLBACK.get(method, method)
+    instrumented = bool(_solver_hooks) and backend == "scipy" and method in SOLVER_CLASSES # step counters only when someone is listening
+    t = np.asarray(t, dtype=float)
+    params = {"beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho,
+              "eta_group": eta_group, "start_vaccination": start_vaccination}
+    x = np.asarray(x0, dtype=float)
+    if checkpoints is not None:
+        checkpoints[float(t[0])] = x.copy()
+    y = np.empty((len(t), len(x)))
+    counters = {"nfev": 0, "njev": 0, "nlu": 0, "n_segments": 0}
+    for seg_start, seg_end, t_eval, in_segment, rows in iter_segments(t, start_vaccination, schedule, checkpoint_interval):
+        seg_params = segment_parameters(seg_start, params, schedule)
+        dense_contacts = isinstance(contact_operator(seg_params["beta_matrix"]), np.ndarray)
+        if backend == "numba":
+            if not dense_contacts:
+                raise ValueError("The numba backend needs a dense beta_matrix, use the SciPy backend for sparse contacts")
+            y_segment, nfev = numba_backend.solve_segment(t_eval, x, method=method, substeps=substeps, rtol=rtol, atol=atol, **seg_params)
+            counters["nfev"] += nfev
+        else:
+            if method == "LSODA" and not dense_contacts:
+                raise ValueError("LSODA needs a dense Jacobian, use BDF or Radau for sparse contacts")
+            sirvd, sirvd_jacobian = make_sirvd(**seg_params)
+            # odeint solve a system of ordinary differential equations using lsoda from the FORTRAN library odepack.
+            # y = odeint(sirvd,x0,t,tfirst=True,Dfun=sirvd_jacobian)
+            # for new code, use scipy.integrate.solve_ivp to solve a differential equation (SciPy documentation).
+            options = {"jac": sirvd_jacobian} if method in IMPLICIT_METHODS else {} # explicit methods would warn about jac
+            solver = counting_solver(method, counters) if instrumented else method
+            sol = solve_ivp(sirvd,[seg_start,seg_end],x,method=solver,t_eval=t_eval,rtol=rtol,atol=atol,**options)
+            if not sol.success:
+                raise ValueError("Integration with "+method+" failed on the segment ["+str(seg_start)+", "+str(seg_end)+"]: "+sol.message)
+            y_segment = sol.y.T
+            for counter in ("nfev", "njev", "nlu"):
+                counters[counter] += int(getattr(sol, counter))
+        y[in_segment] = y_segment[rows]
+        x = y_segment[-1]
+        if checkpoints is not None:
+            checkpoints[float(seg_end)] = x.copy()
+        counters["n_segments"] += 1
+    if stats is not None:
+        stats.update(counters)
+    if _solver_hooks:
+        report = {"method": method, "backend": backend, "n_groups": len(start_vaccination), "n_times": len(t), "rtol": rtol, "atol": atol,
+                  "wall_time": time.perf_counter() - start_time, "n_steps": None, "n_rejected": None, **counters}
+        if backend == "numba":
+            report["njev"] = report["nlu"] = None
+        for hook in list(_solver_hooks):
+            hook(report)
+    return y
 
-    def assign_vaccination_coefficient(t, eta, start_vaccination):
-        """Auxiliary function to assign time-dependent vaccination coefficient eta
+STREAM_REDUCERS = ("daily_incidence", "max_infectious", "cumulative_deaths")
 
-        Args:
-            t (float): scalar representing the current timestamp
-            eta (float): vaccination coefficient
-            start_vaccination (int): starting day of vaccination
+def sirvd_solver_stream(t,beta_matrix,gamma,mu_group,phi, rho,eta_group,x0,start_vaccination,chunk_size=1000,downsample=1,reducers=(),keep_trajectory=True,**options):
+    """Generator version of sirvd_solver: the simulation time is integrated window by window, carrying the state between windows,
+    so the peak memory depends on chunk_size and not on the length of the simulation.
 
-        Returns:
-            float: eta for a specific timestamp (0 or eta)
-        """
-        if t < start_vaccination or start_vaccination == -1: # -1 means no vaccination for a specific age group
-            return 0
-        else:
-            return eta
-    
-    def sirvd(t,x,beta_matrix,gamma,mu_group,phi,rho,eta_group,start_vaccination,assign_vaccination_coefficient):
-        """
-        Function called by solve_ivp (or odeint) to compute the derivative of x at t.
-        """
-        n_groups = len(start_vaccination) # or any other "_group" parameter
-        derivatives_matrix = np.zeros((5,4)) # save all derivatives in a 2-D array
-        n_infectious = [x[j+n_groups] for j in range(0,n_groups)] # list of the number of infectious measured for each group
-        for j in range(0,n_groups):
-            s = x[j] # Susceptible
-            # i = n_infectious[j]
-            i = x[j+n_groups] # Infectious
-            r = x[j+n_groups*2] # Recovered
-            v = x[j+n_groups*3] # Vaccinated
-            d = x[j+n_groups*4] # Deceased
-            eta = assign_vaccination_coefficient(t,eta_group[j],start_vaccination[j]) # time-dependent parameter
-            derivatives_matrix[0][j] = phi*r - eta*s + rho*v - s*np.dot(beta_matrix[j],n_infectious) # dsdt
-            derivatives_matrix[1][j] = s*np.dot(beta_matrix[j],n_infectious) - gamma*i - mu_group[j]*i # didt
-            derivatives_matrix[2][j] = gamma*i - phi*r # drdt
-            derivatives_matrix[3][j] = eta*s - rho*v # dvdt
-            derivatives_matrix[4][j] = mu_group[j]*i # dddt
-        return derivatives_matrix.reshape(-1) # return all measurements with a 1-D array
-
-    # odeint solve a system of ordinary differential equations using lsoda from the FORTRAN library odepack.
-    # y = odeint(sirvd,x0,t,tfirst=True,args=(beta_matrix,gamma,mu_group,phi,rho,eta_group,start_vaccination,assign_vaccination_coefficient,))
-    # return y
-    # for new code, use scipy.integrate.solve_ivp to solve a differential equation (SciPy documentation).
-    sol = solve_ivp(sirvd,[t[0],t[-1]],x0,t_eval=t,args=(beta_matrix,gamma,mu_group,phi,rho,eta_group,start_vaccination,assign_vaccination_coefficient,))
-    return sol.y.T
\ No newline at end of file
+    Args:
+        t (np.ndarray): simulation time
+        beta_matrix (np.ndarray): infection coefficient for each group
+        gamma (float): recovery coefficient (same for all group)
+        mu_group (list): mortality coefficient for each group
+        phi (float): transfer coefficient for loss of immunity from recovered
+        rho (float): transfer coefficient for loss of immunity from vaccinated
+        eta_group (list): vaccination coefficient for each group
+        x0 (list): initial conditions
+        start_vaccination (list): day of start of the vaccination period for each group
+        chunk_size (int, optional): number of timestamps integrated in each window. Defaults to 1000.
+        downsample (int, optional): keep one timestamp every downsample (chunk_size has to be a multiple of it). Defaults to 1.
+        reducers (tuple, optional): quantities computed on the fly for each chunk, any of
+            "daily_incidence" (new infections of each group between two kept timestamps, shape (len(chunk), n_groups)),
+            "max_infectious" (running max of I of each group since t[0], shape (n_groups)),
+            "cumulative_deaths" (deaths of each group since t[0] at the end of the chunk, shape (n_groups)). Defaults to ().
+        keep_trajectory (bool, optional): if False only the reductions are yielded. Defaults to True.
+        **options: other keyword arguments of sirvd_solver (method, rtol, atol, schedule, backend, substeps)
+
+    Yields:
+        dict: "t" (kept timestamps of the chunk), "y" (measurements, shape (len(chunk), 5*n_groups)) and one entry for each reducer
+    """
+    if chunk_size % downsample != 0:
+        raise ValueError("chunk_size has to be a multiple of downsample")
+    for reducer in reducers:
+        if reducer not in STREAM_REDUCERS:
+            raise ValueError("Unknown reducer "+reducer+" (expected one of "+", ".join(STREAM_REDUCERS)+")")
+    t = np.asarray(t, dtype=float)
+    n_groups = len(start_vaccination)
+    x = np.asarray(x0, dtype=float)
+    running_max = x[n_groups:2*n_groups].copy()
+    cumulative_incidence = 0.0 # total new infections since t[0], for each group
+    last_kept_incidence = np.zeros(n_groups)
+    for start in range(0, len(t), chunk_size):
+        first = max(start-1, 0) # the last timestamp of the previous window is the initial one of this window
+        y = sirvd_solver(t[first:start+chunk_size], beta_matrix, gamma, mu_group, phi, rho, eta_group, x, start_vaccination, **options)
+        previous = y[0] if start > 0 else x
+        t_window = t[first:start+chunk_size]
+        x = y[-1]
+        y, t_chunk = (y[1:], t_window[1:]) if start > 0 else (y, t_window)
+        kept = slice(0, None, downsample) # windows start at multiples of downsample
+        chunk = {"t": t_chunk[kept]}
+        if keep_trajectory:
+            chunk["y"] = y[kept]
+        if "daily_incidence" in reducers:
+            # t[0] is repeated at the start of the first window, no new infections before it
+            states = np.vstack([previous, y]).reshape(len(y)+1, N_COMPARTMENTS, n_groups)
+            incidence = new_infections(states, np.concatenate([t_window[:1], t_chunk]), gamma)
+            cumulative = cumulative_incidence + np.cumsum(incidence, axis=0)
+            kept_incidence = cumulative[kept]
+            chunk["daily_incidence"] = np.diff(kept_incidence, axis=0, prepend=last_kept_incidence[None, :])
+            cumulative_incidence, last_kept_incidence = cumulative[-1], kept_incidence[-1]
+        if "max_infectious" in reducers:
+            np.maximum(running_max, y[:, n_groups:2*n_groups].max(axis=0), out=running_max)
+            chunk["max_infectious"] = running_max.copy()
+        if "cumulative_deaths" in reducers:
+            chunk["cumulative_deaths"] = x[4*n_groups:] - np.asarray(x0, dtype=float)[4*n_groups:]
+        yield chunk
@@ -0,0 +1,168 @@
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+from sirvd_solver import sirvd_solver
+from contacts import KroneckerContacts
+
+OUTPUT_OPTIONS = ("stats", "checkpoints") # arguments of sirvd_solver filled by the solver, stored next to the trajectory
+CACHE_VERSION = 2 # part of every key, to be increased when a change of the solver changes its results
+
+def hash_update(digest, value):
+    """Feed a value to a hashlib digest: arrays, numbers and nested lists are hashed by content, dicts by sorted keys
+
+    Args:
+        digest (hashlib object): digest to update
+        value: dict, str, None, number, array, sparse matrix, KroneckerContacts or (nested) list of them
+    """
+    if isinstance(value, dict):
+        for name in sorted(value):
+            digest.update(name.encode())
+            hash_update(digest, value[name])
+    elif isinstance(value, str) or value is None:
+        digest.update(repr(value).encode())
+    elif isinstance(value, KroneckerContacts):
+        hash_update(digest, {"age_matrix": value.age_matrix, "mobility_matrix": value.mobility_matrix})
+    elif sparse.issparse(value):
+        value = sparse.csr_matrix(value, dtype=float)
+        value.sum_duplicates() # canonical format, the same matrix always has the same arrays
+        hash_update(digest, {"sparse_shape": value.shape, "data": value.data, "indices": value.indices, "indptr": value.indptr})
+    else:
+        try:
+            array = np.ascontiguousarray(value, dtype=float) # same key for lists and arrays of any numeric type
+        except (TypeError, ValueError): # e.g. the schedule, a list of (day, {parameter: value})
+            digest.update(b"[" + str(len(value)).encode())
+            for item in value:
+                hash_update(digest, item)
+            return
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+
+class SolverCache:
+    """Content-addressed cache of sirvd_solver runs with an in-memory LRU tier and a size-capped on-disk tier.
+
+    The key is a SHA-256 of the simulation time, the model parameters, the initial conditions and the solver options,
+    so a run is computed again only if something that changes the result has changed.
+    Trajectories found on disk are loaded with memory mapping, the returned arrays are always read-only.
+    The output arguments of sirvd_solver (stats and checkpoints) are stored with the trajectory (in a .json file next
+    to the .npy one on disk) and filled on every hit with the values of the run that computed it.
+
+    Args:
+        directory (str, optional): directory of the on-disk tier. Defaults to None (memory only).
+        max_memory_items (int, optional): number of trajectories kept in memory. Defaults to 32.
+        max_disk_bytes (int, optional): size cap of the on-disk tier, the least recently used files are evicted. Defaults to 1 GiB.
+    """
+
+    def __init__(self, directory = None, max_memory_items = 32, max_disk_bytes = 1 << 30):
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **options):
+        """Stable hash of the arguments of sirvd_solver (the outputs stats and checkpoints are ignored).
+        The options are completed with the defaults of sirvd_solver, so passing an option with its default value
+        gives the same key as omitting it.
+
+        Returns:
+            str: hexadecimal SHA-256 digest
+        """
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        arguments = inspect.signature(sirvd_solver).bind(t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **options)
+        arguments.apply_defaults()
+        arguments = dict(arguments.arguments)
+        for name in OUTPUT_OPTIONS:
+            del arguments[name]
+        hash_update(digest, arguments)
+        return digest.hexdigest()
+
+    def solve(self, t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **options):
+        """Same arguments and result of sirvd_solver, computed only on a cache miss (stats and checkpoints, if given,
+        are filled also on a hit)
+
+        Returns:
+            np.ndarray: read-only measurements for each timestamp (shape (len(t), 5*n_groups))
+        """
+        requested = {name: options.pop(name) for name in OUTPUT_OPTIONS if name in options}
+        requested = {name: value for name, value in requested.items() if value is not None}
+        args = (t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+        key = self.key(*args, **options)
+        path = self._path(key)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            y, outputs = self._memory[key]
+        elif path is not None and os.path.exists(path) and os.path.exists(self._outputs_path(path)):
+            y = np.load(path, mmap_mode="r")
+            with open(self._outputs_path(path)) as outputs_file:
+                outputs = json.load(outputs_file)
+            outputs["checkpoints"] = {float(time): np.array(state) for time, state in outputs["checkpoints"].items()}
+            os.utime(path) # the modification time is the last use for the eviction
+            self.stats["disk_hits"] += 1
+            self._remember(key, y, outputs)
+        else:
+            outputs = {"stats": {}, "checkpoints": {}}
+            y = sirvd_solver(*args, **options, **outputs)
+            y.flags.writeable = False
+            self.stats["misses"] += 1
+            if path is not None:
+                self._write(path, y, outputs)
+            self._remember(key, y, outputs)
+        for name, value in requested.items():
+            value.update({item: np.array(state) for item, state in outputs[name].items()} if name == "checkpoints" else outputs[name])
+        return y
+
+    def clear(self):
+        """Remove all the trajectories from both tiers"""
+        self._memory.clear()
+        for path in self._disk_files():
+            self._remove(path)
+
+    def _path(self, key):
+        return None if self.directory is None else os.path.join(self.directory, key+".npy")
+
+    @staticmethod
+    def _outputs_path(path):
+        return path[:-len(".npy")]+".json"
+
+    def _remove(self, path):
+        os.remove(path)
+        if os.path.exists(self._outputs_path(path)):
+            os.remove(self._outputs_path(path))
+
+    def _remember(self, key, y, outputs):
+        self._memory[key] = (y, outputs)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_files(self):
+        if self.directory is None:
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".npy")]
+
+    def _write(self, path, y, outputs):
+        # write in temporary files and rename them (the outputs first), so a concurrent reader never sees a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp_file:
+            json.dump({"stats": outputs["stats"], "checkpoints": {repr(time): state.tolist() for time, state in outputs["checkpoints"].items()}}, tmp_file)
+        os.replace(tmp_path, self._outputs_path(path))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp_file:
+            np.save(tmp_file, y)
+        os.replace(tmp_path, path)
+        files = sorted(self._disk_files(), key=os.path.getmtime) # least recently used first
+        total = sum(os.path.getsize(file) for file in files)
+        for file in files:
+            if total <= self.max_disk_bytes or file == path:
+                continue
+            total -= os.path.getsize(file)
+            self._remove(file)
+            self.stats["evictions"] += 1
@@ -0,0 +1,224 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sirvd_solver import N_COMPARTMENTS, assign_vaccination_coefficient, breakpoints
+
+STOCHASTIC_METHODS = ("auto", "gillespie", "tau_leaping")
+N_EVENTS = 6 # infection, recovery, death, loss of immunity from R, vaccination, loss of immunity from V
+# change of (S, I, R, V, D) for each event
+EVENT_CHANGES = np.array([
+    [-1, 1, 0, 0, 0], # infection
+    [0, -1, 1, 0, 0], # recovery
+    [0, -1, 0, 0, 1], # death
+    [1, 0, -1, 0, 0], # loss of immunity from recovered
+    [-1, 0, 0, 1, 0], # vaccination
+    [1, 0, 0, -1, 0], # loss of immunity from vaccinated
+])
+
+def initial_counts(x0, population):
+    """Integer initial conditions from the fractions of sirvd_solver and the size of each group
+
+    Args:
+        x0 (list): initial conditions as fractions of each group (shape (5*n_groups))
+        population (list): number of people of each group
+
+    Returns:
+        np.ndarray: counts with shape (5, n_groups), S takes the rounding so that every group has its exact size
+    """
+    population = np.asarray(population, dtype=np.int64)
+    counts = np.rint(np.asarray(x0, dtype=float).reshape(N_COMPARTMENTS, len(population))*population).astype(np.int64)
+    counts[0] = population - counts[1:].sum(axis=0)
+    return counts
+
+def _force_of_infection(beta_matrix, infectious, population):
+    """Force of infection of each replicate and group: beta_matrix @ (I/N), for states with shape (replicates, n_groups)"""
+    return (infectious/population) @ beta_matrix.T
+
+def _binomial(rng, n, p):
+    """Binomial draws, with the normal approximation where the variance is at least 10 (exact draws are slow there and
+    the approximation is accurate); the small counts, where the extinction happens, are always drawn exactly"""
+    p = np.broadcast_to(p, n.shape)
+    mean = n*p
+    variance = mean*(1 - p)
+    draws = np.zeros_like(n)
+    large = variance >= 10
+    if large.any():
+        normal = mean[large] + np.sqrt(variance[large])*rng.standard_normal(np.count_nonzero(large))
+        draws[large] = np.clip(np.rint(normal), 0, n[large])
+    small = ~large & (mean > 0) # nothing to draw for empty compartments and zero rates
+    if small.any():
+        draws[small] = rng.binomial(n[small], p[small])
+    return draws
+
+def _tau_leaping(t, state, params, tau, rng, on_step):
+    """Binomial tau-leaping: in each step every compartment loses a binomial number of people, split among the
+    competing events with the ratios of their rates, so the counts can never become negative (with tau = 1 it is
+    the daily chain binomial model). The steps are cut at the output times and at the start days of vaccination,
+    so the state recorded at an output time never includes events after it and eta is constant in every step."""
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination, population = params
+    s, i, r, v, d = state
+    n_steps = int(np.ceil((t[-1] - t[0])/tau))
+    times = np.union1d(np.union1d(t[0] + tau*np.arange(n_steps), t), breakpoints(t, start_vaccination))
+    removal = gamma + mu_group
+    for time, next_time in zip(times[:-1], times[1:]):
+        dt = next_time - time
+        force = _force_of_infection(beta_matrix, i, population)
+        eta = assign_vaccination_coefficient(time, eta_group, start_vaccination)
+        leaving_s = _binomial(rng, s, -np.expm1(-(force + eta)*dt))
+        infections = _binomial(rng, leaving_s, np.divide(force, force + eta, out=np.ones_like(force), where=force + eta > 0))
+        leaving_i = _binomial(rng, i, -np.expm1(-removal*dt))
+        deaths = _binomial(rng, leaving_i, mu_group/removal)
+        leaving_r = _binomial(rng, r, -np.expm1(-phi*dt))
+        leaving_v = _binomial(rng, v, -np.expm1(-rho*dt))
+        s += leaving_r + leaving_v - leaving_s
+        i += infections - leaving_i
+        r += leaving_i - deaths - leaving_r
+        v += leaving_s - infections - leaving_v
+        d += deaths
+        on_step(next_time)
+
+def _gillespie(t, state, params, rng, on_step):
+    """Exact stochastic simulation, one event for every replicate in each iteration (each replicate has its own clock).
+    The rates are constant between the breakpoints of the vaccination: an event drawn after a breakpoint is discarded
+    and the replicate restarts from the breakpoint, which is exact because the waiting times are memoryless."""
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination, population = params
+    n_replicates, n_groups = state.shape[1:]
+    changes = np.repeat(EVENT_CHANGES, n_groups, axis=0) # event k of group j at position k*n_groups + j
+    groups = np.tile(np.arange(n_groups), N_EVENTS)
+    stops = np.concatenate([breakpoints(t, start_vaccination), [t[-1]]])
+    clock = np.full(n_replicates, t[0])
+    rows = np.arange(n_replicates)
+    active = clock < t[-1]
+    while active.any():
+        index = rows[active]
+        s, i, r, v, _ = state[:, index]
+        eta = assign_vaccination_coefficient(clock[index, None], eta_group, start_vaccination) # own clock of each replicate
+        force = _force_of_infection(beta_matrix, i, population)
+        cumulative = np.cumsum(np.concatenate([s*force, gamma*i, mu_group*i, phi*r, eta*s, rho*v], axis=1), axis=1)
+        total = cumulative[:, -1]
+        with np.errstate(divide="ignore"):
+            new_clock = clock[index] + rng.standard_exponential(len(index))/total # inf when nothing can happen
+        stop = stops[np.searchsorted(stops, clock[index], side="right")]
+        fires = new_clock < stop
+        new_clock = np.where(fires, new_clock, stop)
+        event = np.minimum((cumulative < (rng.uniform(size=len(index))*total)[:, None]).sum(axis=1), N_EVENTS*n_groups - 1)
+        on_step(new_clock, index, before_event=True) # the state before the event is the one of the output times up to it
+        fired, event = index[fires], event[fires]
+        state[:, fired, groups[event]] += changes[event].T
+        clock[index] = new_clock
+        on_step(new_clock, index, before_event=False)
+        active = clock < t[-1]
+
+def _simulate_block(seed_sequence, n_block, t, counts, params, method, tau, keep_trajectory):
+    """Run a block of replicates with its own generator
+
+    Returns:
+        tuple: extinction times, final counts and (with keep_trajectory, otherwise None) counts at every output time
+    """
+    rng = np.random.default_rng(seed_sequence)
+    state = np.repeat(counts[:, None, :], n_block, axis=1) # (compartment, replicate, group)
+    extinction_time = np.full(n_block, np.nan)
+    extinction_time[state[1].sum(axis=1) == 0] = t[0]
+    y = np.empty((n_block, len(t)) + counts.shape, dtype=np.int32) if keep_trajectory else None
+    next_output = np.zeros(n_block, dtype=np.int64) # first output time not recorded yet, for each replicate
+
+    def record(time, index = None, before_event = False):
+        # store the current state at the output times reached by each replicate (time is a scalar or one value for each
+        # replicate of index); before a Gillespie event only the output times strictly before it are reached
+        index = np.arange(n_block) if index is None else index
+        time = np.broadcast_to(time, index.shape)
+        while True:
+            output = next_output[index]
+            reached = output < len(t)
+            output_time = t[np.minimum(output, len(t)-1)]
+            reached &= (output_time < time) if before_event else (output_time <= time)
+            if not reached.any():
+                break
+            rows = index[reached]
+            if keep_trajectory:
+                y[rows, next_output[rows]] = state[:, rows].transpose(1, 0, 2)
+            next_output[rows] += 1
+        if not before_event:
+            extinct = np.isnan(extinction_time[index]) & (state[1, index].sum(axis=1) == 0)
+            extinction_time[index[extinct]] = time[extinct]
+
+    record(t[0])
+    if method == "gillespie":
+        _gillespie(t, state, params, rng, record)
+    else:
+        _tau_leaping(t, state, params, tau, rng, record)
+    return extinction_time, state.transpose(1, 0, 2), y
+
+def sirvd_stochastic(t,beta_matrix,gamma,mu_group,phi,rho,eta_group,x0,start_vaccination,population,n_replicates=1000,method="auto",tau=1.0,seed=None,block_size=1000,keep_trajectory=False,gillespie_max_population=1000,max_workers=1):
+    """Stochastic SIRVSD model with integer group sizes, same compartments and parameters of sirvd_solver.
+
+    The replicates are advanced together as one (5, replicates, n_groups) array. They are split in blocks of block_size,
+    each one with its own generator spawned from a SeedSequence, so the result of a block depends only on the seed and
+    on its position (adding replicates does not change the previous full blocks) and the blocks can run on a pool of processes.
+    The random streams are per block, not per replicate: the same seed with a different block_size gives different
+    replicates (with the same distribution), so block_size has to be kept fixed to reproduce a run.
+    The infection rate of group j is S_j * sum_k beta_matrix[j, k] * I_k / N_k, the deterministic model on the fractions.
+
+    Tau-leaping draws the binomial numbers of events with the normal approximation (rounded and clipped to [0, n])
+    wherever their variance is at least 10, and exactly below it, so small counts and the extinctions are exact;
+    Gillespie is always exact.
+
+    Args:
+        t (np.ndarray): output times
+        population (list): number of people of each group
+        n_replicates (int, optional): number of independent runs. Defaults to 1000.
+        method (str, optional): "gillespie" (exact, for small populations), "tau_leaping" (binomial, for large ones)
+            or "auto" (gillespie up to gillespie_max_population people in total). Defaults to "auto".
+        tau (float, optional): step of tau-leaping in days. Defaults to 1.0.
+        seed (int, optional): seed of the SeedSequence. Defaults to None (fresh entropy).
+        block_size (int, optional): number of replicates sharing one generator. Defaults to 1000.
+        keep_trajectory (bool, optional): also return the counts at every output time. Defaults to False.
+        gillespie_max_population (int, optional): largest total population simulated exactly with "auto". Defaults to 1000.
+        max_workers (int, optional): number of processes running the blocks. Defaults to 1 (no pool, None for the number of CPUs).
+        (the other arguments are the ones of sirvd_solver)
+
+    Returns:
+        dict: "extinction_time" (first time with no infectious in any group, nan if the disease survives, shape (n_replicates)),
+            "final" (counts at t[-1], shape (n_replicates, 5, n_groups)), "method" and, with keep_trajectory,
+            "y" (counts, shape (n_replicates, len(t), 5, n_groups))
+    """
+    if method not in STOCHASTIC_METHODS:
+        raise ValueError("Unknown method "+method+" (expected one of "+", ".join(STOCHASTIC_METHODS)+")")
+    t = np.asarray(t, dtype=float)
+    population = np.asarray(population, dtype=np.int64)
+    if method == "auto":
+        method = "gillespie" if population.sum() <= gillespie_max_population else "tau_leaping"
+    params = (np.asarray(beta_matrix, dtype=float), float(gamma), np.asarray(mu_group, dtype=float), float(phi), float(rho),
+              np.asarray(eta_group, dtype=float), np.asarray(start_vaccination), population)
+    counts = initial_counts(x0, population)
+    block_starts = list(range(0, n_replicates, block_size))
+    blocks = [(seed_sequence, min(block_size, n_replicates - block_start), t, counts, params, method, tau, keep_trajectory)
+              for block_start, seed_sequence in zip(block_starts, np.random.SeedSequence(seed).spawn(len(block_starts)))]
+    if max_workers == 1 or len(blocks) == 1:
+        outputs = [_simulate_block(*block) for block in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(_simulate_block, *zip(*blocks)))
+    extinction_time, final, y = zip(*outputs)
+    results = {"extinction_time": np.concatenate(extinction_time), "final": np.concatenate(final), "method": method}
+    if keep_trajectory:
+        results["y"] = np.concatenate(y)
+    return results
+
+def extinction_summary(extinction_time, t_end, quantiles = (0.05, 0.25, 0.5, 0.75, 0.95)):
+    """Distribution of the extinction times of the replicates
+
+    Args:
+        extinction_time (np.ndarray): extinction time of each replicate (nan if the disease survives)
+        t_end (float): end of the simulation
+        quantiles (tuple, optional): quantiles of the extinction time among the extinct replicates. Defaults to (0.05, 0.25, 0.5, 0.75, 0.95).
+
+    Returns:
+        dict: "probability" of extinction by t_end, "quantiles" {q: time} (nan if no replicate is extinct)
+            and "cdf" (function of the time, fraction of the replicates extinct by then)
+    """
+    extinct = np.sort(extinction_time[~np.isnan(extinction_time)])
+    return {
+        "probability": len(extinct)/len(extinction_time),
+        "quantiles": {q: (float(np.quantile(extinct, q)) if len(extinct) else np.nan) for q in quantiles},
+        "cdf": lambda time: np.searchsorted(extinct, time, side="right")/len(extinction_time),
+    }
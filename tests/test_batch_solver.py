@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from sirvd_solver import sirvd_solver
+from batch_solver import sirvd_solver_batch, batch_parameters
+from benchmarks.common import random_parameters
+
+T = np.linspace(0, 365, 366)
+
+@pytest.mark.parametrize("method, options, tolerance", [("DOPRI5", {"rtol": 1e-6, "atol": 1e-9}, 1e-5), ("RK4", {"substeps": 4}, 1e-6)])
+def test_batch_matches_solver(method, options, tolerance):
+    n_groups, batch_size = 4, 6
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+    params = batch_parameters(batch_size, n_groups, beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    rng = np.random.default_rng(0)
+    params["beta_matrix"] *= rng.uniform(0.5, 1.5, (batch_size, 1, 1))
+    params["start_vaccination"] = rng.choice([-1, 0, 15.5, 30, 90], (batch_size, n_groups)) # different jumps for each member
+    x0_batch = np.tile(x0, (batch_size, 1))
+    x0_batch[:, n_groups:2*n_groups] *= rng.uniform(0.5, 2, (batch_size, 1))
+    y = sirvd_solver_batch(T, params, x0_batch, method=method, **options)
+    assert y.shape == (batch_size, len(T), 5*n_groups)
+    for member in range(batch_size):
+        expected = sirvd_solver(T, params["beta_matrix"][member], gamma, params["mu_group"][member], phi, rho,
+                                params["eta_group"][member], x0_batch[member], params["start_vaccination"][member], rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(y[member], expected, rtol=0, atol=tolerance)
+
+def test_batch_unknown_method():
+    params = batch_parameters(2, 4)
+    with pytest.raises(ValueError):
+        sirvd_solver_batch(T, params, np.zeros(20), method="Euler")
+
+@pytest.mark.parametrize("method", ["DOPRI5", "RK4"])
+def test_batch_failures_name_the_members(method):
+    n_groups, batch_size = 4, 5
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+    params = batch_parameters(batch_size, n_groups, beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    x0_batch = np.tile(x0, (batch_size, 1))
+    x0_batch[1, 0] = np.nan
+    x0_batch[3] = 1e200 # overflows in the first steps
+    with pytest.raises(ValueError, match=r"not finite for the members \[1, 3\]"), np.errstate(over="ignore", invalid="ignore"):
+        sirvd_solver_batch(T, params, x0_batch, method=method)
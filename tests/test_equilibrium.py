@@ -0,0 +1,23 @@
+import numpy as np
+from sirvd_solver import make_sirvd
+from equilibrium import reproduction_number, disease_free_equilibrium
+from benchmarks.common import random_parameters
+
+def test_reproduction_number_of_one_group():
+    # one group: R0 = beta/(gamma + mu), scaled by the fraction of susceptible
+    assert np.isclose(reproduction_number([[0.3]], 1/15, [0.01]), 0.3/(1/15 + 0.01), rtol=1e-14)
+    assert np.isclose(reproduction_number([[0.3]], 1/15, [0.01], susceptible=[0.4]), 0.4*0.3/(1/15 + 0.01), rtol=1e-14)
+
+def test_reproduction_number_of_independent_groups():
+    # without contacts between the groups, the largest R0 of the single groups
+    beta_matrix = np.diag([0.2, 0.5, 0.1])
+    mu_group = np.array([0.0, 0.05, 0.1])
+    assert np.isclose(reproduction_number(beta_matrix, 0.1, mu_group), (np.diag(beta_matrix)/(0.1 + mu_group)).max(), rtol=1e-14)
+
+def test_disease_free_equilibrium_is_a_fixed_point():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, _, _ = random_parameters(4)
+    population = np.array([0.2, 0.3, 0.25, 0.15])
+    x = disease_free_equilibrium(rho, eta_group, population)
+    sirvd, _ = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta_group, np.zeros(4)) # vaccination running in all groups
+    np.testing.assert_allclose(sirvd(100.0, x), 0, rtol=0, atol=1e-15)
+    np.testing.assert_allclose(x.reshape(5, 4)[:4].sum(axis=0), population, rtol=1e-14)
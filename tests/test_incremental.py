@@ -0,0 +1,38 @@
+import numpy as np
+from sirvd_solver import sirvd_solver
+from incremental import IncrementalSolver, divergence_time
+from benchmarks.common import main_parameters
+
+T = np.linspace(0, 365, 366)
+
+def test_restart_matches_full_solve():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0)
+    solver = IncrementalSolver(T, *args, [0, 30, 60, -1], checkpoint_interval=10)
+    for day in (45, 90, 200):
+        stats = {}
+        y = solver.solve(stats=stats, start_vaccination=[0, 30, 60, day])
+        assert stats["restart"] == (day//10)*10
+        np.testing.assert_allclose(y, sirvd_solver(T, *args, [0, 30, 60, day], checkpoint_interval=10), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(solver.solve(start_vaccination=[0, 30, 60, -1]), solver.y) # same scenario, nothing solved
+    assert solver.stats["solves"] == 3
+
+def test_divergence_time():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    base = {"beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho,
+            "eta_group": eta_group, "x0": x0, "start_vaccination": [0, 30, 60, 90]}
+    assert divergence_time(T, base, base) == np.inf
+    assert divergence_time(T, base, {**base, "start_vaccination": [0, 30, 60, 120]}) == 90
+    assert divergence_time(T, base, {**base, "eta_group": [0.01, 0.01, 0.02, 0.01]}) == 60
+    assert divergence_time(T, base, {**base, "gamma": gamma*2}) == 0
+    assert divergence_time(T, base, {**base, "schedule": [(150, {"gamma": gamma*2})]}) == 150
+
+def test_checkpoints_are_the_states_at_the_segment_ends():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, [0, 30, 60, 90])
+    checkpoints = {}
+    y = sirvd_solver(*args, checkpoint_interval=30, checkpoints=checkpoints, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(y, sirvd_solver(*args, rtol=1e-10, atol=1e-12), rtol=0, atol=1e-9)
+    assert sorted(checkpoints) == [*range(0, 365, 30), 365]
+    for time, state in checkpoints.items():
+        np.testing.assert_allclose(state, y[int(time)], rtol=0, atol=1e-15) # daily timestamps, row = day
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import sirvd_solver as solver_module
+from sirvd_solver import sirvd_solver, record_solver_calls, add_solver_hook, remove_solver_hook
+from benchmarks.common import main_parameters
+
+T = np.linspace(0, 365, 366)
+
+def main_arguments():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    return (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, [0, 30, 60, 90])
+
+@pytest.mark.parametrize("method", ["RK45", "BDF", "LSODA"])
+def test_hook_reports_the_counters(method):
+    stats = {}
+    with record_solver_calls() as reports:
+        sirvd_solver(*main_arguments(), method=method, stats=stats)
+    assert len(reports) == 1
+    report = reports[0]
+    assert (report["method"], report["backend"], report["n_groups"], report["n_times"]) == (method, "scipy", 4, len(T))
+    assert report["wall_time"] > 0
+    assert report["n_segments"] == 4 # split at days 30, 60 and 90
+    for counter in ("nfev", "njev", "nlu", "n_segments"):
+        assert report[counter] == stats[counter]
+    assert report["n_steps"] > 0
+    if method == "RK45":
+        assert report["n_rejected"] >= 0
+        # 2 evaluations to start each segment (first derivative and initial step), then 6 for each attempted step (FSAL)
+        assert report["nfev"] == 2*report["n_segments"] + 6*(report["n_steps"] + report["n_rejected"])
+    else:
+        assert report["n_rejected"] is None
+
+@pytest.mark.parametrize("method, rtol, n_steps, n_rejected", [("RK23", 1e-3, 55, 7), ("RK45", 1e-6, 47, 2), ("DOP853", 1e-3, 26, 4), ("BDF", 1e-3, 89, None)])
+def test_step_counters_of_a_known_case(method, rtol, n_steps, n_rejected):
+    with record_solver_calls() as reports:
+        sirvd_solver(*main_arguments(), method=method, rtol=rtol)
+    assert (reports[0]["n_steps"], reports[0]["n_rejected"]) == (n_steps, n_rejected)
+
+def test_no_counting_without_hooks(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the steps are counted without hooks")
+    monkeypatch.setattr(solver_module, "counting_solver", fail)
+    stats = {}
+    sirvd_solver(*main_arguments(), stats=stats)
+    assert "n_steps" not in stats and "n_rejected" not in stats
+    reports = []
+    hook = add_solver_hook(reports.append)
+    remove_solver_hook(hook)
+    sirvd_solver(*main_arguments())
+    assert reports == []
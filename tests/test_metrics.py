@@ -0,0 +1,42 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+import metrics
+from sirvd_solver import make_sirvd
+from batch_solver import sirvd_solver_batch, batch_parameters
+from benchmarks.common import random_parameters
+from benchmarks.sweep_metrics import legacy_zero_eradication_day
+
+def test_days_match_the_legacy_loops():
+    t = np.linspace(0, 365, 366)
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(4)
+    params = batch_parameters(50, 4, beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    params["beta_matrix"] *= np.random.default_rng(0).uniform(0.2, 1.5, (50, 1, 1)) # some runs never reach the thresholds
+    data = sirvd_solver_batch(t, params, x0).reshape(50, len(t), 5, 4)
+    summary = metrics.summarize(data, t, gamma)
+    for level, values in (("groups", data), ("population", metrics.population(data))):
+        for group in range(values.shape[-1]):
+            legacy = np.array([legacy_zero_eradication_day(run[..., group]) for run in values])
+            for column, name in enumerate(("zero_day_infections", "eradication_day")):
+                vector = summary[level][name] if level == "population" else summary[level][name][:, group]
+                # daily t, day = index, -1 of the loops = nan
+                np.testing.assert_array_equal(np.nan_to_num(vector, nan=-1).astype(int), legacy[:, column])
+    assert np.isnan(summary["population"]["eradication_day"]).any() and not np.isnan(summary["population"]["eradication_day"]).all()
+
+def test_cumulative_infections_match_the_integrated_infections():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(4)
+    sirvd, _ = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    n_groups = len(mu_group)
+
+    def sirvd_with_infections(t, z): # the last n_groups components count the new infections
+        x = z[:-n_groups]
+        return np.concatenate([sirvd(t, x), x[:n_groups]*(beta_matrix @ x[n_groups:2*n_groups])])
+
+    t = np.linspace(0, 200, 2001) # fine output times, the trapezoid rule of the metrics is accurate
+    z = solve_ivp(sirvd_with_infections, [t[0], t[-1]], np.concatenate([x0, np.zeros(n_groups)]), t_eval=t,
+                  rtol=1e-10, atol=1e-12).y.T
+    data = z[:, :-n_groups].reshape(len(t), 5, n_groups)
+    np.testing.assert_allclose(metrics.cumulative_infections(data, t, gamma), z[-1, -n_groups:], rtol=1e-4)
+    np.testing.assert_allclose(metrics.attack_rate(data, t, gamma), z[-1, -n_groups:]/x0.reshape(5, n_groups)[:4].sum(axis=0), rtol=1e-4)
+    # the leading axes are runs, with one gamma for each run
+    runs = np.stack([data, data])
+    np.testing.assert_allclose(metrics.cumulative_infections(runs, t, [gamma, gamma]), np.stack([z[-1, -n_groups:]]*2), rtol=1e-4)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import numba_backend
+from sirvd_solver import sirvd_solver
+from benchmarks.common import main_parameters, MAIN_STRATEGIES
+
+pytestmark = pytest.mark.skipif(not numba_backend.NUMBA_AVAILABLE, reason="numba is not installed")
+
+T = np.linspace(0, 365, 366)
+
+@pytest.mark.parametrize("vacc_name", list(MAIN_STRATEGIES))
+@pytest.mark.parametrize("method, substeps, tolerance", [("DOPRI5", 1, 1e-6), ("RK4", 1, 1e-5), ("ImplicitEuler", 8, 1e-2)])
+def test_numba_matches_solver(vacc_name, method, substeps, tolerance):
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    start_vaccination, eta_group = MAIN_STRATEGIES[vacc_name]
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    expected = sirvd_solver(*args, rtol=1e-10, atol=1e-12)
+    stats = {}
+    y = sirvd_solver(*args, method=method, backend="numba", substeps=substeps, stats=stats)
+    np.testing.assert_allclose(y, expected, rtol=0, atol=tolerance)
+    assert stats["nfev"] > 0 and stats["n_segments"] == len(set(start_vaccination) - {-1, 0}) + 1
+
+def test_numba_implicit_euler_converges_with_substeps():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, [0, 30, 60, 90])
+    expected = sirvd_solver(*args, rtol=1e-10, atol=1e-12)
+    errors = [np.abs(sirvd_solver(*args, method="ImplicitEuler", backend="numba", substeps=substeps) - expected).max() for substeps in (4, 16)]
+    assert errors[1] < errors[0]/2 # first order method
+
+@pytest.mark.parametrize("method", ["RK4", "DOPRI5", "ImplicitEuler"])
+def test_numba_failures_raise(method):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    x0 = np.array(x0)
+    x0[0] = np.nan
+    with pytest.raises(ValueError, match="finite"):
+        numba_backend.solve_segment(T[:10], x0, beta_matrix, gamma, mu_group, phi, rho, eta_group, method=method)
+    with pytest.raises(ValueError, match="not finite"):
+        # the force of infection overflows on the first evaluation, the integration stops instead of running on inf and nan
+        numba_backend.solve_segment(T[:10], np.full(20, 1e200), beta_matrix, gamma, mu_group, phi, rho, eta_group, method=method)
@@ -0,0 +1,49 @@
+import inspect
+import json
+import os
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import metrics
+import plot_batch
+import plot_result
+from plot_batch import job_key, render_batch
+
+T = np.linspace(0, 120, 121)
+GROUP_DICT = {"young": 0, "old": 1}
+
+def results_dict():
+    i = np.stack([0.1*np.exp(-T/20), 0.05*np.exp(-T/30)], axis=-1)
+    d = np.cumsum(i, axis=0)/100
+    zeros = np.zeros_like(i)
+    data = np.stack([1 - i - d, i, zeros, zeros, d], axis=1) # (len(t), 5, n_groups)
+    return {group: data[..., group_id] for group, group_id in GROUP_DICT.items()}
+
+def test_plot_functions_return_the_saved_images(tmp_path):
+    path = str(tmp_path)+"/"
+    saved = plot_result.plot_all_compartments_age_group(T, GROUP_DICT, results_dict(), path=path, show=False)
+    assert saved == [path+"young.jpg", path+"old.jpg"]
+    saved += plot_result.plot_all_compartments_entire_population(T, GROUP_DICT, results_dict(), len(T), path=path+"population", show=False)
+    assert saved[-1] == path+"population.jpg"
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(image) for image in saved)
+    assert plot_result.plot_all_compartments_age_group(T, GROUP_DICT, results_dict(), show=False) == [] # nothing saved
+
+def test_render_batch_skips_unchanged_jobs(tmp_path):
+    jobs = [("plot_all_compartments_age_group", dict(t=T, group_dict=GROUP_DICT, results_dict=results_dict(), path=str(tmp_path)+"/"))]
+    manifest = str(tmp_path/"manifest.json")
+    assert render_batch(jobs, manifest, max_workers=1) == {"rendered": 1, "skipped": 0}
+    with open(manifest) as manifest_file:
+        assert list(json.load(manifest_file).values()) == [[str(tmp_path)+"/young.jpg", str(tmp_path)+"/old.jpg"]]
+    assert render_batch(jobs, manifest, max_workers=1) == {"rendered": 0, "skipped": 1}
+    os.remove(tmp_path/"old.jpg")
+    assert render_batch(jobs, manifest, max_workers=1) == {"rendered": 1, "skipped": 0}
+
+def test_key_depends_on_the_helpers(monkeypatch):
+    kwargs = dict(t=T, group_dict=GROUP_DICT, results_dict=results_dict(), length_period=len(T))
+    key = job_key("plot_pie_chart_zero_day", kwargs)
+    original = inspect.getsource
+    for module in (plot_result, metrics): # e.g. a change of metrics.zero_day or of plot_result._entire_population
+        monkeypatch.setattr(plot_batch.inspect, "getsource", lambda obj: original(obj)+("# changed" if obj is module else ""))
+        assert job_key("plot_pie_chart_zero_day", kwargs) != key
+    monkeypatch.setattr(plot_batch.inspect, "getsource", original)
+    assert job_key("plot_pie_chart_zero_day", kwargs) == key
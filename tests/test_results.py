@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from results import SimulationResults
+
+T = np.linspace(0, 10, 11)
+GROUP_DICT = {"young": 0, "adult": 1, "old": 2}
+
+def filled_results(path = None):
+    results = SimulationResults(T, ["a", "b"], GROUP_DICT, path=path)
+    rng = np.random.default_rng(0)
+    for strategy in ("a", "b"):
+        results.set(strategy, rng.uniform(0, 1, (len(T), 5*len(GROUP_DICT))))
+    return results
+
+@pytest.mark.parametrize("name", ["results", "results.npy"])
+@pytest.mark.parametrize("mmap_mode", ["r", None])
+def test_save_load_round_trip(tmp_path, name, mmap_mode):
+    results = filled_results()
+    results.save(tmp_path/name)
+    assert (tmp_path/"results.npy").exists() and (tmp_path/"results.npy.json").exists()
+    for load_name in ("results", "results.npy"): # the suffix is optional on both sides
+        loaded = SimulationResults.load(tmp_path/load_name, mmap_mode=mmap_mode)
+        assert isinstance(loaded.data, np.memmap) == (mmap_mode is not None)
+        np.testing.assert_array_equal(loaded.data, results.data)
+        np.testing.assert_array_equal(loaded.t, T)
+        assert loaded.strategies == results.strategies and loaded.group_dict == GROUP_DICT
+
+def test_backing_file_round_trip(tmp_path):
+    results = filled_results(tmp_path/"backed")
+    assert isinstance(results.data, np.memmap)
+    results.save(tmp_path/"backed") # flushes the memory map
+    np.testing.assert_array_equal(SimulationResults.load(tmp_path/"backed.npy").data, results.data)
+
+def test_accessors_return_views():
+    results = filled_results()
+    for view in (results.strategy("b"), results.group("b", "adult"), results.compartment("b", 1),
+                 *results.results_dict("a").values(), *results.results_dict()["b"].values()):
+        assert np.shares_memory(view, results.data)
+    np.testing.assert_array_equal(results.group("b", "adult"), results.data[1, :, :, 1])
+    np.testing.assert_array_equal(results.compartment("b", 1), results.data[1, :, 1, :])
+
+def test_set_drops_the_population_cache():
+    results = filled_results()
+    first = results.population("a")
+    assert results.population("a") is first # computed once
+    other = results.population("b", weights=[1, 2, 1])
+    results.set("a", np.ones((len(T), 5*len(GROUP_DICT))))
+    np.testing.assert_array_equal(results.population("a"), np.ones((len(T), 5)))
+    assert results.population("b", weights=[1, 2, 1]) is other # other strategies are kept
+    np.testing.assert_allclose(other, results.strategy("b") @ np.array([0.25, 0.5, 0.25]))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+import scenario_runner
+from sirvd_solver import sirvd_solver
+from scenario_runner import scenario_grid, iter_scenarios, run_scenarios_results
+from benchmarks.common import main_parameters, MAIN_STRATEGIES
+
+T = np.linspace(0, 120, 121)
+GROUP_DICT = {"young": 0, "adult": 1, "senior": 2, "elderly": 3}
+
+def sweep():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    base = {"beta_matrix": beta_matrix, "gamma": gamma, "mu_group": mu_group, "phi": phi, "rho": rho, "eta_group": eta_group, "x0": x0}
+    scenarios = scenario_grid(cartesian={"start_vaccination": {name: start for name, (start, _) in MAIN_STRATEGIES.items()},
+                                         "gamma": [gamma, 2*gamma]})
+    return base, scenarios
+
+@pytest.fixture
+def created_blocks(monkeypatch):
+    """Names of the shared memory blocks created by the runner"""
+    names = []
+    original = shared_memory.SharedMemory
+    def recording(*args, **kwargs):
+        shm = original(*args, **kwargs)
+        if kwargs.get("create"):
+            names.append(shm.name)
+        return shm
+    monkeypatch.setattr(scenario_runner.shared_memory, "SharedMemory", recording)
+    return names
+
+def assert_unlinked(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_runner_matches_serial_solver(created_blocks):
+    base, scenarios = sweep()
+    results = run_scenarios_results(T, base, scenarios, GROUP_DICT, max_workers=2, chunksize=3)
+    assert list(results.strategies) == list(scenarios)
+    for name, overrides in scenarios.items():
+        expected = sirvd_solver(T, **{**base, **overrides})
+        np.testing.assert_array_equal(results.strategy(name), expected.reshape(len(T), 5, len(GROUP_DICT)))
+    assert_unlinked(created_blocks)
+
+def test_shared_memory_unlinked_when_the_iteration_stops(created_blocks):
+    base, scenarios = sweep()
+    iterator = iter_scenarios(T, base, scenarios, max_workers=2, chunksize=1)
+    next(iterator)
+    iterator.close()
+    assert_unlinked(created_blocks)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from sirvd_solver import sirvd_solver
+from sensitivity import sirvd_solver_sensitivity
+from benchmarks.common import main_parameters, metapopulation_parameters
+
+T = np.linspace(0, 120, 121)
+TIGHT = {"rtol": 1e-10, "atol": 1e-12}
+
+def central_difference(solve, value, h):
+    return (solve(value + h) - solve(value - h))/(2*h)
+
+def test_sensitivities_match_finite_differences():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    start_vaccination = [0, 30, 60, 90]
+    y, sensitivities = sirvd_solver_sensitivity(T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **TIGHT)
+    np.testing.assert_allclose(y, sirvd_solver(T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **TIGHT), rtol=0, atol=1e-8)
+    solve = lambda beta: sirvd_solver(T, np.where(np.arange(16).reshape(4, 4) == 6, beta, beta_matrix), gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **TIGHT)
+    np.testing.assert_allclose(sensitivities["beta_matrix"][..., 1, 2], central_difference(solve, beta_matrix[1, 2], 1e-6), rtol=0, atol=1e-5)
+    solve = lambda value: sirvd_solver(T, beta_matrix, value, mu_group, phi, rho, eta_group, x0, start_vaccination, **TIGHT)
+    np.testing.assert_allclose(sensitivities["gamma"], central_difference(solve, gamma, 1e-6), rtol=0, atol=1e-5)
+
+@pytest.mark.parametrize("operator", ["sparse", "kronecker"])
+def test_sensitivities_with_sparse_contacts(operator):
+    contacts, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = metapopulation_parameters(2, 5, neighbours=2)
+    beta_matrix = contacts.tosparse() if operator == "sparse" else contacts
+    args = (beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    _, sensitivities = sirvd_solver_sensitivity(T, *args, parameters=("gamma",), **TIGHT)
+    _, dense_sensitivities = sirvd_solver_sensitivity(T, contacts.toarray(), *args[1:], parameters=("gamma",), **TIGHT)
+    np.testing.assert_allclose(sensitivities["gamma"], dense_sensitivities["gamma"], rtol=0, atol=1e-8)
+    with pytest.raises(ValueError, match="dense beta_matrix"):
+        sirvd_solver_sensitivity(T, *args)
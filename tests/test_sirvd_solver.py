@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.integrate import solve_ivp
+from sirvd_solver import make_sirvd, sirvd_solver, sirvd_solver_stream, breakpoints, new_infections
+from benchmarks.common import random_parameters, legacy_sirvd, main_parameters, MAIN_STRATEGIES, metapopulation_parameters
+
+T = np.linspace(0, 365, 366)
+TIGHT = {"rtol": 1e-10, "atol": 1e-12}
+
+def finite_difference_jacobian(sirvd, t, x, h = 1e-7):
+    """Central differences of sirvd with respect to every component of x"""
+    columns = []
+    for k in range(len(x)):
+        dx = np.zeros(len(x))
+        dx[k] = h
+        columns.append((sirvd(t, x + dx) - sirvd(t, x - dx))/(2*h))
+    return np.array(columns).T
+
+@pytest.mark.parametrize("n_groups", [1, 4, 16])
+@pytest.mark.parametrize("t", [0.0, 45.0, 100.0])
+def test_rhs_matches_legacy_loop(n_groups, t):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(n_groups)
+    x = x0 + np.random.default_rng(1).uniform(0, 0.1, len(x0)) # every compartment populated
+    args = (beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    sirvd, _ = make_sirvd(*args)
+    derivatives = sirvd(t, x)
+    np.testing.assert_allclose(derivatives, legacy_sirvd(t, x, *args), rtol=1e-12, atol=1e-15)
+    # the buffers are reused, the returned vectors are not
+    other = sirvd(t + 60, 2*x)
+    assert not np.shares_memory(derivatives, other)
+    np.testing.assert_allclose(derivatives, legacy_sirvd(t, x, *args), rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize("operator", ["dense", "sparse", "kronecker"])
+def test_jacobian_matches_finite_differences(operator):
+    contacts, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = metapopulation_parameters(3, 4, neighbours=2)
+    beta_matrix = {"dense": contacts.toarray(), "sparse": contacts.tosparse(), "kronecker": contacts}[operator]
+    sirvd, sirvd_jacobian = make_sirvd(beta_matrix, gamma, mu_group, phi, rho, eta_group, start_vaccination)
+    x = x0 + np.random.default_rng(1).uniform(0, 0.1, len(x0))
+    for t in (0.0, 100.0):
+        jacobian = sirvd_jacobian(t, x)
+        jacobian = jacobian.toarray() if sparse.issparse(jacobian) else jacobian
+        assert sparse.issparse(sirvd_jacobian(t, x)) == (operator != "dense")
+        np.testing.assert_allclose(jacobian, finite_difference_jacobian(sirvd, t, x), rtol=1e-6, atol=1e-9)
+
+def test_sparse_contacts_same_solution_as_dense():
+    contacts, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = metapopulation_parameters(3, 20)
+    t = np.linspace(0, 100, 101)
+    args = (gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    dense = sirvd_solver(t, contacts.toarray(), *args)
+    for beta_matrix in (contacts.tosparse(), contacts):
+        np.testing.assert_allclose(sirvd_solver(t, beta_matrix, *args), dense, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(sirvd_solver(t, beta_matrix, *args, method="BDF", **TIGHT),
+                                   sirvd_solver(t, contacts.toarray(), *args, method="BDF", **TIGHT), rtol=0, atol=1e-8)
+
+@pytest.mark.parametrize("operator", ["sparse", "kronecker"])
+def test_lsoda_rejects_sparse_contacts(operator):
+    contacts, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = metapopulation_parameters(3, 4)
+    beta_matrix = contacts.tosparse() if operator == "sparse" else contacts
+    with pytest.raises(ValueError, match="LSODA"):
+        sirvd_solver(T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, method="LSODA")
+
+def test_breakpoints():
+    schedule = [(50, {"start_vaccination": [-1, 120, 20, 400]})]
+    np.testing.assert_array_equal(breakpoints(T, [0, 30, -1, 30]), [30])
+    np.testing.assert_array_equal(breakpoints(T, [0, 30, -1, 30], schedule), [30, 50, 120])
+
+@pytest.mark.parametrize("vacc_name", list(MAIN_STRATEGIES))
+def test_segmented_matches_unsegmented(vacc_name):
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    start_vaccination, eta_group = MAIN_STRATEGIES[vacc_name]
+    args = (beta_matrix, gamma, mu_group, phi, rho, eta_group)
+    segmented = sirvd_solver(T, *args, x0, start_vaccination, **TIGHT)
+    # one solve over the whole time span, the adaptive steps locate the jumps of eta by rejecting steps
+    whole = solve_ivp(legacy_sirvd, [T[0], T[-1]], x0, t_eval=T, args=(*args, start_vaccination), **TIGHT).y.T
+    np.testing.assert_allclose(segmented, whole, rtol=0, atol=1e-7)
+
+def test_schedule_matches_changed_parameters():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    start_vaccination = [0, 30, 60, 90]
+    lockdown = [(100, {"beta_matrix": beta_matrix/2})]
+    y = sirvd_solver(T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, schedule=lockdown, **TIGHT)
+    before = sirvd_solver(T[:101], beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, **TIGHT)
+    after = sirvd_solver(T[100:], beta_matrix/2, gamma, mu_group, phi, rho, eta_group, before[-1], start_vaccination, **TIGHT)
+    np.testing.assert_allclose(y, np.vstack([before, after[1:]]), rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("chunk_size, downsample", [(100, 1), (50, 5), (1000, 1)])
+def test_stream_matches_solver(chunk_size, downsample):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(4)
+    t = np.linspace(0, 730, 731)
+    args = (t, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    y = sirvd_solver(*args, **TIGHT)
+    chunks = list(sirvd_solver_stream(*args, chunk_size=chunk_size, downsample=downsample,
+                                      reducers=("max_infectious", "cumulative_deaths"), **TIGHT))
+    np.testing.assert_array_equal(np.concatenate([chunk["t"] for chunk in chunks]), t[::downsample])
+    np.testing.assert_allclose(np.concatenate([chunk["y"] for chunk in chunks]), y[::downsample], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(chunks[-1]["max_infectious"], y[:, 4:8].max(axis=0), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(chunks[-1]["cumulative_deaths"], y[-1, 16:] - y[0, 16:], rtol=0, atol=1e-9)
+
+def test_stream_daily_incidence():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(4)
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination)
+    y = sirvd_solver(*args, **TIGHT)
+    incidence = np.concatenate([chunk["daily_incidence"] for chunk in sirvd_solver_stream(*args, chunk_size=100, reducers=("daily_incidence",), **TIGHT)])
+    assert incidence.shape == (len(T), 4)
+    # every infected person is still in I, has recovered (maybe already back to S, at rate phi) or is dead
+    _, i, r, _, d = y.reshape(len(T), 5, 4).transpose(1, 0, 2)
+    assert np.all(incidence >= -1e-9)
+    np.testing.assert_allclose(incidence.sum(axis=0), (i[-1] - i[0]) + (r[-1] - r[0]) + (d[-1] - d[0])
+                               + phi*((r[1:] + r[:-1])/2).sum(axis=0), rtol=1e-3) # daily timestamps, trapezoidal rule
+    # the same balance as the metrics, window by window
+    np.testing.assert_allclose(incidence[1:], new_infections(y.reshape(len(T), 5, 4), T, gamma), rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("backend", ["Numba", "SciPy", "numpy"])
+def test_unknown_backend(backend):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(4)
+    with pytest.raises(ValueError, match="Unknown backend"):
+        sirvd_solver(T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, backend=backend)
+
+@pytest.mark.parametrize("method", ["RK23", "RK45"])
+def test_failed_integration_raises(method):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = random_parameters(4)
+    with np.errstate(over="ignore", invalid="ignore"), pytest.raises(ValueError, match="Integration with "+method+" failed on the segment"):
+        sirvd_solver(T, beta_matrix, gamma, mu_group, phi, rho, eta_group, np.full(20, 1e200), start_vaccination, method=method)
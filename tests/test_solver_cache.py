@@ -0,0 +1,43 @@
+import numpy as np
+from sirvd_solver import sirvd_solver
+from solver_cache import SolverCache
+from benchmarks.common import main_parameters
+
+T = np.linspace(0, 365, 366)
+
+def test_hits_return_the_same_outputs(tmp_path):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, [0, 30, 60, 90])
+    expected_stats, expected_checkpoints = {}, {}
+    expected = sirvd_solver(*args, stats=expected_stats, checkpoints=expected_checkpoints)
+    cache = SolverCache(directory=str(tmp_path))
+    for tier in ("misses", "memory_hits", "disk_hits"):
+        if tier == "disk_hits":
+            cache = SolverCache(directory=str(tmp_path)) # empty memory tier
+        stats, checkpoints = {}, {}
+        y = cache.solve(*args, stats=stats, checkpoints=checkpoints)
+        assert cache.stats[tier] == 1
+        np.testing.assert_array_equal(y, expected)
+        assert not y.flags.writeable
+        assert stats == expected_stats
+        assert checkpoints.keys() == expected_checkpoints.keys()
+        for time, state in checkpoints.items():
+            np.testing.assert_array_equal(state, expected_checkpoints[time])
+
+def test_key_depends_on_the_content():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, [0, 30, 60, 90])
+    key = SolverCache.key(*args)
+    assert SolverCache.key(T.tolist(), np.array(beta_matrix), gamma, np.array(mu_group), phi, rho, eta_group, x0, np.array([0, 30, 60, 90])) == key
+    assert SolverCache.key(*args, stats={}, checkpoints={}) == key # outputs are not part of the key
+    assert SolverCache.key(*args, method="RK45", rtol=1e-3) == key # defaults of sirvd_solver
+    assert SolverCache.key(*args, rtol=1e-6) != key
+    assert SolverCache.key(*args[:-1], [0, 30, 60, 91]) != key
+
+def test_explicit_defaults_and_no_outputs_hit_the_same_entry():
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0 = main_parameters()
+    args = (T, beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, [0, 30, 60, 90])
+    cache = SolverCache()
+    y = cache.solve(*args)
+    np.testing.assert_array_equal(cache.solve(*args, method="RK45", stats=None, checkpoints=None), y)
+    assert cache.stats["misses"] == 1 and cache.stats["memory_hits"] == 1
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from sirvd_solver import sirvd_solver
+from stochastic import sirvd_stochastic
+from benchmarks.common import main_parameters, MAIN_STRATEGIES
+
+T = np.linspace(0, 60, 61)
+
+def ascending_strategy():
+    beta_matrix, gamma, mu_group, phi, rho, _, x0 = main_parameters()
+    start_vaccination, eta_group = MAIN_STRATEGIES["vaccination_strategy_ascending_order"]
+    return beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination
+
+@pytest.mark.parametrize("method", ["gillespie", "tau_leaping"])
+def test_people_are_conserved(method):
+    results = sirvd_stochastic(T, *ascending_strategy(), [50, 100, 150, 200], n_replicates=50, method=method, seed=0, keep_trajectory=True)
+    assert results["y"].shape == (50, len(T), 5, 4)
+    assert np.all(results["y"] >= 0)
+    np.testing.assert_array_equal(results["y"].sum(axis=2), np.broadcast_to([50, 100, 150, 200], (50, len(T), 4)))
+
+@pytest.mark.parametrize("method", ["gillespie", "tau_leaping"])
+def test_same_seed_and_block_size_same_replicates(method):
+    run = lambda: sirvd_stochastic(T, *ascending_strategy(), [100]*4, n_replicates=30, method=method, seed=3, block_size=8, keep_trajectory=True)
+    first, second = run(), run()
+    np.testing.assert_array_equal(first["y"], second["y"])
+    np.testing.assert_array_equal(first["extinction_time"], second["extinction_time"])
+
+@pytest.mark.parametrize("method, people, options, tolerance", [("gillespie", 1000, {}, 3e-2), ("tau_leaping", 10000, {"tau": 0.1}, 1e-2)])
+def test_mean_matches_sirvd_solver(method, people, options, tolerance):
+    # few extinctions with these sizes in 60 days, the mean follows the deterministic model
+    args = ascending_strategy()
+    results = sirvd_stochastic(T, *args, [people]*4, n_replicates=100, method=method, seed=0, keep_trajectory=True, **options)
+    mean = results["y"].mean(axis=0).reshape(len(T), -1)/people
+    np.testing.assert_allclose(mean, sirvd_solver(T, *args), rtol=0, atol=tolerance)
+
+@pytest.mark.parametrize("method", ["gillespie", "tau_leaping"])
+def test_extinction_time_at_the_first_output_without_infectious(method):
+    beta_matrix, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination = ascending_strategy()
+    results = sirvd_stochastic(T, beta_matrix/4, gamma, mu_group, phi, rho, eta_group, x0, start_vaccination, [100]*4,
+                               n_replicates=100, method=method, seed=0, keep_trajectory=True)
+    infectious = results["y"][:, :, 1].sum(axis=2)
+    extinct = ~np.isnan(results["extinction_time"])
+    assert 0 < extinct.sum() < 100 # some replicates of each kind
+    assert np.all(infectious[~extinct] > 0)
+    first = np.argmax(infectious[extinct] == 0, axis=1)
+    assert np.all(infectious[extinct][np.arange(len(T)) >= first[:, None]] == 0) # once extinct, always extinct
+    if method == "tau_leaping": # the steps end at the output times
+        np.testing.assert_array_equal(results["extinction_time"][extinct], T[first])
+    else: # last event, between the previous output time and the first one without infectious people
+        assert np.all((results["extinction_time"][extinct] > T[first - 1]) & (results["extinction_time"][extinct] <= T[first]))